@@ -0,0 +1,62 @@
+"""
+Compares the single-frame latency of BallPositionPipeline.predict when ball and pitch detection run
+one after the other and when they run concurrently in a thread or process pool.
+
+    python benchmarks/concurrency.py --ball-model ball.pt --pitch-model pitch.pt --image frame.jpg
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'pipeline')))
+from frames import decode_image
+from pipeline import BallPositionPipeline
+
+
+def time_calls(function, image: np.ndarray, runs: int, warmup: int) -> np.ndarray:
+    for _ in range(warmup):
+        function(image)
+    latencies = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        function(image)
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1000
+
+
+def report(name: str, latencies_ms: np.ndarray) -> None:
+    print(f"{name:<22} mean {latencies_ms.mean():8.1f} ms | "
+          f"p50 {np.percentile(latencies_ms, 50):8.1f} ms | p95 {np.percentile(latencies_ms, 95):8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ball-model", required=True, help="Path to the ball detection YOLO model file.")
+    parser.add_argument("--pitch-model", required=True, help="Path to the pitch detection YOLO model file.")
+    parser.add_argument("--image", required=True, help="Frame on which every run is timed.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=1)
+    args = parser.parse_args()
+
+    image = decode_image(args.image)
+    sequential = BallPositionPipeline(args.ball_model, args.pitch_model)
+    ball_ms = time_calls(sequential.ball_detector.predict, image, args.runs, args.warmup)
+    pitch_ms = time_calls(sequential.pitch_detector.predict, image, args.runs, args.warmup)
+    report("ball only", ball_ms)
+    report("pitch only", pitch_ms)
+    print(f"{'ideal concurrent':<22} mean {max(ball_ms.mean(), pitch_ms.mean()):8.1f} ms")
+    report("sequential", time_calls(sequential.predict, image, args.runs, args.warmup))
+
+    for executor in ("thread", "process"):
+        pipeline = BallPositionPipeline(args.ball_model, args.pitch_model, executor=executor,
+                                        max_workers=args.max_workers)
+        try:
+            report(f"concurrent ({executor})", time_calls(pipeline.predict, image, args.runs, args.warmup))
+        finally:
+            pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Measures BallPositionPipeline end-to-end and stage by stage: decode, ball YOLO, pitch YOLO, keypoint selection
+and vertex lookup, Homography matrix fitting (cv2.findHomography) and projection onto the pitch.
+Reports p50/p95/p99 latency, frames per second and peak traced memory of each stage.
+
+Without model files the detectors are replaced by stubs returning synthetic detections, which measures every
+stage but the YOLO models without weights or a GPU:
+
+    python benchmarks/stages.py --save baseline.json
+    python benchmarks/stages.py --compare baseline.json
+
+With --ball-model and --pitch-model the real models are measured, on --image or on a synthetic frame.
+A comparison exits with status 1 if any p50 latency regressed by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+# Typing
+from typing import Callable, Dict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'pipeline')))
+from frames import decode_image
+from homography import HomographyTransformer
+from pipeline import BallPositionPipeline
+from stubs import StubBallDetector, StubPitchDetector, SyntheticCamera
+
+
+def latency_stats(latencies_ms: np.ndarray) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {"mean_ms": float(latencies_ms.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+            "p99_ms": float(p99), "fps": float(1000 / latencies_ms.mean())}
+
+
+def measure(function: Callable[[], object], runs: int, warmup: int, memory_runs: int = 3) -> Dict[str, float]:
+    """
+    Times a stage, then measures its peak traced memory in separate runs, as tracing slows down allocations.
+
+    Args:
+        function (Callable[[], object]): The stage, called without arguments.
+        runs (int): Number of timed calls.
+        warmup (int): Number of untimed calls made first.
+        memory_runs (int): Number of calls made while tracing memory allocations.
+
+    Returns:
+        Dict[str, float]: The latency statistics [ms], the frames per second and the peak memory [KiB].
+    """
+    for _ in range(warmup):
+        function()
+    latencies = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        function()
+        latencies[i] = time.perf_counter() - start
+    stats = latency_stats(latencies * 1000)
+
+    tracemalloc.start()
+    for _ in range(memory_runs):
+        function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats["peak_kib"] = peak / 1024
+    return stats
+
+
+def build_pipeline(args: argparse.Namespace, camera: SyntheticCamera) -> BallPositionPipeline:
+    homography_transformer = HomographyTransformer(method=args.homography_method)
+    if args.ball_model and args.pitch_model:
+        return BallPositionPipeline(args.ball_model, args.pitch_model, device=args.device,
+                                    homography_transformer=homography_transformer)
+    return BallPositionPipeline("stub", "stub",
+                                homography_transformer=homography_transformer,
+                                ball_detector=StubBallDetector(camera, miss_rate=args.miss_rate),
+                                pitch_detector=StubPitchDetector(camera))
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    camera = SyntheticCamera((args.width, args.height), seed=args.seed)
+    pipeline = build_pipeline(args, camera)
+    image = decode_image(args.image) if args.image else camera.frame()
+    encoded_image = cv2.imencode(".jpg", image)[1].tobytes()
+
+    # Inputs of the later stages, computed once so that each stage is timed on its own
+    ball_pixels_xy = pipeline.ball_detector.predict(image)
+    pitch_detections = pipeline.pitch_detector.get_detections(image)
+    selected_detections = pipeline.pitch_detector.keypoint_selector.select(pitch_detections)
+    detected_keypoints = pipeline.pitch_detector.get_detected_keypoints(selected_detections)
+    pitch_vertices = pipeline.pitch_detector.get_pitch_vertices(selected_detections)
+    H, homography_status = pipeline.homography_transformer.estimate_homography(detected_keypoints, pitch_vertices)
+
+    def vertex_lookup():
+        selected = pipeline.pitch_detector.keypoint_selector.select(pitch_detections)
+        return pipeline.pitch_detector.get_detected_keypoints(selected), pipeline.pitch_detector.get_pitch_vertices(selected)
+
+    stages = {
+        "decode": lambda: decode_image(encoded_image),
+        "ball": lambda: pipeline.ball_detector.predict(image),
+        "pitch": lambda: pipeline.pitch_detector.get_detections(image),
+        "vertex_lookup": vertex_lookup,
+        "find_homography": lambda: pipeline.homography_transformer.estimate_homography(detected_keypoints, pitch_vertices),
+        "projection": lambda: pipeline.locate(ball_pixels_xy, H, homography_status),
+        "end_to_end": lambda: pipeline.predict(encoded_image),
+    }
+    results = {name: measure(function, args.runs, args.warmup) for name, function in stages.items()}
+
+    # Throughput of batched inference, per frame
+    frames = [image] * args.batch_size
+    batch_stats = measure(lambda: pipeline.predict_batch(frames, batch_size=args.batch_size), args.runs, args.warmup)
+    for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms"):
+        batch_stats[key] /= args.batch_size
+    batch_stats["fps"] *= args.batch_size
+    results["predict_batch"] = batch_stats
+    pipeline.close()
+    return results
+
+
+def environment(args: argparse.Namespace) -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "detectors": "yolo" if args.ball_model and args.pitch_model else "stub",
+            "resolution_wh": [args.width, args.height] if not args.image else None,
+            "homography_method": args.homography_method,
+            "batch_size": args.batch_size,
+            "runs": args.runs}
+
+
+def report(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}{'peak KiB':>11}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['fps']:>10.1f}{stats['peak_kib']:>11.1f}")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> bool:
+    """
+    Prints the change of each stage against a baseline.
+
+    Returns:
+        bool: True if no stage's p50 latency grew by more than the tolerance.
+    """
+    ok = True
+    print(f"\n{'stage':<16}{'p50 base':>10}{'p50 now':>10}{'change':>9}")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        change = stats["p50_ms"] / baseline[name]["p50_ms"] - 1
+        regressed = change > tolerance
+        ok &= not regressed
+        print(f"{name:<16}{baseline[name]['p50_ms']:>10.3f}{stats['p50_ms']:>10.3f}{change:>+9.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ball-model", help="Path to the ball detection YOLO model file, stub detector if omitted.")
+    parser.add_argument("--pitch-model", help="Path to the pitch detection YOLO model file, stub detector if omitted.")
+    parser.add_argument("--device")
+    parser.add_argument("--image", help="Frame on which every run is timed, a synthetic frame if omitted.")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--homography-method", default="lstsq")
+    parser.add_argument("--miss-rate", type=float, default=0.0, help="Fraction of frames without ball for the stub.")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the results to this JSON file, e.g. as a baseline.")
+    parser.add_argument("--compare", help="JSON file of a baseline to compare the results with.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Largest accepted p50 slowdown, as a fraction.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(args), "stages": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline["stages"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
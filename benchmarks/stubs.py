@@ -0,0 +1,157 @@
+"""
+Stub detectors returning synthetic detections, so that the pipeline stages after the YOLO models
+(keypoint selection, vertex lookup, Homography matrix fitting and projection) can be benchmarked without
+model weights or a GPU.
+
+The synthetic frames are seen by a fixed camera: the pitch keypoints and the ball are projected onto the
+frame with a known Homography matrix, then perturbed with pixel noise.
+"""
+import os
+import sys
+import cv2
+import numpy as np
+import supervision as sv
+# Typing
+from typing import List, Optional, Sequence, Tuple, Union
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'pipeline')))
+from ball_detector import BallDetector
+from pitch_detector import PitchDetector
+from homography import project_points
+from keypoint_selection import KeypointSelector
+from pitch_config import SoccerFieldConfiguration
+
+PITCH_CONFIG = SoccerFieldConfiguration()
+
+
+class SyntheticCamera:
+    """
+    The SyntheticCamera class maps the pitch onto a frame of the given size with a fixed perspective, similar to
+    a camera placed high behind one of the long sides of the pitch.
+
+    Attributes:
+        resolution_wh (Tuple[int, int]): Width and height of the frames.
+        H_pitch_to_image (np.ndarray): The Homography matrix projecting pitch coordinates [cm] onto the frame.
+    """
+
+    def __init__(self, resolution_wh: Tuple[int, int] = (1920, 1080), seed: int = 0) -> None:
+        """
+        Initializes the SyntheticCamera.
+
+        Args:
+            resolution_wh (Tuple[int, int]): Width and height of the frames.
+            seed (int): Seed of the noise added to the synthetic detections.
+        """
+        width, height = resolution_wh
+        self.resolution_wh = resolution_wh
+        # The far side of the pitch is narrower than the near side, which is partly out of the frame
+        image_corners = np.array([[0.15 * width, 0.25 * height],
+                                  [0.85 * width, 0.25 * height],
+                                  [1.10 * width, 1.05 * height],
+                                  [-0.10 * width, 1.05 * height]], dtype=np.float32)
+        self.H_pitch_to_image = cv2.getPerspectiveTransform(PITCH_CONFIG.corners, image_corners)
+        self.rng = np.random.default_rng(seed)
+
+    def frame(self) -> np.ndarray:
+        """
+        Returns a textured BGR frame, so that encoding and decoding it costs about as much as a real frame.
+        """
+        width, height = self.resolution_wh
+        return self.rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+    def in_frame(self, pixels_xy: np.ndarray) -> np.ndarray:
+        width, height = self.resolution_wh
+        return np.isfinite(pixels_xy).all(axis=1) & (pixels_xy[:, 0] >= 0) & (pixels_xy[:, 0] < width) \
+            & (pixels_xy[:, 1] >= 0) & (pixels_xy[:, 1] < height)
+
+    def keypoints(self, noise_px: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the pitch keypoints visible on the frame.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (K,) class ids and the (K, 2) noisy pixel coordinates of the keypoints.
+        """
+        pixels_xy = project_points(PITCH_CONFIG.vertex_table, self.H_pitch_to_image)
+        visible = self.in_frame(pixels_xy)
+        pixels_xy = pixels_xy[visible] + self.rng.normal(0, noise_px, size=(visible.sum(), 2))
+        # Rows of the vertex table are indexed by class id
+        return np.flatnonzero(visible), pixels_xy.astype(np.float32)
+
+    def ball(self, noise_px: float = 1.0) -> np.ndarray:
+        """
+        Returns the (x, y) pixel coordinates of a ball placed at random on the visible part of the pitch.
+        """
+        while True:
+            pitch_xy = self.rng.uniform([0, 0], [PITCH_CONFIG.length, PITCH_CONFIG.width]).astype(np.float32)
+            pixels_xy = project_points(pitch_xy[None], self.H_pitch_to_image)
+            if self.in_frame(pixels_xy)[0]:
+                return pixels_xy[0] + self.rng.normal(0, noise_px, size=2).astype(np.float32)
+
+
+def boxes_around(pixels_xy: np.ndarray, size: float) -> np.ndarray:
+    half_size = size / 2
+    return np.concatenate([pixels_xy - half_size, pixels_xy + half_size], axis=1).astype(np.float32)
+
+
+class StubBallDetector(BallDetector):
+    """
+    The StubBallDetector class returns one synthetic ball detection per frame instead of running a YOLO model.
+
+    Attributes:
+        camera (SyntheticCamera): The camera the ball is projected with.
+        miss_rate (float): Fraction of frames without any ball detection.
+    """
+
+    def __init__(self, camera: SyntheticCamera, miss_rate: float = 0.0, box_size: float = 12.0) -> None:
+        super().__init__(model_path="stub-ball-detector")
+        self.camera = camera
+        self.miss_rate = miss_rate
+        self.box_size = box_size
+
+    def get_detections(self,
+                       image: Union[str, np.ndarray],
+                       roi: Optional[Tuple[int, int, int, int]] = None,
+                       pitch_polygon: Optional[np.ndarray] = None) -> sv.Detections:
+        if self.camera.rng.random() < self.miss_rate:
+            return sv.Detections.empty()
+        ball_pixels_xy = self.camera.ball()
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            if not (x1 <= ball_pixels_xy[0] < x2 and y1 <= ball_pixels_xy[1] < y2):
+                return sv.Detections.empty()
+        return sv.Detections(xyxy=boxes_around(ball_pixels_xy[None], self.box_size),
+                             confidence=self.camera.rng.uniform(0.3, 0.95, size=1).astype(np.float32),
+                             class_id=np.zeros(1, dtype=int))
+
+    def get_detections_batch(self,
+                             images: Sequence[Union[str, np.ndarray]],
+                             pitch_polygons: Optional[Sequence[Optional[np.ndarray]]] = None) -> List[sv.Detections]:
+        return [self.get_detections(image) for image in images]
+
+
+class StubPitchDetector(PitchDetector):
+    """
+    The StubPitchDetector class returns the synthetic keypoints of the visible pitch vertices instead of running
+    a YOLO pose model. The detections go through the real keypoint selection, vertex lookup and homography code.
+
+    Attributes:
+        camera (SyntheticCamera): The camera the keypoints are projected with.
+    """
+
+    def __init__(self,
+                 camera: SyntheticCamera,
+                 keypoint_selector: Optional[KeypointSelector] = None,
+                 box_size: float = 20.0) -> None:
+        super().__init__(model_path="stub-pitch-detector", keypoint_selector=keypoint_selector)
+        self.camera = camera
+        self.box_size = box_size
+
+    def get_detections(self, image: Union[str, np.ndarray]) -> sv.Detections:
+        class_id, keypoints_xy = self.camera.keypoints()
+        return sv.Detections(xyxy=boxes_around(keypoints_xy, self.box_size),
+                             confidence=self.camera.rng.uniform(0.5, 0.99, size=len(class_id)).astype(np.float32),
+                             class_id=class_id.astype(int),
+                             data={'keypoint_xy': keypoints_xy,
+                                   'keypoint_conf': self.camera.rng.uniform(0.5, 0.99, size=len(class_id)).astype(np.float32)})
+
+    def get_detections_batch(self, images: Sequence[Union[str, np.ndarray]]) -> List[sv.Detections]:
+        return [self.get_detections(image) for image in images]
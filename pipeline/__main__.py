@@ -0,0 +1,8 @@
+import os
+import sys
+# The pipeline modules import each other by module name, as in the Streamlit demo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import ast
+import logging
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+import supervision as sv
+# Image decoding
+from frames import decode_image
+# Typing
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("ultralytics", "onnx")
+
+
+def keypoint_data(keypoints_xy: np.ndarray, keypoints_conf: Optional[np.ndarray], num_detections: int) -> Dict[str, np.ndarray]:
+    """
+    Packs the keypoints of pose detections into detection data, so that they stay aligned with their box when the
+    detections are filtered. The pitch model predicts one keypoint per box.
+
+    Args:
+        keypoints_xy (np.ndarray): The (N, 1, 2) pixel coordinates of the keypoints.
+        keypoints_conf (Optional[np.ndarray]): The (N, 1) keypoint confidences, None if the model does not predict them.
+        num_detections (int): Number of detections N.
+
+    Returns:
+        Dict[str, np.ndarray]: The keypoints under 'keypoint_xy' and, if given, their confidence under 'keypoint_conf'.
+    """
+    data = {'keypoint_xy': np.asarray(keypoints_xy, dtype=np.float32).reshape(num_detections, 2)}
+    if keypoints_conf is not None:
+        data['keypoint_conf'] = np.asarray(keypoints_conf, dtype=np.float32).reshape(num_detections)
+    return data
+
+
+class DetectorBackend(ABC):
+    """
+    The DetectorBackend class is the interface of the inference engines running the detection models.
+    Backends return Supervision detections, with the keypoints of pose models in the detection data,
+    so that the detectors do not depend on the engine.
+    """
+
+    @abstractmethod
+    def predict(self, images: Sequence[Union[str, np.ndarray]]) -> List[sv.Detections]:
+        """
+        Runs the model on a batch of images.
+
+        Args:
+            images (Sequence[Union[str, np.ndarray]]): Image paths or BGR images.
+
+        Returns:
+            List[sv.Detections]: One Supervision Detections object per image, in input order.
+        """
+
+    def warmup(self, imgsz: int = 640) -> None:
+        """
+        Runs one inference on a blank square frame, so that lazy initialization does not slow down the first frame.
+
+        Args:
+            imgsz (int): Side of the blank frame.
+        """
+        self.predict([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)])
+
+
+class UltralyticsBackend(DetectorBackend):
+    """
+    The UltralyticsBackend class runs a PyTorch model with ultralytics.YOLO, e.g. a `.pt` file.
+
+    Attributes:
+        model (YOLO): The loaded YOLO model.
+        device (Optional[str]): Device the model runs on, None for the default device.
+    """
+
+    def __init__(self, model_path: str, device: Optional[str] = None) -> None:
+        # Imported here, so that hosts running only ONNX models never import PyTorch
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.device = device
+
+    def predict(self, images: Sequence[Union[str, np.ndarray]]) -> List[sv.Detections]:
+        results = self.model.predict(list(images), device=self.device, verbose=False)
+        return [self.to_detections(result) for result in results]
+
+    def warmup(self, imgsz: int = 640) -> None:
+        self.model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), device=self.device, verbose=False)
+
+    @staticmethod
+    def to_detections(result) -> sv.Detections:
+        """
+        Converts a YOLO result into detections, adding the keypoints of pose models to the detection data.
+
+        Args:
+            result (ultralytics.engine.results.Results): The YOLO result of one image.
+
+        Returns:
+            sv.Detections: A Supervision Detections object containing the detection results.
+        """
+        detections = sv.Detections.from_ultralytics(result)
+        if result.keypoints is not None:
+            keypoints_conf = result.keypoints.conf.cpu().numpy() if result.keypoints.conf is not None else None
+            detections.data.update(keypoint_data(result.keypoints.xy.cpu().numpy(), keypoints_conf, len(detections)))
+        return detections
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int], color: int = 114) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resizes an image to fit the model input keeping its aspect ratio, padding the borders as ultralytics does.
+
+    Args:
+        image (np.ndarray): The BGR image.
+        new_shape (Tuple[int, int]): Height and width of the model input.
+        color (int): Grey level of the padding.
+
+    Returns:
+        Tuple[np.ndarray, float, Tuple[float, float]]: The padded image, the resize ratio and the (x, y) padding
+            added on the left and top borders.
+    """
+    height, width = image.shape[:2]
+    ratio = min(new_shape[0] / height, new_shape[1] / width)
+    resized_wh = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (new_shape[1] - resized_wh[0]) / 2, (new_shape[0] - resized_wh[1]) / 2
+    if (width, height) != resized_wh:
+        image = cv2.resize(image, resized_wh, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return image, ratio, (left, top)
+
+
+def nms(xyxy: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Args:
+        xyxy (np.ndarray): The (N, 4) boxes.
+        scores (np.ndarray): The (N,) box scores.
+        iou_threshold (float): Boxes overlapping a better one by more than this IoU are dropped.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, by decreasing score.
+    """
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size > 0:
+        best, order = order[0], order[1:]
+        keep.append(best)
+        top_left = np.maximum(xyxy[best, :2], xyxy[order, :2])
+        bottom_right = np.minimum(xyxy[best, 2:], xyxy[order, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        iou = intersection / (areas[best] + areas[order] - intersection + 1e-9)
+        order = order[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+class OnnxBackend(DetectorBackend):
+    """
+    The OnnxBackend class runs a YOLO model exported to ONNX with ONNX Runtime, with NumPy pre- and post-processing
+    matching ultralytics: letterboxing, confidence filtering, class-aware non-maximum suppression and the rescaling
+    of boxes and keypoints to the original image. Detection, pose and NMS-free (YOLOv10) exports are supported.
+
+    Attributes:
+        session (onnxruntime.InferenceSession): The ONNX Runtime session, e.g. on the CPU, CUDA or OpenVINO provider.
+        names (Dict[int, str]): Class names, from the metadata written by the ultralytics export.
+        imgsz (Tuple[int, int]): Height and width of the model input.
+        kpt_shape (Optional[Tuple[int, int]]): Keypoints per box and values per keypoint of pose models.
+    """
+
+    def __init__(self,
+                 model_path: str,
+                 device: Optional[str] = None,
+                 conf_threshold: float = 0.25,
+                 iou_threshold: float = 0.7,
+                 max_det: int = 300,
+                 intra_op_num_threads: int = 0,
+                 providers: Optional[Sequence[Union[str, Tuple[str, Dict]]]] = None) -> None:
+        """
+        Creates the ONNX Runtime session of the model.
+
+        Args:
+            model_path (str): Path to the `.onnx` model file.
+            device (Optional[str]): "cuda" or "cuda:<index>" to run on the CUDA execution provider, otherwise CPU.
+            conf_threshold (float): Minimum confidence of a detection, as ultralytics' `conf`.
+            iou_threshold (float): IoU threshold of the non-maximum suppression, as ultralytics' `iou`.
+            max_det (int): Maximum number of detections per image.
+            intra_op_num_threads (int): Threads used by ONNX Runtime within an operator, 0 for its default.
+            providers (Optional[Sequence[Union[str, Tuple[str, Dict]]]]): ONNX Runtime execution providers, by
+                priority and optionally with their options, e.g. ["OpenVINOExecutionProvider", "CPUExecutionProvider"].
+                None for CUDA when `device` asks for it, then CPU.
+        """
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_num_threads
+        if providers is None:
+            providers = ["CPUExecutionProvider"]
+            if device is not None and str(device).startswith("cuda"):
+                device_id = int(str(device).partition(":")[2] or 0)
+                providers.insert(0, ("CUDAExecutionProvider", {"device_id": device_id}))
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        # Exports without a dynamic batch axis take one image per call
+        self.fixed_batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        imgsz = ast.literal_eval(metadata["imgsz"]) if "imgsz" in metadata else model_input.shape[2:]
+        self.imgsz = tuple(int(side) for side in imgsz)
+        self.kpt_shape = tuple(ast.literal_eval(metadata["kpt_shape"])) if "kpt_shape" in metadata else None
+
+    def predict(self, images: Sequence[Union[str, np.ndarray]]) -> List[sv.Detections]:
+        images = [decode_image(image) for image in images]
+        if not images:
+            return []
+        batch_size = self.fixed_batch_size or len(images)
+        detections = []
+        for batch_start in range(0, len(images), batch_size):
+            batch = images[batch_start:batch_start + batch_size]
+            inputs, ratios, pads = self.preprocess(batch)
+            outputs = self.session.run(None, {self.input_name: inputs})[0]
+            detections.extend(self.postprocess(output, image.shape, ratio, pad)
+                              for output, image, ratio, pad in zip(outputs, batch, ratios, pads))
+        return detections
+
+    def preprocess(self, images: List[np.ndarray]) -> Tuple[np.ndarray, List[float], List[Tuple[float, float]]]:
+        """
+        Letterboxes the images and stacks them into the NCHW RGB input of the model, scaled to [0, 1].
+
+        Returns:
+            Tuple[np.ndarray, List[float], List[Tuple[float, float]]]: The input tensor, and the resize ratio and
+                padding of each image.
+        """
+        letterboxed = [letterbox(image, self.imgsz) for image in images]
+        inputs = np.stack([padded for padded, _, _ in letterboxed])
+        # BGR to RGB, NHWC to NCHW
+        inputs = np.ascontiguousarray(inputs[..., ::-1].transpose(0, 3, 1, 2))
+        inputs = inputs.astype(self.input_dtype) / self.input_dtype(255)
+        return inputs, [ratio for _, ratio, _ in letterboxed], [pad for _, _, pad in letterboxed]
+
+    def postprocess(self,
+                    output: np.ndarray,
+                    image_shape: Tuple[int, ...],
+                    ratio: float,
+                    pad: Tuple[float, float]) -> sv.Detections:
+        """
+        Decodes the raw output of one image into detections in original image coordinates.
+
+        Args:
+            output (np.ndarray): The model output of one image: (C, A) for detection and pose exports, with
+                C = 4 box values + one score per class + the keypoint values, or (300, 6) for NMS-free exports.
+            image_shape (Tuple[int, ...]): Shape of the original image.
+            ratio (float): Resize ratio of the letterbox.
+            pad (Tuple[float, float]): Padding of the letterbox on the left and top borders.
+
+        Returns:
+            sv.Detections: A Supervision Detections object containing the detection results.
+        """
+        output = output.astype(np.float32)
+        if output.shape[-1] == 6 and self.kpt_shape is None:
+            # NMS-free export: rows of (x1, y1, x2, y2, score, class)
+            output = output[output[:, 4] >= self.conf_threshold][:self.max_det]
+            xyxy, confidence, class_id = output[:, :4], output[:, 4], output[:, 5].astype(int)
+            keypoints = None
+        else:
+            # Anchors as rows of (cx, cy, w, h, class scores..., keypoints...)
+            output = output.T
+            num_classes = output.shape[1] - 4 - (int(np.prod(self.kpt_shape)) if self.kpt_shape else 0)
+            scores = output[:, 4:4 + num_classes]
+            class_id = scores.argmax(axis=1)
+            confidence = scores[np.arange(len(scores)), class_id]
+            candidates = confidence >= self.conf_threshold
+            output, class_id, confidence = output[candidates], class_id[candidates], confidence[candidates]
+            xyxy = np.concatenate([output[:, :2] - output[:, 2:4] / 2, output[:, :2] + output[:, 2:4] / 2], axis=1)
+            # Offset the boxes of each class, so that a single suppression never merges different classes
+            keep = nms(xyxy + class_id[:, None] * 7680.0, confidence, self.iou_threshold)[:self.max_det]
+            xyxy, confidence, class_id = xyxy[keep], confidence[keep], class_id[keep]
+            keypoints = output[keep, 4 + num_classes:].reshape(len(keep), *self.kpt_shape) if self.kpt_shape else None
+
+        height, width = image_shape[:2]
+        offset = np.array([pad[0], pad[1]], dtype=np.float32)
+        xyxy = ((xyxy.reshape(-1, 2, 2) - offset) / ratio).reshape(-1, 4)
+        xyxy = np.clip(xyxy, 0, [width, height, width, height]).astype(np.float32)
+        detections = sv.Detections(xyxy=xyxy,
+                                   confidence=confidence.astype(np.float32),
+                                   class_id=class_id.astype(int),
+                                   data={'class_name': np.array([self.names.get(int(i), str(i)) for i in class_id])})
+        if keypoints is not None:
+            keypoints_xy = (keypoints[..., :2] - offset) / ratio
+            keypoints_conf = keypoints[..., 2] if keypoints.shape[-1] == 3 else None
+            detections.data.update(keypoint_data(keypoints_xy, keypoints_conf, len(detections)))
+        return detections
+
+
+def load_backend(model_path: str, device: Optional[str] = None, backend: Optional[str] = None) -> DetectorBackend:
+    """
+    Loads a model with the backend matching its file, ONNX Runtime for `.onnx` files and ultralytics otherwise.
+
+    Args:
+        model_path (str): Path to the model file.
+        device (Optional[str]): Device the model runs on.
+        backend (Optional[str]): One of BACKENDS, to override the choice based on the file extension.
+
+    Returns:
+        DetectorBackend: The loaded model.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend is None:
+        backend = "onnx" if str(model_path).lower().endswith(".onnx") else "ultralytics"
+    if backend == "onnx":
+        return OnnxBackend(model_path, device)
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path, device)
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}.")
@@ -1,6 +1,42 @@
-from ultralytics import YOLO
+import logging
 import supervision as sv
 import numpy as np
+import cv2
+# Image decoding
+from frames import decode_image
+# Model loading
+from backends import DetectorBackend
+from model_registry import MODEL_REGISTRY
+# Typing
+from typing import List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def tile_grid(image_shape: Tuple[int, ...], tile_size: int, overlap: float) -> np.ndarray:
+    """
+    Splits an image into square tiles overlapping by the given fraction, the last row and column of tiles
+    being aligned with the bottom and right borders of the image.
+
+    Args:
+        image_shape (Tuple[int, ...]): Shape of the image.
+        tile_size (int): Side of the tiles [px].
+        overlap (float): Fraction of a tile shared with its neighbours, in [0, 1).
+
+    Returns:
+        np.ndarray: A (T, 4) int array with the (x1, y1, x2, y2) coordinates of each tile.
+    """
+    height, width = image_shape[:2]
+    stride = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length: int) -> np.ndarray:
+        last = max(length - tile_size, 0)
+        return np.unique(np.append(np.arange(0, last + 1, stride), last))
+
+    x1, y1 = np.meshgrid(starts(width), starts(height))
+    x1, y1 = x1.ravel(), y1.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width), np.minimum(y1 + tile_size, height)], axis=1)
+
 
 class BallDetector:
     """
@@ -8,72 +44,265 @@ class BallDetector:
     It processes the detections to find the pixel coordinates of the detected ball.
 
     Attributes:
-        ball_detector (YOLO): A YOLO model instance for detecting the soccer ball in images.
+        ball_detector (DetectorBackend): The YOLO model detecting the soccer ball in images, run with PyTorch or ONNX Runtime
+            and shared through the model registry.
         ball_detections: sv.Detections: A Supervision Detections object containing the detection results. 
+        tile_size (Optional[int]): Side of the tiles of tiled detection, None to run the model on the full frame.
     """
 
-    def __init__(self, model_path: str) -> None:
+    def __init__(self,
+                 model_path: str,
+                 device: Optional[str] = None,
+                 tile_size: Optional[int] = None,
+                 tile_overlap: float = 0.2,
+                 nms_threshold: float = 0.5) -> None:
         """
         Initializes the BallDetector with the path to a pre-trained YOLO model.
+        The model is loaded lazily through the process-wide model registry, so that every detector using
+        the same model file and device shares a single loaded model.
 
         Args:
-            model_path (str): Path to the YOLO model file.
+            model_path (str): Path to the YOLO model file, `.pt` or `.onnx`.
+            device (Optional[str]): Device the model runs on, e.g. "cpu" or "cuda:0". None for the default device.
+            tile_size (Optional[int]): If given, high-resolution frames are split into overlapping tiles of this
+                side [px], so that the ball is not shrunk to a few pixels when the frame is resized to the model input.
+            tile_overlap (float): Fraction of a tile shared with its neighbours.
+            nms_threshold (float): IoU threshold of the non-maximum suppression merging detections across tiles.
         """
-        if not ('ball_detector' in globals()):
-            self.ball_detector = YOLO(model_path)
-        else:
-            print('Pitch detection model already loaded')
+        self.model_path = model_path
+        self.device = device
+        self.model_lock = MODEL_REGISTRY.lock(model_path, device)
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.nms_threshold = nms_threshold
+
+    @property
+    def ball_detector(self) -> DetectorBackend:
+        return MODEL_REGISTRY.get(self.model_path, self.device)
+
+    def _run_model(self, source: Union[str, np.ndarray, List[np.ndarray]]) -> List[sv.Detections]:
+        model = self.ball_detector
+        with self.model_lock:
+            return model.predict(source if isinstance(source, list) else [source])
 
-    def get_detections(self, image_path: str) -> sv.Detections:
+    def get_detections(self,
+                       image: Union[str, np.ndarray],
+                       roi: Optional[Tuple[int, int, int, int]] = None,
+                       pitch_polygon: Optional[np.ndarray] = None) -> sv.Detections:
         """
         Runs the YOLO model on the given image and returns the detections for the soccer ball.
 
         Args:
-            image_path (str): Path to the image file on which to run the detection.
+            image (Union[str, np.ndarray]): Path to the image file, or the already decoded BGR image, on which to run the detection.
+            roi (Optional[Tuple[int, int, int, int]]): If given, the (x1, y1, x2, y2) region of the decoded image the
+                detection is restricted to. The returned boxes are still in full-image coordinates.
+            pitch_polygon (Optional[np.ndarray]): With tiled detection, the (P, 2) pixel coordinates of the pitch
+                outline. Tiles not overlapping it are skipped.
 
         Returns:
             sv.Detections: A Supervision Detections object containing the detection results.
         """
-        ball = self.ball_detector.predict(image_path)
-        ball_detections = sv.Detections.from_ultralytics(ball[0])
+        if roi is None and self.tile_size is not None:
+            return self.get_detections_tiled(image, pitch_polygon)
+        if roi is None:
+            ball_detections = self._run_model(image)[0]
+            return ball_detections
+
+        x1, y1, x2, y2 = roi
+        ball_detections = self._run_model(np.ascontiguousarray(image[y1:y2, x1:x2]))[0]
+        ball_detections.xyxy = ball_detections.xyxy + np.array([x1, y1, x1, y1], dtype=ball_detections.xyxy.dtype)
         return ball_detections
+
+    def get_detections_batch(self,
+                             images: Sequence[Union[str, np.ndarray]],
+                             pitch_polygons: Optional[Sequence[Optional[np.ndarray]]] = None) -> List[sv.Detections]:
+        """
+        Runs the YOLO model once on a batch of images and returns the detections of each image.
+
+        Args:
+            images (Sequence[Union[str, np.ndarray]]): Image paths or BGR images forming one inference batch.
+            pitch_polygons (Optional[Sequence[Optional[np.ndarray]]]): With tiled detection, the pitch outline of
+                each image, None where unknown. Tiles not overlapping it are skipped.
+
+        Returns:
+            List[sv.Detections]: One Supervision Detections object per image, in input order.
+        """
+        if self.tile_size is not None:
+            # Each frame already forms a batch of tiles
+            pitch_polygons = pitch_polygons if pitch_polygons is not None else [None] * len(images)
+            return [self.get_detections_tiled(image, pitch_polygon)
+                    for image, pitch_polygon in zip(images, pitch_polygons)]
+        return self._run_model(list(images))
+
+    def get_detections_tiled(self,
+                             image: Union[str, np.ndarray],
+                             pitch_polygon: Optional[np.ndarray] = None) -> sv.Detections:
+        """
+        Runs the YOLO model on overlapping tiles of the image in a single batch, and merges the detections of
+        every tile into full-image coordinates with a non-maximum suppression across tiles.
+
+        Args:
+            image (Union[str, np.ndarray]): Path to the image file, or the already decoded BGR image.
+            pitch_polygon (Optional[np.ndarray]): The (P, 2) pixel coordinates of the pitch outline, e.g. projected
+                from the pitch corners with the inverse Homography matrix. Tiles not overlapping it are skipped.
+
+        Returns:
+            sv.Detections: A Supervision Detections object containing the detection results.
+        """
+        image = decode_image(image)
+        tiles = tile_grid(image.shape, self.tile_size, self.tile_overlap)
+        if pitch_polygon is not None:
+            tiles = tiles[self._tiles_on_pitch(tiles, pitch_polygon, image.shape)]
+        if len(tiles) == 0:
+            return sv.Detections.empty()
+
+        balls = self._run_model([np.ascontiguousarray(image[y1:y2, x1:x2]) for x1, y1, x2, y2 in tiles])
+        tile_detections = []
+        for ball_detections, (x1, y1, _, _) in zip(balls, tiles):
+            ball_detections.xyxy = ball_detections.xyxy + np.array([x1, y1, x1, y1], dtype=ball_detections.xyxy.dtype)
+            tile_detections.append(ball_detections)
+        return sv.Detections.merge(tile_detections).with_nms(threshold=self.nms_threshold, class_agnostic=True)
+
+    @staticmethod
+    def _tiles_on_pitch(tiles: np.ndarray,
+                        pitch_polygon: np.ndarray,
+                        image_shape: Tuple[int, ...],
+                        scale: int = 8) -> np.ndarray:
+        """
+        Flags the tiles overlapping the pitch polygon, rasterized on a grid downscaled by `scale`.
+        """
+        height, width = image_shape[:2]
+        mask = np.zeros((height // scale + 1, width // scale + 1), dtype=np.uint8)
+        # Polygons reaching far beyond the frame are clipped, so that their coordinates fit in int32
+        polygon = np.clip(np.asarray(pitch_polygon, dtype=np.float64) / scale, -4 * mask.shape[1], 4 * mask.shape[1])
+        cv2.fillPoly(mask, [np.round(polygon).astype(np.int32)], 1)
+        return np.array([mask[y1 // scale:y2 // scale + 1, x1 // scale:x2 // scale + 1].any()
+                         for x1, y1, x2, y2 in tiles], dtype=bool)
     
+    @staticmethod
+    def _most_confident(ball_detections: sv.Detections) -> int:
+        if ball_detections.confidence is None:
+            return 0
+        return int(np.argmax(ball_detections.confidence))
+
     def get_ball_pixels_xy(self, ball_detections: sv.Detections) -> np.ndarray:
         """
-        Extracts the pixel coordinates of the ball as the centre of the detection bounding box.
+        Extracts the pixel coordinates of the ball as the centre of the most confident detection bounding box.
 
         Args:
             ball_detections (sv.Detections): The detection results from which to extract the ball's coordinates.
 
         Returns:
             np.ndarray: A 1D array containing the (x, y) pixel coordinates of the ball's center.
-                        If no ball is detected, an empty array is returned.
+                        If no ball is detected, None is returned.
         """
         if len(ball_detections) == 0:
-            print("No ball detected")
+            logger.debug("No ball detected")
             # raise ValueError("No ball detected")
         else:
-            # Calculate the center of the bounding box for the first detection
+            # Calculate the center of the bounding box for the most confident detection
+            xyxy = ball_detections.xyxy[self._most_confident(ball_detections)]
             ball_pixels_xy = np.array([
-                (ball_detections.xyxy[0][0] + ball_detections.xyxy[0][2]) / 2,  # X-coordinate
-                (ball_detections.xyxy[0][1] + ball_detections.xyxy[0][3]) / 2   # Y-coordinate
+                (xyxy[0] + xyxy[2]) / 2,  # X-coordinate
+                (xyxy[1] + xyxy[3]) / 2   # Y-coordinate
             ])
             return ball_pixels_xy
-    
-    def predict(self, image_path: str) -> np.ndarray:
+
+    def get_ball_confidence(self, ball_detections: sv.Detections) -> float:
+        """
+        Returns the confidence of the detection the ball coordinates are extracted from.
+
+        Args:
+            ball_detections (sv.Detections): The detection results of one image.
+
+        Returns:
+            float: The confidence of the most confident detection, NaN if no ball is detected.
+        """
+        if len(ball_detections) == 0 or ball_detections.confidence is None:
+            return np.nan
+        return float(ball_detections.confidence[self._most_confident(ball_detections)])
+
+    def get_ball_candidates(self, ball_detections: sv.Detections) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extracts every ball candidate, for a tracker to pick the match ball among them.
+
+        Args:
+            ball_detections (sv.Detections): The detection results of one image.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (M, 2) pixel coordinates of the centres of the bounding boxes
+                and their (M,) confidences, sorted by decreasing confidence.
+        """
+        centres = ((ball_detections.xyxy[:, :2] + ball_detections.xyxy[:, 2:]) / 2).astype(np.float32)
+        if ball_detections.confidence is None:
+            return centres, np.ones(len(ball_detections), dtype=np.float32)
+        order = np.argsort(-ball_detections.confidence, kind='stable')
+        return centres[order], ball_detections.confidence[order].astype(np.float32)
+
+    @staticmethod
+    def roi_around(centre_xy: np.ndarray,
+                   size: int,
+                   image_shape: Tuple[int, ...]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Computes a square region of interest centred on a point and clipped to the image.
+
+        Args:
+            centre_xy (np.ndarray): The (x, y) pixel coordinates of the centre of the region.
+            size (int): Side of the square region [px].
+            image_shape (Tuple[int, ...]): Shape of the image.
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: The (x1, y1, x2, y2) region, None if less than half of it
+                falls inside the image.
+        """
+        height, width = image_shape[:2]
+        x1, y1 = int(round(centre_xy[0] - size / 2)), int(round(centre_xy[1] - size / 2))
+        x2, y2 = x1 + size, y1 + size
+        x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+        if (x2 - x1) < size / 2 or (y2 - y1) < size / 2:
+            return None
+        return x1, y1, x2, y2
+
+    def predict(self, image: Union[str, np.ndarray], pitch_polygon: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Runs the ball detection steps, returning the pixel coordinates of the detected soccer ball.
 
         Args:
-            image_path (str): Path to the image file on which to perform the detection.
+            image (Union[str, np.ndarray]): Path to the image file, or the already decoded BGR image, on which to perform the detection.
+            pitch_polygon (Optional[np.ndarray]): With tiled detection, the pixel coordinates of the pitch outline.
 
         Returns:
-            np.ndarray: A 1D array containing the (x, y) pixel coordinates of the ball's center.
+            np.ndarray: A 1D array containing the (x, y) pixel coordinates of the ball's center, NaN if no ball is detected.
         """
-        self.ball_detections = self.get_detections(image_path)
+        self.ball_detections = self.get_detections(image, pitch_polygon=pitch_polygon)
         ball_pixels_xy = self.get_ball_pixels_xy(self.ball_detections)
 
         if ball_pixels_xy is not None:
             return ball_pixels_xy
         else:
-            return np.array([-10, -10])   
+            return np.full(2, np.nan)
+
+    def predict_batch(self,
+                      images: Sequence[Union[str, np.ndarray]],
+                      pitch_polygons: Optional[Sequence[Optional[np.ndarray]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs the ball detection steps on a batch of images with a single model call.
+
+        Args:
+            images (Sequence[Union[str, np.ndarray]]): Image paths or BGR images forming one inference batch.
+            pitch_polygons (Optional[Sequence[Optional[np.ndarray]]]): With tiled detection, the pixel coordinates
+                of the pitch outline of each image, None where unknown.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: A tuple containing:
+                - An (N, 2) array with the (x, y) pixel coordinates of the ball in each image, NaN if no ball is detected
+                - An (N,) array with the confidence of each ball detection, NaN if no ball is detected
+        """
+        ball_detections_batch = self.get_detections_batch(images, pitch_polygons)
+        ball_pixels_xy = np.full((len(ball_detections_batch), 2), np.nan, dtype=np.float32)
+        ball_confidence = np.full(len(ball_detections_batch), np.nan, dtype=np.float32)
+        for i, ball_detections in enumerate(ball_detections_batch):
+            if len(ball_detections) > 0:
+                ball_pixels_xy[i] = self.get_ball_pixels_xy(ball_detections)
+                ball_confidence[i] = self.get_ball_confidence(ball_detections)
+        return ball_pixels_xy, ball_confidence
@@ -0,0 +1,420 @@
+"""
+Locates the ball on every frame of an image directory, an image glob or a video, and writes the ball
+coordinates to CSV, Parquet or JSONL.
+
+    python -m pipeline frames/ --ball-model ball.pt --pitch-model pitch.pt --output ball.csv --workers 4
+    python -m pipeline "clips/*.jpg" --output ball.parquet
+    python -m pipeline match.mp4 --output ball.jsonl
+
+Results are appended to a staging file as batches complete, and a checkpoint next to the output records how
+far the run got: running the same command again after an interruption resumes where it stopped.
+
+With several workers, each worker decodes its own ranges of the video, so that frames are never sent between
+processes.
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, islice
+import cv2
+import numpy as np
+# Typing
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+# Pipeline
+try:
+    from pipeline import BallPositionPipeline
+except ImportError:
+    # Run as `python -m pipeline`, where "pipeline" is the package rather than the module
+    from pipeline.pipeline import BallPositionPipeline
+# Status codes
+from constants import PipelineStatus
+# Results
+from results import RESULT_DTYPE
+# Video decoding
+from frames import VideoFrameReader
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+OUTPUT_FORMATS = ("csv", "parquet", "jsonl")
+FIELDS = ("frame_idx", "source", "status", "pixel_x", "pixel_y", "pitch_x", "pitch_y", "confidence")
+# Batches of frames decoded by a worker from a single seek into the video
+BATCHES_PER_VIDEO_RANGE = 32
+
+# Pipeline loaded once by each worker process
+_worker_pipeline: Optional[BallPositionPipeline] = None
+
+
+def list_images(input_path: str) -> Optional[List[str]]:
+    """
+    Lists the images of a directory, a glob pattern or a single image file, in sorted order.
+
+    Args:
+        input_path (str): The directory, glob pattern or file given on the command line.
+
+    Returns:
+        Optional[List[str]]: The image paths, or None if the input is a video.
+    """
+    if os.path.isdir(input_path):
+        paths = [os.path.join(input_path, name) for name in os.listdir(input_path)]
+    elif glob.has_magic(input_path):
+        paths = glob.glob(input_path)
+    elif input_path.lower().endswith(IMAGE_EXTENSIONS):
+        return [input_path]
+    else:
+        return None
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def count_video_frames(video_path: str) -> Optional[int]:
+    """
+    Returns the number of frames declared by the video container, None if unknown.
+    """
+    capture = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    return frame_count if frame_count > 0 else None
+
+
+def load_worker_pipeline(ball_detector_model_path: str,
+                         pitch_detector_model_path: str,
+                         device: Optional[str] = None,
+                         ball_tile_size: Optional[int] = None) -> None:
+    """
+    Loads and warms up the pipeline of a worker process, once, when the worker starts.
+
+    Args:
+        ball_detector_model_path (str): Path to the ball detection YOLO model file.
+        pitch_detector_model_path (str): Path to the pitch detection YOLO model file.
+        device (Optional[str]): Device the models run on.
+        ball_tile_size (Optional[int]): Side [px] of the tiles the ball is detected on, None for the full frame.
+    """
+    global _worker_pipeline
+    _worker_pipeline = BallPositionPipeline(ball_detector_model_path, pitch_detector_model_path,
+                                            device=device, ball_tile_size=ball_tile_size)
+    _worker_pipeline.warmup()
+
+
+def locate_batch(frame_indices: List[int], sources: List[str], frames: Sequence) -> Tuple[List[int], List[str], np.ndarray]:
+    """
+    Locates the ball on a batch of frames with the pipeline of the worker process.
+
+    Args:
+        frame_indices (List[int]): The indices of the frames.
+        sources (List[str]): The source of each frame.
+        frames (Sequence): Image paths or decoded BGR frames.
+
+    Returns:
+        Tuple[List[int], List[str], np.ndarray]: The frame indices, the sources and an (N,) structured array of
+            RESULT_DTYPE.
+    """
+    return frame_indices, sources, _worker_pipeline.predict_batch(frames, batch_size=len(frames), structured=True)
+
+
+def locate_video_range(video_path: str,
+                       start_frame: int,
+                       stop_frame: int,
+                       batch_size: int) -> Tuple[List[int], List[str], np.ndarray]:
+    """
+    Decodes the frames [start_frame, stop_frame) of a video in the worker process, seeking once, and locates
+    the ball on them with the pipeline of the worker process.
+
+    Returns:
+        Tuple[List[int], List[str], np.ndarray]: The frame indices, the sources and the results of the frames,
+            fewer than requested, or none, at the end of the video.
+    """
+    frame_indices, results = [], []
+    for batch_indices, sources, frames in iter_batches(video_path, None, start_frame, batch_size, stop_frame):
+        frame_indices.extend(batch_indices)
+        results.append(locate_batch(batch_indices, sources, frames)[2])
+    results = np.concatenate(results) if results else np.empty(0, dtype=RESULT_DTYPE)
+    return frame_indices, [video_path] * len(frame_indices), results
+
+
+def iter_batches(input_path: str,
+                 image_paths: Optional[List[str]],
+                 start_idx: int,
+                 batch_size: int,
+                 stop_idx: Optional[int] = None) -> Iterator[Tuple[List[int], List[str], list]]:
+    """
+    Splits the frames left to process into batches. Images are sent to the workers as paths and decoded there,
+    video frames are decoded in this process.
+
+    Yields:
+        Tuple[List[int], List[str], list]: The frame indices, the sources and the frames (paths or BGR images).
+    """
+    if image_paths is not None:
+        for batch_start in range(start_idx, len(image_paths), batch_size):
+            batch = image_paths[batch_start:batch_start + batch_size]
+            yield list(range(batch_start, batch_start + len(batch))), batch, batch
+        return
+
+    frame_indices, frames = [], []
+    reader = VideoFrameReader(input_path, start_frame=start_idx)
+    for frame_idx, frame in islice(reader, None if stop_idx is None else stop_idx - start_idx):
+        frame_indices.append(frame_idx)
+        frames.append(frame)
+        if len(frames) == batch_size:
+            yield frame_indices, [input_path] * len(frames), frames
+            frame_indices, frames = [], []
+    if frames:
+        yield frame_indices, [input_path] * len(frames), frames
+
+
+def iter_tasks(input_path: str,
+               image_paths: Optional[List[str]],
+               start_idx: int,
+               batch_size: int,
+               workers: int) -> Iterator[Tuple[Callable, tuple]]:
+    """
+    Splits the frames left to process into tasks for map_batches. With several workers, a video is split into
+    ranges of frames that each worker decodes itself, until a range comes back empty at the end of the video.
+    Otherwise every batch is a task, with video frames decoded by a background thread of this process.
+
+    Yields:
+        Tuple[Callable, tuple]: The function of the task and its arguments.
+    """
+    if image_paths is None and workers > 1:
+        range_size = batch_size * BATCHES_PER_VIDEO_RANGE
+        for range_start in count(start_idx, range_size):
+            yield locate_video_range, (input_path, range_start, range_start + range_size, batch_size)
+        return
+    for batch in iter_batches(input_path, image_paths, start_idx, batch_size):
+        yield locate_batch, batch
+
+
+def map_batches(tasks: Iterator[Tuple[Callable, tuple]],
+                workers: int,
+                initargs: tuple) -> Iterator[Tuple[List[int], List[str], np.ndarray]]:
+    """
+    Runs the pipeline on every task, in worker processes when more than one worker is requested.
+    Results are yielded in input order, and at most two tasks per worker are in flight, so that memory stays
+    bounded however long the video is. The first task returning no frame ends the run.
+
+    Yields:
+        Tuple[List[int], List[str], np.ndarray]: The frame indices, the sources and the results of each task.
+    """
+    if workers <= 1:
+        load_worker_pipeline(*initargs)
+        for function, args in tasks:
+            frame_indices, sources, results = function(*args)
+            if not frame_indices:
+                return
+            yield frame_indices, sources, results
+        return
+
+    # Workers decode their own video ranges, so that no decoding thread runs in this process when the pool forks
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_worker_pipeline, initargs=initargs) as executor:
+        pending = deque()
+        try:
+            for function, args in tasks:
+                pending.append(executor.submit(function, *args))
+                if len(pending) >= 2 * workers:
+                    frame_indices, sources, results = pending.popleft().result()
+                    if not frame_indices:
+                        return
+                    yield frame_indices, sources, results
+            while pending:
+                frame_indices, sources, results = pending.popleft().result()
+                if not frame_indices:
+                    return
+                yield frame_indices, sources, results
+        finally:
+            # Ranges submitted past the end of the video are not worth running
+            executor.shutdown(cancel_futures=True)
+
+
+def to_rows(frame_indices: List[int], sources: List[str], results: np.ndarray) -> List[Dict]:
+    """
+    Converts the results of a batch into output rows, with None for coordinates that could not be computed.
+    """
+    def finite_or_none(value: float) -> Optional[float]:
+        return float(value) if np.isfinite(value) else None
+
+    return [{"frame_idx": frame_idx,
+             "source": source,
+             "status": PipelineStatus(int(result["status"])).name,
+             "pixel_x": finite_or_none(result["pixel_xy"][0]),
+             "pixel_y": finite_or_none(result["pixel_xy"][1]),
+             "pitch_x": finite_or_none(result["pitch_xy"][0]),
+             "pitch_y": finite_or_none(result["pitch_xy"][1]),
+             "confidence": finite_or_none(result["confidence"])}
+            for frame_idx, source, result in zip(frame_indices, sources, results)]
+
+
+class Checkpoint:
+    """
+    The Checkpoint class records how far a run got, so that an interrupted run resumes where it stopped.
+    Rows are appended to a JSONL staging file, and after each batch the checkpoint stores the index of the next
+    frame and the size of the staging file, which is written atomically after the rows are flushed to disk.
+
+    Attributes:
+        path (str): Path of the checkpoint file.
+        staging_path (str): Path of the staging file.
+        next_idx (int): Index of the first frame not processed yet.
+    """
+
+    def __init__(self, output_path: str, run_config: Dict, restart: bool = False) -> None:
+        """
+        Opens the checkpoint of the given output, resuming the run if a checkpoint of the same run exists.
+
+        Args:
+            output_path (str): Path of the output file.
+            run_config (Dict): Input and models of the run, which must match those of the checkpoint to resume.
+            restart (bool): Whether to discard an existing checkpoint.
+
+        Raises:
+            ValueError: If a checkpoint of a different run exists and restart is False.
+        """
+        self.path = output_path + ".checkpoint.json"
+        self.staging_path = output_path + ".partial.jsonl"
+        self.run_config = run_config
+        self.next_idx = 0
+        staging_size = 0
+        if os.path.exists(self.path) and not restart:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state["run"] != run_config:
+                raise ValueError(f"{self.path} belongs to a different run, pass --restart to discard it.")
+            self.next_idx = state["next_idx"]
+            staging_size = state["staging_size"]
+        # Drop the rows written after the last checkpoint, which are processed again
+        self.staging = open(self.staging_path, "a+b")
+        self.staging.truncate(staging_size)
+
+    def append(self, rows: List[Dict], next_idx: int) -> None:
+        """
+        Appends the rows of a batch to the staging file and moves the checkpoint past them.
+
+        Args:
+            rows (List[Dict]): The output rows of the batch.
+            next_idx (int): Index of the first frame after the batch.
+        """
+        self.staging.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+        self.staging.flush()
+        os.fsync(self.staging.fileno())
+        self.next_idx = next_idx
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"run": self.run_config, "next_idx": next_idx, "staging_size": self.staging.tell()}, f)
+        os.replace(temporary_path, self.path)
+
+    def finish(self, output_path: str, output_format: str) -> None:
+        """
+        Writes the output file from the staging file, then removes the staging and checkpoint files.
+
+        Args:
+            output_path (str): Path of the output file.
+            output_format (str): One of OUTPUT_FORMATS.
+        """
+        self.staging.close()
+        write_output(self.staging_path, output_path, output_format)
+        if os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def write_output(staging_path: str, output_path: str, output_format: str) -> None:
+    """
+    Converts the JSONL staging file to the requested output format.
+
+    Args:
+        staging_path (str): Path of the staging file.
+        output_path (str): Path of the output file.
+        output_format (str): One of OUTPUT_FORMATS.
+
+    Raises:
+        ImportError: If Parquet output is requested without pandas and pyarrow installed.
+    """
+    if output_format == "jsonl":
+        os.replace(staging_path, output_path)
+    elif output_format == "csv":
+        with open(staging_path) as staging, open(output_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for line in staging:
+                writer.writerow(json.loads(line))
+    else:
+        try:
+            import pandas as pd
+        except ImportError as error:
+            raise ImportError("Parquet output requires pandas and pyarrow: pip install pandas pyarrow") from error
+        with open(staging_path) as staging:
+            rows = [json.loads(line) for line in staging]
+        pd.DataFrame(rows, columns=list(FIELDS)).to_parquet(output_path, index=False)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Directory of images, glob pattern of images, or video file.")
+    parser.add_argument("--output", "-o", required=True, help="Output file, .csv, .parquet or .jsonl.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="Output format, by default from the output extension.")
+    parser.add_argument("--ball-model", default=os.environ.get("BALL_DETECTOR_MODEL_PATH"),
+                        help="Path to the ball detection model, .pt or .onnx (default: $BALL_DETECTOR_MODEL_PATH).")
+    parser.add_argument("--pitch-model", default=os.environ.get("PITCH_DETECTOR_MODEL_PATH"),
+                        help="Path to the pitch detection model, .pt or .onnx (default: $PITCH_DETECTOR_MODEL_PATH).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes, each loading the models once.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of frames sent to each model in a single call.")
+    parser.add_argument("--device", help="Device the models run on, e.g. cpu or cuda:0.")
+    parser.add_argument("--ball-tile-size", type=int, help="Detect the ball on overlapping tiles of this side [px].")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint of a previous run.")
+    args = parser.parse_args(argv)
+
+    if args.ball_model is None or args.pitch_model is None:
+        parser.error("--ball-model and --pitch-model are required unless set through the environment.")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1.")
+    if args.format is None:
+        args.format = os.path.splitext(args.output)[1].lstrip(".").lower()
+        if args.format not in OUTPUT_FORMATS:
+            parser.error(f"Cannot infer the output format of {args.output!r}, pass --format.")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    image_paths = list_images(args.input)
+    if image_paths is not None and not image_paths:
+        sys.exit(f"No images found in {args.input!r}.")
+    total = len(image_paths) if image_paths is not None else count_video_frames(args.input)
+    run_config = {"input": os.path.abspath(args.input),
+                  "ball_model": os.path.abspath(args.ball_model),
+                  "pitch_model": os.path.abspath(args.pitch_model),
+                  "ball_tile_size": args.ball_tile_size}
+    try:
+        checkpoint = Checkpoint(args.output, run_config, restart=args.restart)
+    except ValueError as error:
+        sys.exit(str(error))
+    if checkpoint.next_idx > 0:
+        logger.info("Resuming from frame %d", checkpoint.next_idx)
+
+    tasks = iter_tasks(args.input, image_paths, checkpoint.next_idx, args.batch_size, args.workers)
+    initargs = (args.ball_model, args.pitch_model, args.device, args.ball_tile_size)
+    processed = 0
+    start = time.perf_counter()
+    for frame_indices, sources, results in map_batches(tasks, args.workers, initargs):
+        checkpoint.append(to_rows(frame_indices, sources, results), frame_indices[-1] + 1)
+        processed += len(frame_indices)
+        fps = processed / (time.perf_counter() - start)
+        print(f"\r{checkpoint.next_idx}/{total or '?'} frames | {fps:.1f} fps", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+    checkpoint.finish(args.output, args.format)
+    logger.info("Wrote %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,21 @@
+from enum import IntEnum
+
+
 class PitchDetectionConstants:
     CLASS_MAPPING = {
             "D1": 0, "D2": 4, "D3": 5, "D4": 6, "D5": 7, "D6": 8, "D7": 9, "D8": 10, "D9": 11, "D10": 1, "D11": 2, "D12": 3,
             "M1": 12, "M2": 13, "M3": 14, "M4": 15,
             "O1": 16, "O2": 20, "O3": 21, "O4": 22, "O5": 23, "O6": 24, "O7": 25, "O8": 26, "O9": 27, "O10": 17, "O11": 18, "O12": 19
-            }
\ No newline at end of file
+            }
+
+
+class PipelineStatus(IntEnum):
+    """
+    Outcome of locating the ball on a single frame.
+    """
+    OK = 0
+    NO_BALL = 1
+    NOT_ENOUGH_KEYPOINTS = 2
+    HOMOGRAPHY_FAILED = 3
+    # Ball position interpolated by the tracker over a short gap without detections
+    INTERPOLATED = 4
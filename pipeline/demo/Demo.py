@@ -7,6 +7,25 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from pipeline import BallPositionPipeline
+from frames import decode_image
+from constants import PipelineStatus
+from result_cache import ResultCache
+
+# Model paths can be overridden through the environment, as for `python -m pipeline`
+BALL_DETECTOR_MODEL_PATH = os.environ.get('BALL_DETECTOR_MODEL_PATH', r'C:\Users\leoac\vtg-automation\ball_position_estimation\models\ball_detector_yolov10m_ultralytics=8.2.71.pt')
+PITCH_DETECTOR_MODEL_PATH = os.environ.get('PITCH_DETECTOR_MODEL_PATH', r'C:\Users\leoac\vtg-automation\ball_position_estimation\models\pitch_detector_YOLOv8x-pose.pt')
+
+
+@st.cache_resource
+def warmup_models() -> None:
+    # Runs once per process: the models stay loaded in the model registry across reruns
+    BallPositionPipeline(BALL_DETECTOR_MODEL_PATH, PITCH_DETECTOR_MODEL_PATH).warmup()
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # Shared across reruns, so that toggling a checkbox does not run the models on the same upload again
+    return ResultCache(max_entries=64)
 
 st.title("Automatic Ball Position - DEMO")
 
@@ -14,24 +33,19 @@ st.write("Upload a frame of a soccer match")
 uploaded_file = st.file_uploader("Upload an image", type=["jpg", "jpeg", "png"])
 
 if uploaded_file is not None:
-   # Read the image in BGR format
-    image_bgr = cv2.imdecode(np.frombuffer(uploaded_file.read(), np.uint8), 1)
+    # Decode the upload once, straight from its in-memory buffer
+    image_bgr = decode_image(uploaded_file.getbuffer())
     # Convert BGR to RGB
     image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
     # Display the uploaded image in RGB format
     st.image(image_rgb, caption='Uploaded Image', use_column_width=True)
 
-    # Save the uploaded file temporarily
-    with open("temp_image.jpg", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    # Get the local file path
-    image_path = "temp_image.jpg"
-
-    # Instantiate the pipeline
+    # Instantiate the pipeline, whose models are loaded and warmed up once per process
+    warmup_models()
     pipeline = BallPositionPipeline(
-        ball_detector_model_path=r'C:\Users\leoac\vtg-automation\ball_position_estimation\models\ball_detector_yolov10m_ultralytics=8.2.71.pt',
-        pitch_detector_model_path=r'C:\Users\leoac\vtg-automation\ball_position_estimation\models\pitch_detector_YOLOv8x-pose.pt'
+        ball_detector_model_path=BALL_DETECTOR_MODEL_PATH,
+        pitch_detector_model_path=PITCH_DETECTOR_MODEL_PATH,
+        result_cache=get_result_cache()
     )
 
     col1, col2 = st.columns(2)
@@ -41,17 +55,22 @@ if uploaded_file is not None:
     with col2:
         radar_button = st.checkbox("Plot radar")
     predict_button = st.button("Extract ball position")
-
+    # Keep showing the results of this upload when a checkbox is toggled, which reruns the script
+    upload_id = (uploaded_file.name, uploaded_file.size)
     if predict_button:
+        st.session_state["predicted_upload"] = upload_id
+
+    if st.session_state.get("predicted_upload") == upload_id:
         # Predict using the pipeline
         with st.spinner("Extracting ball position..."): # Spinner while the pipeline is processing
-            ball_x, ball_y = pipeline.predict(image_path)
+            result = pipeline.predict(image_bgr)
+        ball_x, ball_y = result.pitch_xy
 
-        if (ball_x, ball_y) == (-10,-10):
+        if result.status == PipelineStatus.NO_BALL:
             st.error("No ball detected.")
-        elif (ball_x, ball_y) == (-1,-1):
+        elif result.status == PipelineStatus.NOT_ENOUGH_KEYPOINTS:
             st.error("Not enough keypoints detected.")
-        elif (ball_x, ball_y) == (-100, -100):
+        elif result.status == PipelineStatus.HOMOGRAPHY_FAILED:
             st.error("Problems obtaining the homography matrix.")
         elif (ball_x > 105) or (ball_x < 0) or (ball_y > 68) or (ball_y < 0):
             st.write(f"Ball position: ({round(ball_x, 1)}, {round(ball_y, 1)})")
@@ -64,11 +83,7 @@ if uploaded_file is not None:
             annotated_image = cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB)
             st.image(annotated_image, "Annotated image")
 
-        if radar_button:
+        if radar_button and result.ok:
             fig2, ax2 = pipeline.plot_radar(ball_x, ball_y, pitch_length=105, pitch_width=68)
             ax2.set_xlabel("Radar plot", fontsize=16)
             st.pyplot(fig2)
-
-    # Clean up: remove the temporary file
-    import os
-    os.remove(image_path)
@@ -0,0 +1,86 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import supervision as sv
+import numpy as np
+# Typing
+from typing import List, Optional, Tuple
+# Ball detection
+from ball_detector import BallDetector
+from model_registry import MODEL_REGISTRY
+
+EXECUTOR_KINDS = ("thread", "process")
+
+# Ball detector pre-loaded once by each worker process
+_worker_ball_detector: Optional[BallDetector] = None
+
+
+def create_executor(kind: str,
+                    ball_detector_model_path: str,
+                    max_workers: int = 1,
+                    device: Optional[str] = None,
+                    tile_size: Optional[int] = None) -> Executor:
+    """
+    Creates the executor that runs ball detection while the calling thread detects the pitch.
+
+    Args:
+        kind (str): "thread" for a thread pool sharing the pipeline's ball detector, or "process" for a process
+            pool in which every worker pre-loads its own ball detector.
+        ball_detector_model_path (str): Path to the ball detection YOLO model file, loaded by process workers.
+        max_workers (int): Number of threads or processes of the pool.
+        device (Optional[str]): Device the ball detection model of process workers runs on.
+        tile_size (Optional[int]): Side of the tiles the ball detector of process workers runs on, None for whole frames.
+
+    Returns:
+        Executor: The thread or process pool.
+
+    Raises:
+        ValueError: If the kind of executor is unknown.
+    """
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ball-detector")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers,
+                                   initializer=load_worker_ball_detector,
+                                   initargs=(ball_detector_model_path, device, tile_size))
+    raise ValueError(f"Unknown executor {kind!r}, expected one of {EXECUTOR_KINDS}.")
+
+
+def load_worker_ball_detector(model_path: str, device: Optional[str] = None, tile_size: Optional[int] = None) -> None:
+    """
+    Loads the ball detector of a worker process, once, when the worker starts.
+
+    Args:
+        model_path (str): Path to the ball detection YOLO model file.
+        device (Optional[str]): Device the model runs on.
+        tile_size (Optional[int]): Side of the tiles the ball is detected on, None for whole frames.
+    """
+    global _worker_ball_detector
+    _worker_ball_detector = BallDetector(model_path, device, tile_size=tile_size)
+    MODEL_REGISTRY.warmup(model_path, device)
+
+
+def detect_ball(image: np.ndarray) -> Tuple[np.ndarray, sv.Detections]:
+    """
+    Runs the ball detection steps in a worker process.
+
+    Args:
+        image (np.ndarray): The decoded BGR frame.
+
+    Returns:
+        Tuple[np.ndarray, sv.Detections]: The (x, y) pixel coordinates of the ball and the ball detections.
+    """
+    ball_pixels_xy = _worker_ball_detector.predict(image)
+    return ball_pixels_xy, _worker_ball_detector.ball_detections
+
+
+def detect_ball_batch(images: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Runs the ball detection steps on a batch of frames in a worker process.
+
+    Args:
+        images (List[np.ndarray]): The decoded BGR frames.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (N, 2) pixel coordinates of the ball and the (N,) detection
+            confidences, NaN where no ball is detected.
+    """
+    return _worker_ball_detector.predict_batch(images)
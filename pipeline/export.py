@@ -0,0 +1,62 @@
+"""
+Exports a YOLO `.pt` model to ONNX, for the ONNX Runtime backend of the detectors.
+
+    python pipeline/export.py ball.pt --imgsz 640
+    python pipeline/export.py pitch.pt --int8
+
+The exported file is written next to the `.pt` file and can be passed wherever a model path is expected, e.g.
+`python -m pipeline frames/ --ball-model ball.onnx --pitch-model pitch.onnx --output ball.csv`.
+With --int8 the weights are also quantized to 8 bits, which speeds up CPU inference at some cost in accuracy.
+"""
+import argparse
+import os
+# Typing
+from typing import Optional, Sequence
+
+
+def export_onnx(model_path: str,
+                imgsz: int = 640,
+                half: bool = False,
+                int8: bool = False,
+                dynamic: bool = True,
+                device: Optional[str] = None) -> str:
+    """
+    Exports a YOLO model to ONNX, optionally quantized.
+
+    Args:
+        model_path (str): Path to the `.pt` model file.
+        imgsz (int): Side of the square model input.
+        half (bool): Whether to export fp16 weights. ultralytics requires a CUDA device for this.
+        int8 (bool): Whether to quantize the weights of the exported model to int8 with ONNX Runtime.
+        dynamic (bool): Whether the batch size and image size of the input are dynamic.
+        device (Optional[str]): Device the export runs on, e.g. "cuda:0" for fp16.
+
+    Returns:
+        str: Path to the exported `.onnx` file, suffixed with `-int8` when quantized.
+    """
+    from ultralytics import YOLO
+    onnx_path = YOLO(model_path).export(format="onnx", imgsz=imgsz, half=half, dynamic=dynamic,
+                                        simplify=True, device=device)
+    if not int8:
+        return onnx_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_path = os.path.splitext(onnx_path)[0] + "-int8.onnx"
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="Path to the YOLO .pt model file.")
+    parser.add_argument("--imgsz", type=int, default=640, help="Side of the square model input.")
+    parser.add_argument("--half", action="store_true", help="Export fp16 weights (needs a CUDA device).")
+    parser.add_argument("--int8", action="store_true", help="Quantize the weights to int8 for CPU inference.")
+    parser.add_argument("--static", action="store_true", help="Export a fixed input shape with batch size 1.")
+    parser.add_argument("--device", help="Device the export runs on, e.g. cuda:0.")
+    args = parser.parse_args(argv)
+    print(export_onnx(args.model, args.imgsz, args.half, args.int8, dynamic=not args.static, device=args.device))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from queue import Full, Queue
+from threading import Event, Thread
+import cv2
+import numpy as np
+# Typing
+from typing import Iterator, Tuple, Union
+
+# Marks the end of the decoded frames in the queue
+_END_OF_STREAM = object()
+
+
+def decode_image(image: Union[str, np.ndarray, bytes, bytearray, memoryview]) -> np.ndarray:
+    """
+    Returns the BGR image of the given source, decoding it only if it is not decoded already.
+
+    Encoded bytes are wrapped in a zero-copy NumPy view before decoding, so an upload buffer can be
+    decoded in place without being copied or written to disk first.
+
+    Args:
+        image (Union[str, np.ndarray, bytes, bytearray, memoryview]): Path to an image file, an already decoded
+            BGR image, or the encoded bytes of an image.
+
+    Returns:
+        np.ndarray: The decoded BGR image.
+
+    Raises:
+        ValueError: If the image cannot be read or decoded.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, str):
+        decoded_image = cv2.imread(image, cv2.IMREAD_COLOR)
+    else:
+        buffer = np.frombuffer(image, dtype=np.uint8)
+        if buffer.size == 0:
+            raise ValueError("Image buffer is empty.")
+        try:
+            decoded_image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        except cv2.error as error:
+            raise ValueError(f"Image could not be decoded: {error}") from error
+    if decoded_image is None:
+        raise ValueError("Image could not be read or decoded.")
+    return decoded_image
+
+
+class VideoFrameReader:
+    """
+    The VideoFrameReader class decodes the frames of a video with cv2.VideoCapture in a background thread,
+    so that decoding overlaps with the inference run on the frames already decoded.
+    Frames are handed over through a bounded queue, which keeps memory constant however long the video is.
+
+    Attributes:
+        video_source (Union[str, int]): Path or URL of the video, or index of a capture device.
+        queue_size (int): Maximum number of decoded frames waiting to be consumed.
+        start_frame (int): Index of the first frame decoded, e.g. to resume an interrupted run.
+    """
+
+    def __init__(self, video_source: Union[str, int], queue_size: int = 32, start_frame: int = 0) -> None:
+        """
+        Initializes the VideoFrameReader.
+
+        Args:
+            video_source (Union[str, int]): Path or URL of the video, or index of a capture device.
+            queue_size (int): Maximum number of decoded frames waiting to be consumed.
+            start_frame (int): Index of the first frame decoded. Earlier frames are skipped by seeking.
+        """
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1.")
+        if start_frame < 0:
+            raise ValueError("start_frame must be non-negative.")
+        self.video_source = video_source
+        self.queue_size = queue_size
+        self.start_frame = start_frame
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decodes the video in a background thread and yields its frames in order.
+
+        Yields:
+            Tuple[int, np.ndarray]: The index of the frame and the decoded BGR frame.
+
+        Raises:
+            ValueError: If the video source cannot be opened.
+        """
+        capture = cv2.VideoCapture(self.video_source)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video source {self.video_source!r}.")
+        if self.start_frame > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+
+        frames = Queue(maxsize=self.queue_size)
+        stop = Event()
+        decoder = Thread(target=self._decode, args=(capture, frames, stop), daemon=True)
+        decoder.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Also reached when the consumer stops early: let the decoder thread exit
+            stop.set()
+            decoder.join()
+
+    def _decode(self, capture: cv2.VideoCapture, frames: Queue, stop: Event) -> None:
+        """
+        Reads frames from the capture into the queue until the video ends or the reader is stopped.
+
+        Args:
+            capture (cv2.VideoCapture): The opened video capture.
+            frames (Queue): The bounded queue the decoded frames are put into.
+            stop (Event): Set by the consumer when no more frames are needed.
+        """
+        try:
+            frame_idx = self.start_frame
+            while not stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                if not self._put(frames, (frame_idx, frame), stop):
+                    return
+                frame_idx += 1
+            self._put(frames, _END_OF_STREAM, stop)
+        except Exception as error:
+            self._put(frames, error, stop)
+        finally:
+            capture.release()
+
+    @staticmethod
+    def _put(frames: Queue, item: object, stop: Event) -> bool:
+        """
+        Puts an item in the queue, waiting for a free slot unless the reader is stopped.
+
+        Returns:
+            bool: True if the item was queued, False if the reader was stopped first.
+        """
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
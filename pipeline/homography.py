@@ -1,14 +1,115 @@
-from typing import Tuple
+import logging
+from typing import Dict, Optional, Tuple
 import cv2
 import numpy as np
 import numpy.typing as npt
+# Status codes
+from constants import PipelineStatus
+
+logger = logging.getLogger(__name__)
+
+
+def project_points(points: npt.ArrayLike, H: npt.ArrayLike) -> npt.NDArray[np.float32]:
+    """
+    Project points with precomputed Homography matrices, for one or many frames at once.
+    The projective math of every point of every frame is done in a single einsum.
+
+    Args:
+        points (npt.ArrayLike): Points with shape (N, 2), or (F, N, 2) for F frames.
+        H (npt.ArrayLike): A (3, 3) Homography matrix, or (F, 3, 3) matrices, one per frame.
+
+    Returns:
+        npt.NDArray[np.float32]: Projected points, with the shape of the points broadcast against the matrices.
+            Points at infinity are NaN.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    H = np.asarray(H, dtype=np.float64)
+    homogeneous_points = np.concatenate([points, np.ones(points.shape[:-1] + (1,))], axis=-1)
+    projected = np.einsum('...ij,...nj->...ni', H, homogeneous_points)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        projected_xy = projected[..., :2] / projected[..., 2:]
+    projected_xy[~np.isfinite(projected_xy)] = np.nan
+    return projected_xy.astype(np.float32)
+
+
+def invert_homography(H: npt.ArrayLike) -> np.ndarray:
+    """
+    Invert one (3, 3) or many (F, 3, 3) Homography matrices, e.g. to project from the pitch to the image.
+
+    Args:
+        H (npt.ArrayLike): The Homography matrices.
+
+    Returns:
+        np.ndarray: The inverse matrices, normalized so that their last element is 1.
+    """
+    H_inv = np.linalg.inv(np.asarray(H, dtype=np.float64))
+    return H_inv / H_inv[..., 2:, 2:]
+
+
+def clip_polygon(polygon: np.ndarray, normal: npt.ArrayLike, offset: float = 0.0) -> np.ndarray:
+    """
+    Clip a polygon to the half-space where `polygon @ normal + offset >= 0` (one Sutherland-Hodgman step).
+
+    Args:
+        polygon (np.ndarray): The (P, D) vertices of the polygon, in order around its outline.
+        normal (npt.ArrayLike): The (D,) normal of the boundary, pointing into the kept half-space.
+        offset (float): Offset of the boundary.
+
+    Returns:
+        np.ndarray: The (Q, D) vertices of the clipped polygon, (0, D) if nothing is kept.
+    """
+    distances = polygon @ np.asarray(normal, dtype=np.float64) + offset
+    clipped = []
+    for i in range(len(polygon)):
+        j = (i + 1) % len(polygon)
+        if distances[i] >= 0:
+            clipped.append(polygon[i])
+        if (distances[i] >= 0) != (distances[j] >= 0):
+            clipped.append(polygon[i] + (polygon[j] - polygon[i]) * distances[i] / (distances[i] - distances[j]))
+    return np.array(clipped, dtype=np.float64).reshape(-1, polygon.shape[1])
+
+
+# Estimators of the Homography matrix: least squares on all points, RANSAC, USAC MAGSAC++,
+# and least squares refitted on the RANSAC inliers only
+HOMOGRAPHY_METHODS = {
+    "lstsq": 0,
+    "ransac": cv2.RANSAC,
+    "magsac": cv2.USAC_MAGSAC,
+    "ransac_inliers": cv2.RANSAC,
+}
 
 
 class HomographyTransformer:
-    def __init__(self) -> None:
-        pass
+    def __init__(self,
+                 method: str = "lstsq",
+                 ransac_reproj_threshold: float = 100.0,
+                 max_iters: int = 2000,
+                 confidence: float = 0.995) -> None:
+        """
+        Initializes the HomographyTransformer with the estimator used to fit the Homography matrix.
+
+        Args:
+            method (str): One of "lstsq", "ransac", "magsac" or "ransac_inliers".
+            ransac_reproj_threshold (float): Maximum distance [cm] on the pitch for a keypoint to be an inlier.
+            max_iters (int): Maximum number of robust estimator iterations.
+            confidence (float): Confidence level of the robust estimators.
+
+        Raises:
+            ValueError: If the method is unknown.
+        """
+        if method not in HOMOGRAPHY_METHODS:
+            raise ValueError(f"Unknown homography method {method!r}, expected one of {list(HOMOGRAPHY_METHODS)}.")
+        self.method = method
+        self.ransac_reproj_threshold = ransac_reproj_threshold
+        self.max_iters = max_iters
+        self.confidence = confidence
+        # Last fitted Homography matrix, used by transform_image
+        self.H = None
+        # Remap tables of the last warp and the (matrix, resolution) they were computed for
+        self._warp_maps = None
+        self._warp_maps_key = None
+        self._last_warp_key = None
 
-    
     def get_homography_matrix(self,
                               detected_keypoints: npt.NDArray[np.float32],
                               pitch_vertices: npt.NDArray[np.float32]) -> np.ndarray:
@@ -32,13 +133,126 @@ class HomographyTransformer:
 
         detected_keypoints = detected_keypoints.astype(np.float32)
         pitch_vertices = pitch_vertices.astype(np.float32)
-        H, _ = cv2.findHomography(detected_keypoints, pitch_vertices)
+        if self.method == "lstsq":
+            H, _ = cv2.findHomography(detected_keypoints, pitch_vertices)
+        else:
+            H, inliers_mask = cv2.findHomography(detected_keypoints, pitch_vertices, HOMOGRAPHY_METHODS[self.method],
+                                                 self.ransac_reproj_threshold,
+                                                 maxIters=self.max_iters, confidence=self.confidence)
+            if H is not None and self.method == "ransac_inliers":
+                inliers = inliers_mask.ravel().astype(bool)
+                if inliers.sum() >= 4:
+                    H, _ = cv2.findHomography(detected_keypoints[inliers], pitch_vertices[inliers])
         if H is None:
-            print("Homography matrix could not be calculated.")
+            logger.debug("Homography matrix could not be calculated.")
             # raise ValueError("Homography matrix could not be calculated.")
         else:
+            self.H = H
             return H
 
+    def estimate_homography(self,
+                            detected_keypoints: Optional[npt.NDArray[np.float32]],
+                            pitch_vertices: npt.NDArray[np.float32]) -> Tuple[Optional[np.ndarray], PipelineStatus]:
+        """
+        Calculate the Homography matrix of a frame, reporting why it could not be calculated.
+
+        Args:
+            detected_keypoints (Optional[npt.NDArray[np.float32]]): Detected keypoints, None if too few were detected.
+            pitch_vertices (npt.NDArray[np.float32]): Pitch vertices corresponding to the detected keypoints.
+
+        Returns:
+            Tuple[Optional[np.ndarray], PipelineStatus]: The Homography matrix (None on failure) and the status.
+        """
+        if detected_keypoints is None:
+            return None, PipelineStatus.NOT_ENOUGH_KEYPOINTS
+        H = self.get_homography_matrix(detected_keypoints, pitch_vertices)
+        if H is None:
+            return None, PipelineStatus.HOMOGRAPHY_FAILED
+        return H, PipelineStatus.OK
+
+    def reprojection_error(self,
+                           H: np.ndarray,
+                           detected_keypoints: npt.NDArray[np.float32],
+                           pitch_vertices: npt.NDArray[np.float32]) -> float:
+        """
+        Measure how well a Homography matrix maps detected keypoints onto their pitch vertices.
+
+        Args:
+            H (np.ndarray): Homography matrix.
+            detected_keypoints (npt.NDArray[np.float32]): Detected keypoints.
+            pitch_vertices (npt.NDArray[np.float32]): Pitch vertices corresponding to the detected keypoints.
+
+        Returns:
+            float: Median distance between the projected keypoints and the pitch vertices, in pitch units [cm].
+        """
+        projected_keypoints = self.apply_homography(detected_keypoints, H)
+        return float(np.median(np.linalg.norm(projected_keypoints - pitch_vertices, axis=1)))
+
+    def apply_homography(self,
+                         points: npt.NDArray[np.float32],
+                         H: np.ndarray) -> npt.NDArray[np.float32]:
+        """
+        Project points from the image to the pitch with already computed Homography matrices.
+
+        Args:
+            points (npt.NDArray[np.float32]): Points to be projected, with shape (2,), (N, 2) or (F, N, 2).
+            H (np.ndarray): Homography matrix (3, 3), or one matrix per frame (F, 3, 3).
+
+        Returns:
+            npt.NDArray[np.float32]: Projected points with shape (N, 2), or (F, N, 2) for many frames.
+        """
+        points = np.asarray(points)
+        if points.ndim == 1:
+            points = points.reshape(1, 2)
+        return project_points(points, H)
+
+    def project_to_image(self,
+                         points: npt.NDArray[np.float32],
+                         H: np.ndarray) -> npt.NDArray[np.float32]:
+        """
+        Project points from the pitch back to the image, with the inverse of already computed Homography matrices.
+
+        Args:
+            points (npt.NDArray[np.float32]): Pitch points [cm], with shape (2,), (N, 2) or (F, N, 2).
+            H (np.ndarray): Homography matrix (3, 3), or one matrix per frame (F, 3, 3), mapping the image to the pitch.
+
+        Returns:
+            npt.NDArray[np.float32]: Pixel coordinates with shape (N, 2), or (F, N, 2) for many frames.
+        """
+        return self.apply_homography(points, invert_homography(H))
+
+    def project_polygon_to_image(self,
+                                 polygon: npt.NDArray[np.float32],
+                                 H: np.ndarray,
+                                 resolution_wh: Tuple[int, int]) -> npt.NDArray[np.float32]:
+        """
+        Project a pitch polygon onto the image, keeping only its part in front of the camera and inside the image.
+
+        Dividing by w would flip the vertices behind the camera (w < 0) and lose those on the horizon (w = 0),
+        so the polygon is clipped in homogeneous coordinates, to w > 0 and to the image borders, before dividing.
+
+        Args:
+            polygon (npt.NDArray[np.float32]): The (P, 2) pitch vertices [cm], in order around the outline.
+            H (np.ndarray): Homography matrix (3, 3), mapping the image to the pitch.
+            resolution_wh (Tuple[int, int]): Width and height of the image.
+
+        Returns:
+            npt.NDArray[np.float32]: The (Q, 2) pixel coordinates of the visible part, (0, 2) if none is visible.
+        """
+        H = np.asarray(H, dtype=np.float64)
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        homogeneous = np.concatenate([polygon, np.ones((len(polygon), 1))], axis=1) @ np.linalg.inv(H).T
+        # The bottom centre of the frame shows the pitch, so its pitch point is in front of the camera:
+        # the sign of its w on the pitch gives the sign of w in front of the camera
+        width, height = resolution_wh
+        if (H @ np.array([width / 2, height, 1.0]))[2] < 0:
+            homogeneous = -homogeneous
+        homogeneous = clip_polygon(homogeneous, (0, 0, 1), -1e-9 * np.abs(homogeneous[:, 2]).max())
+        # x >= 0, x <= width, y >= 0 and y <= height, each multiplied by w > 0
+        for normal in ((1, 0, 0), (-1, 0, width), (0, 1, 0), (0, -1, height)):
+            homogeneous = clip_polygon(homogeneous, normal)
+        return (homogeneous[:, :2] / homogeneous[:, 2:]).astype(np.float32)
+
     def transform_points(self,
                          points: npt.NDArray[np.float32],
                          detected_keypoints: npt.NDArray[np.float32],
@@ -46,53 +260,230 @@ class HomographyTransformer:
         """
         Transform the given points using the homography matrix.
 
+        The Homography matrix is fitted on every call: to project many points or frames with the same matrix,
+        fit it once with `get_homography_matrix` and use `apply_homography` instead.
+
         Args:
-            points (npt.NDArray[np.float32]): Points to be transformed.
+            points (npt.NDArray[np.float32]): Points to be transformed, with shape (2,) or (N, 2).
 
         Returns:
-            npt.NDArray[np.float32]: Transformed points.
+            npt.NDArray[np.float32]: Transformed points with shape (N, 2), NaN if no point was given or no
+                Homography matrix could be computed.
 
         Raises:
             ValueError: If points are not 2D coordinates.
         """
-        if np.array_equal(points, np.array([-10, -10])):
-            print("No ball detected")
-            return [(-10, -10)]
-
-        if points.shape[0] != 2:
+        points = np.asarray(points, dtype=np.float32)
+        if points.ndim > 2 or points.shape[-1] != 2:
             raise ValueError("Points must be 2D coordinates.")
+        points = points.reshape(-1, 2)
+        failed = np.full_like(points, np.nan)
+        if np.isnan(points).all():
+            logger.debug("No ball detected")
+            return failed
 
         # Homography matrix
         if not (detected_keypoints is None):
             H = self.get_homography_matrix(detected_keypoints, pitch_vertices)
             if H is None:
-                return [(-100, -100)]
-            reshaped_points = points.reshape(-1, 1, 2).astype(np.float32)
-            transformed_points = cv2.perspectiveTransform(reshaped_points, H)
-            return transformed_points.reshape(-1, 2).astype(np.float32)
+                return failed
+            return self.apply_homography(points, H)
         else:
             # Not enough keypoints (no keypoints at all actually)
-            return [(-1, -1)]
+            logger.debug("Not enough keypoints detected")
+            return failed
 
     def transform_image(
             self,
             image: npt.NDArray[np.uint8],
-            resolution_wh: Tuple[int, int]
+            resolution_wh: Tuple[int, int],
+            H: Optional[np.ndarray] = None
     ) -> npt.NDArray[np.uint8]:
         """
         Transform the given image using the homography matrix.
+        A matrix seen for the first time is applied with cv2.warpPerspective. Once the same matrix and resolution
+        are used again, e.g. for the frames of a static camera, the remap tables of the warp are computed and
+        reused, so that warping is a cheap lookup.
 
         Args:
             image (npt.NDArray[np.uint8]): Image to be transformed.
             resolution_wh (Tuple[int, int]): Width and height of the output image.
+            H (Optional[np.ndarray]): Homography matrix, the last fitted one if None.
 
         Returns:
             npt.NDArray[np.uint8]: Transformed image.
 
         Raises:
-            ValueError: If the image is not either grayscale or color.
+            ValueError: If no Homography matrix is given nor has been fitted yet.
         """
         if len(image.shape) not in {2, 3}:
-            print("Image must be either grayscale or color.")
+            logger.warning("Image must be either grayscale or color.")
             # raise ValueError("Image must be either grayscale or color.")
-        return cv2.warpPerspective(image, self.H, resolution_wh)
\ No newline at end of file
+        H = self.H if H is None else H
+        if H is None:
+            raise ValueError("No Homography matrix has been calculated yet.")
+        key = self._warp_key(H, resolution_wh)
+        repeated = key == self._last_warp_key
+        self._last_warp_key = key
+        if key != self._warp_maps_key and not repeated:
+            # Building the tables costs more than one warp: only do it for matrices that repeat
+            return cv2.warpPerspective(image, np.asarray(H, dtype=np.float64), tuple(resolution_wh),
+                                       flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        map1, map2 = self.get_warp_maps(H, resolution_wh)
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+    @staticmethod
+    def _warp_key(H: np.ndarray, resolution_wh: Tuple[int, int]) -> Tuple[bytes, Tuple[int, int]]:
+        return np.asarray(H, dtype=np.float64).tobytes(), tuple(resolution_wh)
+
+    def get_warp_maps(self, H: np.ndarray, resolution_wh: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the cv2.remap tables warping an image with the given Homography matrix, computing them only
+        when the matrix or the resolution changed since the last call.
+
+        Args:
+            H (np.ndarray): Homography matrix.
+            resolution_wh (Tuple[int, int]): Width and height of the output image.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The fixed-point remap tables.
+        """
+        key = self._warp_key(H, resolution_wh)
+        if key != self._warp_maps_key:
+            width, height = resolution_wh
+            xs, ys = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+            # Every output pixel samples the input pixel the inverse matrix maps it to
+            source_xy = project_points(np.stack([xs.ravel(), ys.ravel()], axis=1), invert_homography(H))
+            source_xy = np.nan_to_num(source_xy, nan=-1.0).reshape(height, width, 2)
+            self._warp_maps = cv2.convertMaps(np.ascontiguousarray(source_xy[..., 0]),
+                                              np.ascontiguousarray(source_xy[..., 1]),
+                                              cv2.CV_16SC2)
+            self._warp_maps_key = key
+        return self._warp_maps
+
+
+class HomographyTracker:
+    """
+    The HomographyTracker class reuses the Homography matrix of a fixed or slowly panning camera across frames.
+    It keeps the last good matrix and only asks for a new pitch detection every `refresh_interval` frames,
+    or earlier when a downscaled grayscale copy of the frame drifts away from the one the matrix was validated on.
+    Fresh keypoints are first checked against the cached matrix: it is kept if its reprojection error is within
+    `max_reprojection_error`, and recomputed otherwise.
+
+    Attributes:
+        H (np.ndarray): The cached Homography matrix, None until one is computed.
+        cache_hits (int): Frames served by the cached matrix without running pitch detection.
+        validations (int): Pitch detections that confirmed the cached matrix, so that no new fit was needed.
+        refreshes (int): Pitch detections that led to a new Homography matrix.
+    """
+
+    def __init__(self,
+                 refresh_interval: int = 25,
+                 max_reprojection_error: float = 100.0,
+                 max_frame_change: float = 12.0,
+                 thumbnail_size: Tuple[int, int] = (64, 36),
+                 homography_transformer: Optional[HomographyTransformer] = None) -> None:
+        """
+        Initializes the HomographyTracker.
+
+        Args:
+            refresh_interval (int): Maximum number of frames between two pitch detections.
+            max_reprojection_error (float): Largest median reprojection error [cm] for which the cached matrix is kept.
+            max_frame_change (float): Largest mean absolute grayscale difference between the thumbnails of the
+                current frame and of the frame the matrix was validated on before pitch detection is forced.
+            thumbnail_size (Tuple[int, int]): Width and height of the thumbnails used to detect camera motion.
+            homography_transformer (Optional[HomographyTransformer]): Transformer used to fit the matrices.
+        """
+        if refresh_interval < 1:
+            raise ValueError("refresh_interval must be at least 1.")
+        self.refresh_interval = refresh_interval
+        self.max_reprojection_error = max_reprojection_error
+        self.max_frame_change = max_frame_change
+        self.thumbnail_size = thumbnail_size
+        self.homography_transformer = homography_transformer or HomographyTransformer()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the cached Homography matrix and zeroes the counters, e.g. when a new video starts.
+        """
+        self.H = None
+        self.frames_since_detection = 0
+        self.reference_thumbnail = None
+        self.current_thumbnail = None
+        self.cache_hits = 0
+        self.validations = 0
+        self.refreshes = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"cache_hits": self.cache_hits, "validations": self.validations, "refreshes": self.refreshes}
+
+    def needs_pitch_detection(self, image: npt.NDArray[np.uint8]) -> bool:
+        """
+        Decides whether the pitch has to be detected again on the given frame.
+        When it returns False, the frame is counted as a cache hit and `H` can be used directly.
+
+        Args:
+            image (npt.NDArray[np.uint8]): The current BGR frame.
+
+        Returns:
+            bool: True if pitch detection must run and its keypoints be passed to `update`.
+        """
+        self.current_thumbnail = self._thumbnail(image)
+        self.frames_since_detection += 1
+        if (self.H is None
+                or self.frames_since_detection >= self.refresh_interval
+                or self._frame_change() > self.max_frame_change):
+            return True
+        self.cache_hits += 1
+        return False
+
+    def update(self,
+               detected_keypoints: Optional[npt.NDArray[np.float32]],
+               pitch_vertices: npt.NDArray[np.float32]) -> Tuple[Optional[np.ndarray], PipelineStatus]:
+        """
+        Checks the cached Homography matrix against freshly detected keypoints, recomputing it if it no longer fits.
+        The cached matrix is only kept without a new fit when no keypoints were detected on a scheduled refresh,
+        while the frame has not drifted from the one the matrix was validated on. Once it has been shown not to fit,
+        it is dropped.
+
+        Args:
+            detected_keypoints (Optional[npt.NDArray[np.float32]]): Detected keypoints, None if too few were detected.
+            pitch_vertices (npt.NDArray[np.float32]): Pitch vertices corresponding to the detected keypoints.
+
+        Returns:
+            Tuple[Optional[np.ndarray], PipelineStatus]: The Homography matrix to use (None on failure) and the status.
+        """
+        self.frames_since_detection = 0
+        if self.H is not None and detected_keypoints is not None:
+            if (self.homography_transformer.reprojection_error(self.H, detected_keypoints, pitch_vertices)
+                    <= self.max_reprojection_error):
+                self.validations += 1
+                self.reference_thumbnail = self.current_thumbnail
+                return self.H, PipelineStatus.OK
+            # The cached matrix does not fit the pitch anymore
+            self.H = None
+
+        H, status = self.homography_transformer.estimate_homography(detected_keypoints, pitch_vertices)
+        if H is None:
+            if self.H is not None and self._frame_change() <= self.max_frame_change:
+                # Scheduled refresh without keypoints on an unchanged view: the cached matrix still holds
+                return self.H, PipelineStatus.OK
+            self.H = None
+            self.reference_thumbnail = None
+            return None, status
+        self.H = H
+        self.refreshes += 1
+        self.reference_thumbnail = self.current_thumbnail
+        return self.H, status
+
+    def _thumbnail(self, image: npt.NDArray[np.uint8]) -> npt.NDArray[np.float32]:
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(image, self.thumbnail_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _frame_change(self) -> float:
+        if self.reference_thumbnail is None or self.current_thumbnail is None:
+            return np.inf
+        return float(np.mean(np.abs(self.current_thumbnail - self.reference_thumbnail)))
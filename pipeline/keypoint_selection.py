@@ -0,0 +1,130 @@
+from functools import lru_cache
+from itertools import combinations
+import supervision as sv
+import numpy as np
+import numpy.typing as npt
+# Typing
+from typing import Optional
+
+
+@lru_cache(maxsize=64)
+def index_combinations(n: int, k: int) -> np.ndarray:
+    """
+    Returns the (C(n, k), k) array of the k-combinations of range(n), computed once per (n, k).
+    """
+    return np.array(list(combinations(range(n), k)), dtype=np.intp).reshape(-1, k)
+
+
+class KeypointSelector:
+    """
+    The KeypointSelector class cleans the pitch keypoint detections before they are used to fit the Homography matrix.
+    It drops low-confidence detections, keeps only the most confident detection of each keypoint class,
+    and rejects keypoint sets that cannot define a Homography matrix: one needs 4 points of which no 3 are collinear.
+
+    Attributes:
+        min_confidence (float): Minimum box confidence of a keypoint detection.
+        min_keypoint_confidence (float): Minimum keypoint confidence, applied when the model predicts one.
+        min_spread_ratio (float): Minimum ratio between the smallest and the largest singular value of the
+            centred pitch vertices. Values close to 0 mean that all the vertices lie on a line.
+        min_triangle_ratio (float): Minimum ratio between twice the area of a triangle of vertices and the square of
+            its longest side. Values close to 0 mean that the 3 vertices lie on a line.
+        max_checked_keypoints (int): Largest number of vertices, the most confident ones, checked for 4 vertices in
+            general position. The number of quadruples grows with the fourth power of the number of vertices.
+    """
+
+    def __init__(self,
+                 min_confidence: float = 0.25,
+                 min_keypoint_confidence: float = 0.0,
+                 min_spread_ratio: float = 0.05,
+                 min_triangle_ratio: float = 0.05,
+                 max_checked_keypoints: int = 12) -> None:
+        """
+        Initializes the KeypointSelector.
+
+        Args:
+            min_confidence (float): Minimum box confidence of a keypoint detection.
+            min_keypoint_confidence (float): Minimum keypoint confidence, applied when the model predicts one.
+            min_spread_ratio (float): Minimum ratio between the smallest and the largest singular value of the
+                centred pitch vertices.
+            min_triangle_ratio (float): Minimum ratio between twice the area of a triangle of vertices and the
+                square of its longest side.
+            max_checked_keypoints (int): Largest number of vertices, the most confident ones, checked for 4 vertices
+                in general position.
+        """
+        self.min_confidence = min_confidence
+        self.min_keypoint_confidence = min_keypoint_confidence
+        self.min_spread_ratio = min_spread_ratio
+        self.min_triangle_ratio = min_triangle_ratio
+        self.max_checked_keypoints = max_checked_keypoints
+
+    def select(self, pitch_detections: sv.Detections) -> sv.Detections:
+        """
+        Filters the pitch detections by confidence and de-duplicates them per keypoint class.
+
+        Args:
+            pitch_detections (sv.Detections): The pitch detections of one frame.
+
+        Returns:
+            sv.Detections: The selected detections, at most one per class id, in their original order.
+        """
+        if len(pitch_detections) == 0:
+            return pitch_detections
+
+        keep = np.ones(len(pitch_detections), dtype=bool)
+        confidence = pitch_detections.confidence
+        if confidence is not None:
+            keep &= confidence >= self.min_confidence
+        if 'keypoint_conf' in pitch_detections.data:
+            keep &= pitch_detections.data['keypoint_conf'] >= self.min_keypoint_confidence
+        pitch_detections = pitch_detections[keep]
+
+        # Keep the most confident detection of each class id
+        if confidence is not None:
+            order = np.argsort(-pitch_detections.confidence, kind='stable')
+        else:
+            order = np.arange(len(pitch_detections))
+        _, first = np.unique(pitch_detections.class_id[order], return_index=True)
+        return pitch_detections[np.sort(order[first])]
+
+    def is_degenerate(self,
+                      pitch_vertices: npt.NDArray[np.float32],
+                      confidence: Optional[npt.NDArray[np.float32]] = None) -> bool:
+        """
+        Checks whether the pitch vertices cannot define a Homography matrix, i.e. whether they are close to collinear
+        or no 4 of them are in general position, e.g. 3 vertices on the penalty box line and a fourth one.
+        Only the `max_checked_keypoints` most confident vertices are searched for 4 vertices in general position.
+
+        Args:
+            pitch_vertices (npt.NDArray[np.float32]): The (N, 2) pitch vertices of the selected keypoints.
+            confidence (Optional[npt.NDArray[np.float32]]): The (N,) confidences of the keypoints, the first
+                vertices are checked if None.
+
+        Returns:
+            bool: True if the vertices (almost) lie on a single line or no 4 of them have 3 non-collinear triples.
+        """
+        pitch_vertices = np.asarray(pitch_vertices, dtype=np.float64)
+        if len(pitch_vertices) < 4:
+            return True
+        centred_vertices = pitch_vertices - pitch_vertices.mean(axis=0)
+        singular_values = np.linalg.svd(centred_vertices, compute_uv=False)
+        if singular_values[0] == 0 or singular_values[-1] / singular_values[0] < self.min_spread_ratio:
+            return True
+
+        if len(pitch_vertices) > self.max_checked_keypoints:
+            if confidence is not None:
+                pitch_vertices = pitch_vertices[np.argsort(-np.asarray(confidence), kind='stable')]
+            pitch_vertices = pitch_vertices[:self.max_checked_keypoints]
+        n = len(pitch_vertices)
+
+        # Flag every triangle of vertices that is far enough from a line
+        triples = index_combinations(n, 3)
+        a, b, c = (pitch_vertices[triples[:, i]] for i in range(3))
+        ab, ac, bc = b - a, c - a, c - b
+        doubled_areas = np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0])
+        longest_sides = np.max([np.sum(ab ** 2, axis=1), np.sum(ac ** 2, axis=1), np.sum(bc ** 2, axis=1)], axis=0)
+        is_triangle = np.zeros((n, n, n), dtype=bool)
+        is_triangle[tuple(triples.T)] = doubled_areas >= self.min_triangle_ratio * longest_sides
+
+        # A Homography matrix needs 4 vertices of which every triple is a triangle
+        i, j, k, l = index_combinations(n, 4).T
+        return not np.any(is_triangle[i, j, k] & is_triangle[i, j, l] & is_triangle[i, k, l] & is_triangle[j, k, l])
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from threading import Lock
+# Inference backends
+from backends import DetectorBackend, load_backend
+# Typing
+from typing import Dict, Optional, Tuple
+
+
+class ModelRegistry:
+    """
+    The ModelRegistry class keeps the models loaded by the process, so that each model file is loaded
+    once however many detectors or pipelines use it. Models are loaded lazily on first use and keyed by
+    model path and device, with the backend matching the file: ONNX Runtime for `.onnx` files, ultralytics otherwise.
+
+    Attributes:
+        max_models (Optional[int]): Maximum number of models kept loaded. When exceeded, the least recently used
+            model is evicted. None keeps every model loaded.
+    """
+
+    def __init__(self, max_models: Optional[int] = None) -> None:
+        """
+        Initializes an empty ModelRegistry.
+
+        Args:
+            max_models (Optional[int]): Maximum number of models kept loaded, None for no limit.
+        """
+        if max_models is not None and max_models < 1:
+            raise ValueError("max_models must be at least 1.")
+        self.max_models = max_models
+        self._models: "OrderedDict[Tuple[str, str], DetectorBackend]" = OrderedDict()
+        self._lock = Lock()
+        # One lock per model, held while it loads and while it runs inference, as YOLO models are not thread-safe
+        self._model_locks: Dict[Tuple[str, str], Lock] = {}
+
+    @staticmethod
+    def _key(model_path: str, device: Optional[str]) -> Tuple[str, str]:
+        return str(model_path), "" if device is None else str(device)
+
+    def get(self, model_path: str, device: Optional[str] = None) -> DetectorBackend:
+        """
+        Returns the model stored at the given path, loading it if this process has not loaded it yet.
+
+        Args:
+            model_path (str): Path to the model file, `.pt` or `.onnx`.
+            device (Optional[str]): Device the model runs on, e.g. "cpu" or "cuda:0". None for the default device.
+
+        Returns:
+            DetectorBackend: The loaded model, shared with every other user of the same path and device.
+        """
+        key = self._key(model_path, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            model_lock = self._model_locks.setdefault(key, Lock())
+
+        # Load outside of the registry lock, so that other models stay available meanwhile
+        with model_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+            model = load_backend(model_path, device)
+            with self._lock:
+                self._models[key] = model
+                while self.max_models is not None and len(self._models) > self.max_models:
+                    self._models.popitem(last=False)
+        return model
+
+    def lock(self, model_path: str, device: Optional[str] = None) -> Lock:
+        """
+        Returns the lock serializing inference on the model stored at the given path.
+
+        Args:
+            model_path (str): Path to the model file.
+            device (Optional[str]): Device the model runs on.
+
+        Returns:
+            Lock: The lock of the model.
+        """
+        with self._lock:
+            return self._model_locks.setdefault(self._key(model_path, device), Lock())
+
+    def warmup(self, model_path: str, device: Optional[str] = None, imgsz: int = 640) -> None:
+        """
+        Loads the model and runs one inference on a blank frame, so that the first real request
+        does not pay for the model loading and the lazy initialization of the predictor.
+
+        Args:
+            model_path (str): Path to the model file.
+            device (Optional[str]): Device the model runs on.
+            imgsz (int): Side of the blank square frame.
+        """
+        model = self.get(model_path, device)
+        with self.lock(model_path, device):
+            model.warmup(imgsz)
+
+    def evict(self, model_path: str, device: Optional[str] = None) -> None:
+        """
+        Forgets the model stored at the given path, if loaded. Detectors still holding it keep working.
+
+        Args:
+            model_path (str): Path to the model file.
+            device (Optional[str]): Device the model runs on.
+        """
+        with self._lock:
+            self._models.pop(self._key(model_path, device), None)
+
+    def clear(self) -> None:
+        """
+        Forgets every loaded model.
+        """
+        with self._lock:
+            self._models.clear()
+
+    def __contains__(self, key: Tuple[str, Optional[str]]) -> bool:
+        with self._lock:
+            return self._key(*key) in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+# Registry shared by every detector of the process
+MODEL_REGISTRY = ModelRegistry()
@@ -1,50 +1,464 @@
+import logging
+import time
 # Ball detection
 from ball_detector import BallDetector
 # Pitch detection
 from pitch_detector import PitchDetector
 # Homography
-from homography import HomographyTransformer
+from homography import HomographyTracker, HomographyTransformer
+from keypoint_selection import KeypointSelector
+from pitch_config import SoccerFieldConfiguration
+# Model loading
+from model_registry import MODEL_REGISTRY
+# Status codes and results
+from constants import PipelineStatus
+from results import RESULT_DTYPE, BallPositionResult, StageTimings, elapsed_ms, from_structured_array
+# Result caching
+from result_cache import CacheEntry, ResultCache, frame_key, pipeline_version
+# Ball tracking
+from tracking import BallTracker
+# Video decoding and export
+from frames import VideoFrameReader, decode_image
+from video_export import BirdsEyeVideoWriter
+# Concurrent detection
+from concurrent.futures import Future
+from executors import create_executor, detect_ball, detect_ball_batch
 # Visualization
-import cv2
+import numpy as np
 import supervision as sv
-from mplsoccer.pitch import Pitch
-import matplotlib.pyplot as plt
+from dataclasses import replace
+from radar import get_radar_renderer
 # Typing
-from typing import Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PITCH_CONFIG = SoccerFieldConfiguration()
 
 class BallPositionPipeline:
-    def __init__(self, ball_detector_model_path: str, pitch_detector_model_path: str) -> None:
-        self.ball_detector = BallDetector(ball_detector_model_path)
-        self.pitch_detector = PitchDetector(pitch_detector_model_path)
-        self.homography_transformer = HomographyTransformer()
-
-    def predict(self, input_image_path: str) -> Tuple[float, float]:
-        self.image_path = input_image_path
-        # Detect ball
-        ball_pixels_xy = self.ball_detector.predict(self.image_path)
-        # Detect pitch
-        detected_keypoints, pitch_vertices = self.pitch_detector.predict(self.image_path)
-        # Homography
-        ball_x, ball_y = self.homography_transformer.transform_points(points=ball_pixels_xy,
-                                                                      detected_keypoints=detected_keypoints,
-                                                                      pitch_vertices=pitch_vertices)[0]
-        if (ball_x, ball_y) == (-1, -1):
-            # If (ball_x, ball_y) == (-1, -1) it means that not enough keypoints were detected
-            print(f"Not enough keypoints detected.")
-            return (ball_x, ball_y)
-        elif (ball_x, ball_y) == (-10,-10):
-            # If (ball_x, ball_y) == (-10, -10) it means that no ball was detected
-            print("No ball detected.")
-            return (ball_x, ball_y)
+    def __init__(self,
+                 ball_detector_model_path: str,
+                 pitch_detector_model_path: str,
+                 homography_tracker: Optional[HomographyTracker] = None,
+                 executor: Optional[str] = None,
+                 max_workers: int = 1,
+                 device: Optional[str] = None,
+                 keypoint_selector: Optional[KeypointSelector] = None,
+                 homography_transformer: Optional[HomographyTransformer] = None,
+                 ball_tile_size: Optional[int] = None,
+                 ball_detector: Optional[BallDetector] = None,
+                 pitch_detector: Optional[PitchDetector] = None,
+                 result_cache: Optional[ResultCache] = None) -> None:
+        # Models are loaded on first use and shared with every other pipeline of the process
+        # With a tile size the ball is detected on overlapping tiles of the frame, for high-resolution footage
+        # Detectors can also be injected, e.g. the stub detectors of the benchmarks, which need no model file
+        self.ball_detector = ball_detector or BallDetector(ball_detector_model_path, device, tile_size=ball_tile_size)
+        self.pitch_detector = pitch_detector or PitchDetector(pitch_detector_model_path, device, keypoint_selector)
+        # With a tracker the Homography matrix is reused across frames and pitch detection mostly skipped
+        # The tracker and the pipeline share one transformer, so that both fit the matrices with the same estimator
+        if homography_tracker is not None:
+            if homography_transformer is None:
+                homography_transformer = homography_tracker.homography_transformer
+            else:
+                homography_tracker.homography_transformer = homography_transformer
+        self.homography_transformer = homography_transformer or HomographyTransformer()
+        self.homography_tracker = homography_tracker
+        # With an executor ("thread" or "process") the ball is detected concurrently with the pitch
+        self.executor_kind = executor
+        self.executor = create_executor(executor, ball_detector_model_path, max_workers, device,
+                                        self.ball_detector.tile_size) if executor else None
+        # With a result cache, frames already seen are answered without running the models
+        self.result_cache = result_cache
+        # Every setting changing the detections or the Homography matrix is part of the version of the results
+        self.cache_version = pipeline_version([self.ball_detector.model_path, self.pitch_detector.model_path],
+                                              self.ball_detector.tile_size, self.ball_detector.tile_overlap,
+                                              self.ball_detector.nms_threshold, self.homography_transformer.method,
+                                              self.homography_transformer.ransac_reproj_threshold,
+                                              self.homography_transformer.max_iters,
+                                              self.homography_transformer.confidence,
+                                              vars(self.pitch_detector.keypoint_selector))
+
+    def warmup(self) -> None:
+        """
+        Loads both models and runs one inference with each, so that the first frame is not slowed down by loading.
+        """
+        MODEL_REGISTRY.warmup(self.ball_detector.model_path, self.ball_detector.device)
+        MODEL_REGISTRY.warmup(self.pitch_detector.model_path, self.pitch_detector.device)
+
+    def close(self) -> None:
+        """
+        Shuts down the executor of concurrent detection, if any.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def predict(self, input_image_path: Union[str, np.ndarray, bytes, memoryview]) -> BallPositionResult:
+        """
+        Locates the ball on one frame.
+
+        Args:
+            input_image_path (Union[str, np.ndarray, bytes, memoryview]): Path to the image file, the already
+                decoded BGR image, or the encoded bytes of the image.
+
+        Returns:
+            BallPositionResult: The status, the ball pixel and pitch [m] coordinates, the detection confidence
+                and the duration of each stage.
+        """
+        timings = {}
+        start = time.perf_counter()
+        # Decode the frame once and share it between both detectors and the annotator
+        self.image = decode_image(input_image_path)
+        timings["decode"] = elapsed_ms(start)
+        cache_key = self._cache_key(self.image)
+        entry = self.result_cache.get(cache_key) if cache_key is not None else None
+        if entry is not None and entry.ball_detections is not None:
+            # Restore the detections, so that the plots do not run the models either
+            self.ball_detector.ball_detections = entry.ball_detections
+            self.pitch_detector.pitch_detections = entry.pitch_detections
+            return entry.result._replace(timings=StageTimings(decode=timings["decode"]))
+        start = time.perf_counter()
+        if self.executor is None and self.ball_detector.tile_size is not None:
+            # Detect pitch first, so that the ball detection tiles outside of the pitch can be skipped
+            H, homography_status = self.get_homography(self.image, timings)
+            start = time.perf_counter()
+            pitch_polygon = self.get_pitch_polygon(H, self.image.shape) if H is not None else None
+            ball_pixels_xy = self.ball_detector.predict(self.image, pitch_polygon=pitch_polygon)
+            timings["ball"] = elapsed_ms(start)
+        elif self.executor is None:
+            # Detect ball
+            ball_pixels_xy = self.ball_detector.predict(self.image)
+            timings["ball"] = elapsed_ms(start)
+            # Detect pitch and compute the Homography matrix
+            H, homography_status = self.get_homography(self.image, timings)
         else:
-            return ball_x / 100, ball_y / 100
-    
+            # Detect ball in the executor while the pitch is detected in this thread
+            ball_future = self._submit_ball_detection(self.image)
+            H, homography_status = self.get_homography(self.image, timings)
+            ball_pixels_xy, self.ball_detector.ball_detections = ball_future.result()
+            # Time until the concurrent ball detections were available
+            timings["ball"] = elapsed_ms(start)
+        start = time.perf_counter()
+        ball_xy, status = self.locate(ball_pixels_xy, H, homography_status)
+        timings["homography"] = timings.get("homography", 0.0) + elapsed_ms(start)
+        if status != PipelineStatus.OK:
+            logger.debug("Ball not located: %s", status.name)
+        result = BallPositionResult(status=status,
+                                    pixel_xy=tuple(ball_pixels_xy.tolist()),
+                                    pitch_xy=tuple(ball_xy.tolist()),
+                                    confidence=self.ball_detector.get_ball_confidence(self.ball_detector.ball_detections),
+                                    timings=StageTimings(**timings))
+        if cache_key is not None:
+            self.result_cache.put(cache_key, CacheEntry(result, self.ball_detector.ball_detections,
+                                                        self.pitch_detector.pitch_detections))
+        return result
+
+    def predict_batch(self,
+                      frames: Union[Sequence[Union[str, np.ndarray]], np.ndarray],
+                      batch_size: int = 8,
+                      structured: bool = False) -> Union[Tuple[np.ndarray, np.ndarray], np.ndarray]:
+        """
+        Locates the ball on many frames, sending fixed-size batches through both YOLO models.
+        The detections of the frames are not kept, so `plot_annotated_image` still shows the last `predict` call.
+
+        Args:
+            frames (Union[Sequence[Union[str, np.ndarray]], np.ndarray]): Image paths, encoded images, a list of
+                BGR images or an (N, H, W, 3) array of BGR images.
+            batch_size (int): Number of frames sent to each model in a single call.
+            structured (bool): Whether to return the full results as a structured array of RESULT_DTYPE.
+
+        Returns:
+            Union[Tuple[np.ndarray, np.ndarray], np.ndarray]: If structured, an (N,) structured array of RESULT_DTYPE.
+                Otherwise a tuple containing:
+                - An (N, 2) float32 array with the ball pitch coordinates [m], NaN where the ball could not be located
+                - An (N,) int8 array with the PipelineStatus of each frame
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+
+        results = np.empty(len(frames), dtype=RESULT_DTYPE)
+        for batch_start in range(0, len(frames), batch_size):
+            timings = {}
+            start = time.perf_counter()
+            batch = [decode_image(frame) for frame in frames[batch_start:batch_start + batch_size]]
+            timings["decode"] = elapsed_ms(start)
+            # Frames found in the result cache are left out of the batch
+            cache_keys = [self._cache_key(frame) for frame in batch]
+            missing = []
+            for i, cache_key in enumerate(cache_keys):
+                entry = self.result_cache.get(cache_key) if cache_key is not None else None
+                if entry is None:
+                    missing.append(i)
+                else:
+                    results[batch_start + i] = (entry.result.status, entry.result.pixel_xy, entry.result.pitch_xy,
+                                                entry.result.confidence, StageTimings(decode=timings["decode"] / len(batch)))
+            if not missing:
+                continue
+            batch = [batch[i] for i in missing]
+            start = time.perf_counter()
+            # With an executor the ball is detected there while the pitch is detected in this thread
+            ball_future = self._submit_ball_batch_detection(batch) if self.executor is not None else None
+            if self.homography_tracker is None:
+                pitch_start = time.perf_counter()
+                pitch_predictions = self.pitch_detector.predict_batch(batch)
+                timings["pitch"] = elapsed_ms(pitch_start)
+                homography_start = time.perf_counter()
+                homographies = [self.homography_transformer.estimate_homography(detected_keypoints, pitch_vertices)
+                                for detected_keypoints, pitch_vertices in pitch_predictions]
+                timings["homography"] = elapsed_ms(homography_start)
+            else:
+                # Frames depend on the matrix cached on the previous ones, so pitch detection runs frame by frame
+                homographies = [self.get_homography(frame, timings) for frame in batch]
+            if ball_future is not None:
+                ball_pixels_xy, ball_confidence = ball_future.result()
+            else:
+                start = time.perf_counter()
+                pitch_polygons = None
+                if self.ball_detector.tile_size is not None:
+                    # The pitch is detected first, so that the ball detection tiles outside of it can be skipped
+                    pitch_polygons = [self.get_pitch_polygon(H, frame.shape) if H is not None else None
+                                      for (H, _), frame in zip(homographies, batch)]
+                ball_pixels_xy, ball_confidence = self.ball_detector.predict_batch(batch, pitch_polygons)
+            timings["ball"] = elapsed_ms(start)
+            start = time.perf_counter()
+            located = [self.locate(ball_pixels_xy[i], H, homography_status)
+                       for i, (H, homography_status) in enumerate(homographies)]
+            timings["homography"] = timings.get("homography", 0.0) + elapsed_ms(start)
+
+            # Batched stages are shared equally by the frames of the batch
+            frame_timings = StageTimings(**{stage: duration / len(batch) for stage, duration in timings.items()})
+            for i, (ball_xy, status) in enumerate(located):
+                record_idx = batch_start + missing[i]
+                results[record_idx] = (status, ball_pixels_xy[i], ball_xy, ball_confidence[i], frame_timings)
+                if cache_keys[missing[i]] is not None:
+                    result = from_structured_array(results[record_idx:record_idx + 1])[0]
+                    self.result_cache.put(cache_keys[missing[i]], CacheEntry(result))
+
+        if structured:
+            return results
+        return np.ascontiguousarray(results["pitch_xy"]), results["status"].copy()
+
+    def stream(self,
+               video_source: Union[str, int],
+               batch_size: int = 1,
+               queue_size: int = 32,
+               ball_tracker: Optional[BallTracker] = None,
+               roi_size: Optional[int] = None) -> Iterator[Tuple[int, float, float, PipelineStatus]]:
+        """
+        Locates the ball on every frame of a video, decoding frames in a background thread while the
+        detectors run on the frames already decoded.
+
+        With a ball tracker, frames are processed one at a time: among the ball candidates of each frame the
+        tracker picks the one fitting the track, and short gaps without detections are interpolated. Once the
+        track is locked and `roi_size` is given, the ball is searched in a square region of that side around
+        the predicted position, falling back to the full frame when nothing is found there.
+
+        Args:
+            video_source (Union[str, int]): Path or URL of the video, or index of a capture device.
+            batch_size (int): Number of frames sent to each model in a single call, without a ball tracker.
+            queue_size (int): Maximum number of decoded frames waiting for inference.
+            ball_tracker (Optional[BallTracker]): Tracker selecting the match ball across frames.
+            roi_size (Optional[int]): Side [px] of the region searched around the tracked ball.
+
+        Yields:
+            Tuple[int, float, float, PipelineStatus]: The frame index, the ball pitch coordinates [m]
+                (NaN on failure) and the status of the frame.
+        """
+        if ball_tracker is not None:
+            yield from self._stream_tracked(video_source, queue_size, ball_tracker, roi_size)
+            return
+
+        frame_indices, frames = [], []
+        for frame_idx, frame in VideoFrameReader(video_source, queue_size=queue_size):
+            frame_indices.append(frame_idx)
+            frames.append(frame)
+            if len(frames) == batch_size:
+                yield from self._predict_stream_batch(frame_indices, frames)
+                frame_indices, frames = [], []
+        if frames:
+            yield from self._predict_stream_batch(frame_indices, frames)
+
+    def _stream_tracked(self,
+                        video_source: Union[str, int],
+                        queue_size: int,
+                        ball_tracker: BallTracker,
+                        roi_size: Optional[int]) -> Iterator[Tuple[int, float, float, PipelineStatus]]:
+        ball_tracker.reset()
+        for frame_idx, frame in VideoFrameReader(video_source, queue_size=queue_size):
+            H, homography_status = self.get_homography(frame)
+            candidates_pixels_xy, confidences = self.get_ball_candidates(frame, H, ball_tracker, roi_size)
+            if H is None or len(candidates_pixels_xy) == 0:
+                candidates_pitch_xy = np.empty((0, 2), dtype=np.float32)
+            else:
+                candidates_pitch_xy = self.homography_transformer.apply_homography(candidates_pixels_xy, H) / 100
+            for point in ball_tracker.update(frame_idx, candidates_pitch_xy, confidences, homography_status):
+                yield point.frame_idx, point.pitch_xy[0], point.pitch_xy[1], point.status
+        for point in ball_tracker.flush():
+            yield point.frame_idx, point.pitch_xy[0], point.pitch_xy[1], point.status
+
+    def get_ball_candidates(self,
+                            image: np.ndarray,
+                            H: Optional[np.ndarray],
+                            ball_tracker: BallTracker,
+                            roi_size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Detects every ball candidate of a frame, only around the predicted ball position when the track is locked.
+
+        Args:
+            image (np.ndarray): The decoded BGR frame.
+            H (Optional[np.ndarray]): The Homography matrix of the frame, needed to find the predicted position.
+            ball_tracker (BallTracker): The tracker predicting the ball position.
+            roi_size (Optional[int]): Side [px] of the region searched around the predicted position.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (M, 2) pixel coordinates and (M,) confidences of the candidates.
+        """
+        roi = None
+        if roi_size is not None and H is not None and ball_tracker.locked:
+            predicted_pixels_xy = self.homography_transformer.project_to_image(ball_tracker.predicted_pitch_xy * 100, H)[0]
+            if np.isfinite(predicted_pixels_xy).all():
+                roi = self.ball_detector.roi_around(predicted_pixels_xy, roi_size, image.shape)
+        ball_detections = self.ball_detector.get_detections(image, roi=roi)
+        if roi is not None and len(ball_detections) == 0:
+            ball_detections = self.ball_detector.get_detections(image)
+        self.ball_detector.ball_detections = ball_detections
+        return self.ball_detector.get_ball_candidates(ball_detections)
+
+    def export_birds_eye_video(self,
+                               video_source: Union[str, int],
+                               output_path: str,
+                               fps: float = 25.0,
+                               pixels_per_metre: float = 10.0,
+                               queue_size: int = 32) -> int:
+        """
+        Writes a top-down warped video of the pitch. Frames whose Homography matrix cannot be computed reuse
+        the last one, so that with a homography tracker most frames reuse the same remap tables.
+
+        Args:
+            video_source (Union[str, int]): Path or URL of the video, or index of a capture device.
+            output_path (str): Path of the video file to write.
+            fps (float): Frame rate of the output video.
+            pixels_per_metre (float): Resolution of the top-down view.
+            queue_size (int): Maximum number of decoded frames waiting to be warped.
+
+        Returns:
+            int: Number of frames written.
+        """
+        last_H = None
+        with BirdsEyeVideoWriter(output_path, fps, pixels_per_metre, homography_transformer=self.homography_transformer) as writer:
+            for _, frame in VideoFrameReader(video_source, queue_size=queue_size):
+                H, _ = self.get_homography(frame)
+                last_H = H if H is not None else last_H
+                writer.write(frame, last_H)
+            return writer.frames_written
+
+    def _predict_stream_batch(self,
+                              frame_indices: List[int],
+                              frames: List[np.ndarray]) -> Iterator[Tuple[int, float, float, PipelineStatus]]:
+        ball_xy, statuses = self.predict_batch(frames, batch_size=len(frames))
+        for frame_idx, (ball_x, ball_y), status in zip(frame_indices, ball_xy, statuses):
+            yield frame_idx, float(ball_x), float(ball_y), PipelineStatus(status)
+
+    def _cache_key(self, image: np.ndarray) -> Optional[str]:
+        # With a homography tracker results depend on the previous frames, so they are not cached
+        if self.result_cache is None or self.homography_tracker is not None:
+            return None
+        return frame_key(image, self.cache_version)
+
+    def _submit_ball_detection(self, image: np.ndarray) -> Future:
+        if self.executor_kind == "process":
+            return self.executor.submit(detect_ball, image)
+        return self.executor.submit(lambda: (self.ball_detector.predict(image), self.ball_detector.ball_detections))
+
+    def _submit_ball_batch_detection(self, images: List[np.ndarray]) -> Future:
+        if self.executor_kind == "process":
+            return self.executor.submit(detect_ball_batch, images)
+        return self.executor.submit(self.ball_detector.predict_batch, images)
+
+    def get_homography(self,
+                       image: np.ndarray,
+                       timings: Optional[Dict[str, float]] = None) -> Tuple[Optional[np.ndarray], PipelineStatus]:
+        """
+        Detects the pitch on a frame and computes its Homography matrix. With a homography tracker, the cached
+        matrix is returned instead whenever the tracker decides that pitch detection can be skipped.
+
+        Args:
+            image (np.ndarray): The decoded BGR frame.
+            timings (Optional[Dict[str, float]]): If given, the durations [ms] of the "pitch" and "homography"
+                stages are added to it.
+
+        Returns:
+            Tuple[Optional[np.ndarray], PipelineStatus]: The Homography matrix (None on failure) and the status.
+        """
+        timings = {} if timings is None else timings
+        if self.homography_tracker is not None and not self.homography_tracker.needs_pitch_detection(image):
+            return self.homography_tracker.H, PipelineStatus.OK
+        start = time.perf_counter()
+        detected_keypoints, pitch_vertices = self.pitch_detector.predict(image)
+        timings["pitch"] = timings.get("pitch", 0.0) + elapsed_ms(start)
+        start = time.perf_counter()
+        if self.homography_tracker is None:
+            homography = self.homography_transformer.estimate_homography(detected_keypoints, pitch_vertices)
+        else:
+            homography = self.homography_tracker.update(detected_keypoints, pitch_vertices)
+        timings["homography"] = timings.get("homography", 0.0) + elapsed_ms(start)
+        return homography
+
+    def get_pitch_polygon(self, H: np.ndarray, image_shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """
+        Projects the pitch outline onto the frame with the inverse of its Homography matrix, keeping the part
+        in front of the camera and inside the frame.
+
+        Args:
+            H (np.ndarray): The Homography matrix of the frame.
+            image_shape (Tuple[int, ...]): Shape of the frame.
+
+        Returns:
+            Optional[np.ndarray]: The (P, 2) pixel coordinates of the visible pitch outline, None if no part of the
+                pitch is visible, in which case no tile should be skipped.
+        """
+        height, width = image_shape[:2]
+        polygon = self.homography_transformer.project_polygon_to_image(PITCH_CONFIG.corners, H, (width, height))
+        return polygon if len(polygon) >= 3 else None
+
+    def locate(self,
+               ball_pixels_xy: np.ndarray,
+               H: Optional[np.ndarray],
+               homography_status: PipelineStatus) -> Tuple[np.ndarray, PipelineStatus]:
+        """
+        Projects the ball pixel coordinates of one frame onto the pitch.
+
+        Args:
+            ball_pixels_xy (np.ndarray): The (x, y) pixel coordinates of the ball, NaN if no ball was detected.
+            H (Optional[np.ndarray]): The Homography matrix of the frame, None if it could not be computed.
+            homography_status (PipelineStatus): The status of the Homography matrix computation.
+
+        Returns:
+            Tuple[np.ndarray, PipelineStatus]: The (x, y) pitch coordinates of the ball [m] (NaN on failure)
+                and the status of the frame.
+        """
+        failed = np.full(2, np.nan, dtype=np.float32)
+        if np.isnan(ball_pixels_xy).any():
+            return failed, PipelineStatus.NO_BALL
+        if H is None:
+            return failed, homography_status
+        return self.homography_transformer.apply_homography(ball_pixels_xy, H)[0] / 100, PipelineStatus.OK
+
     def plot_annotated_image(self):
-        # Load image
-        image = cv2.imread(self.image_path)
+        """
+        Draws the ball and pitch detections of the last frame passed to `predict`.
+        Only `predict` keeps the frame with its detections: call it on the frame to plot after `predict_batch`
+        or `stream`.
+        """
+        # Copy the decoded frame, as the annotators draw in place
+        image = self.image.copy()
 
-        # Merge ball and pitch detections
-        detections = sv.Detections.merge([self.ball_detector.ball_detections, self.pitch_detector.pitch_detections])
+        # Merge ball and pitch detections, keeping only the data keys they share as required by the merge
+        ball_detections = self.ball_detector.ball_detections
+        pitch_detections = self.pitch_detector.pitch_detections
+        pitch_detections = replace(pitch_detections,
+                                   data={key: value for key, value in pitch_detections.data.items() if key in ball_detections.data})
+        detections = sv.Detections.merge([ball_detections, pitch_detections])
 
         # Annotate image
         bounding_box_annotator = sv.BoxAnnotator()
@@ -61,23 +475,10 @@ class BallPositionPipeline:
     
     def plot_radar(self, ball_x: float, ball_y: float, pitch_length: int = 105, pitch_width: int = 68, line_color: str = 'white', pitch_color: str = 'green', corner_arcs: bool = True):
 
-        # Create a custom pitch object
-        pitch = Pitch(
-            pitch_type='custom',
-            pitch_length=pitch_length,
-            pitch_width=pitch_width,
-            line_color=line_color,
-            line_zorder=0,
-            pitch_color=pitch_color,
-            corner_arcs=corner_arcs
-        )
-
-        # Plot the pitch
-        fig, ax = pitch.draw()
-        ax.invert_yaxis()
-        ax.plot(ball_x, ball_y, 'ro', zorder=1)
-
-        # Add note with ball coordinates
-        ax.annotate(f'({round(ball_x, 1)}, {round(ball_y, 1)})', (ball_x, ball_y), textcoords="offset points", xytext=(0,10), ha='center', fontweight='bold')
-
-        return  fig, ax
\ No newline at end of file
+        # Reuse the radar of this pitch style, whose pitch is drawn only once per process
+        renderer = get_radar_renderer(pitch_length, pitch_width, line_color, pitch_color, corner_arcs)
+
+        # Plot the ball, with a note of its coordinates, on a figure of its own
+        fig, ax = renderer.plot_point(ball_x, ball_y)
+
+        return fig, ax
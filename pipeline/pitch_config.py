@@ -1,4 +1,6 @@
 from typing import List, Tuple
+import numpy as np
+import numpy.typing as npt
 from constants import PitchDetectionConstants
 CLASS_MAPPING = PitchDetectionConstants.CLASS_MAPPING
 
@@ -13,6 +15,39 @@ class SoccerFieldConfiguration:
     centre_circle_radius: int = 915  # [cm]
     penalty_spot_distance: int = 1100  # [cm]
 
+    def __init__(self) -> None:
+        # Lookup tables built once, so that per-frame lookups are a single fancy-indexing step
+        self.label_array = self._read_only(np.array(self.labels))
+        self.id_array = self._read_only(np.array(self.ids, dtype=np.intp))
+        # Row i holds the xy coordinates [cm] of the vertex whose class id is i
+        vertex_table = np.empty((len(self.id_array), 2), dtype=np.float32)
+        vertex_table[self.id_array] = np.array(self.keypoints_xy, dtype=np.float32)
+        self.vertex_table = self._read_only(vertex_table)
+
+    @staticmethod
+    def _read_only(array: np.ndarray) -> np.ndarray:
+        array.flags.writeable = False
+        return array
+
+    @property
+    def corners(self) -> npt.NDArray[np.float32]:
+        """
+        The (4, 2) xy coordinates [cm] of the corners of the pitch, in order around its outline.
+        """
+        return np.array([(0, 0), (self.length, 0), (self.length, self.width), (0, self.width)], dtype=np.float32)
+
+    def vertices_xy(self, ids: npt.ArrayLike) -> npt.NDArray[np.float32]:
+        """
+        Looks up the pitch coordinates of the vertices with the given class ids.
+
+        Args:
+            ids (npt.ArrayLike): Class ids of any shape, e.g. (K,) for one frame or (F, K) for a batch of frames.
+
+        Returns:
+            npt.NDArray[np.float32]: The vertices' xy coordinates [cm], with shape ids.shape + (2,).
+        """
+        return self.vertex_table[np.asarray(ids, dtype=np.intp)]
+
     @property
     def keypoints_xy(self) -> List[Tuple[int, int]]:
         return [
@@ -62,4 +97,4 @@ class SoccerFieldConfiguration:
         vertices = {}
         for id, label, xy in zip(self.ids, self.labels, self.keypoints_xy):
             vertices[id] = {"label": label, "xy": xy}
-        return vertices
\ No newline at end of file
+        return vertices
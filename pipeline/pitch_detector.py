@@ -1,12 +1,19 @@
-from ultralytics import YOLO
+import logging
 import supervision as sv
 import numpy as np
+# Model loading
+from backends import DetectorBackend
+from model_registry import MODEL_REGISTRY
 # Typing
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple, Union
+# Keypoint selection
+from keypoint_selection import KeypointSelector
 # Pitch configuration
 from pitch_config import SoccerFieldConfiguration
 PITCH_CONFIG = SoccerFieldConfiguration()
 
+logger = logging.getLogger(__name__)
+
 class PitchDetector:
     """
     The PitchDetector class is responsible for detecting soccer pitch keypoints from an input image.
@@ -14,37 +21,69 @@ class PitchDetector:
     and vertices of the soccer field.
 
     Attributes:
-        pitch_detector (YOLO): A YOLO model instance for detecting keypoints on the soccer pitch.
-        pitch (list): A list containing detection results from the YOLO model. It is a list with only one element because the prediction is made on one frame.
-        pitch_detections (sv.Detections): A Supervision Detections object containing the pitch vertices detections.
+        pitch_detector (DetectorBackend): The YOLO pose model detecting keypoints on the soccer pitch, run with PyTorch or
+            ONNX Runtime and shared through the model registry.
+        pitch (List[sv.Detections]): The detections returned by the backend for the last frame, a single element.
+        pitch_detections (sv.Detections): The pitch keypoint detections of the last frame, with the keypoint pixel
+            coordinates in `data['keypoint_xy']` and, when the model predicts them, their confidences in
+            `data['keypoint_conf']`.
+        keypoint_selector (KeypointSelector): Cleans the detections before their keypoints are used for the homography.
     """
 
-    def __init__(self, model_path: str) -> None:
+    def __init__(self,
+                 model_path: str,
+                 device: Optional[str] = None,
+                 keypoint_selector: Optional[KeypointSelector] = None) -> None:
         """
         Initializes the PitchDetector with the path to a pre-trained YOLO model.
+        The model is loaded lazily through the process-wide model registry, so that every detector using
+        the same model file and device shares a single loaded model.
 
         Args:
-            model_path (str): Path to the YOLO model file.
+            model_path (str): Path to the YOLO model file, `.pt` or `.onnx`.
+            device (Optional[str]): Device the model runs on, e.g. "cpu" or "cuda:0". None for the default device.
+            keypoint_selector (Optional[KeypointSelector]): Keypoint selection stage, a default one if None.
         """
-        if not ('pitch_detector' in globals()):
-            self.pitch_detector = YOLO(model_path)
-        else:
-            print('Pitch detection model already loaded')
+        self.model_path = model_path
+        self.device = device
+        self.model_lock = MODEL_REGISTRY.lock(model_path, device)
+        self.keypoint_selector = keypoint_selector or KeypointSelector()
+
+    @property
+    def pitch_detector(self) -> DetectorBackend:
+        return MODEL_REGISTRY.get(self.model_path, self.device)
 
-    def get_detections(self, image_path: str) -> sv.Detections:
+    def _run_model(self, source: Union[str, np.ndarray, List[np.ndarray]]) -> List[sv.Detections]:
+        model = self.pitch_detector
+        with self.model_lock:
+            return model.predict(source if isinstance(source, list) else [source])
+
+    def get_detections(self, image: Union[str, np.ndarray]) -> sv.Detections:
         """
         Runs the YOLO model on the given image and returns the detections.
 
         Args:
-            image_path (str): Path to the image file on which to run the detection.
+            image (Union[str, np.ndarray]): Path to the image file, or the already decoded BGR image, on which to run the detection.
 
         Returns:
             sv.Detections: A Supervision Detections object containing the detection results.
         """
-        self.pitch = self.pitch_detector.predict(image_path)
-        pitch_detections = sv.Detections.from_ultralytics(self.pitch[0])
+        self.pitch = self._run_model(image)
+        pitch_detections = self.pitch[0]
         return pitch_detections
 
+    def get_detections_batch(self, images: Sequence[Union[str, np.ndarray]]) -> List[sv.Detections]:
+        """
+        Runs the YOLO model once on a batch of images and returns the detections of each image.
+
+        Args:
+            images (Sequence[Union[str, np.ndarray]]): Image paths or BGR images forming one inference batch.
+
+        Returns:
+            List[sv.Detections]: One Supervision Detections object per image, in input order.
+        """
+        return self._run_model(list(images))
+
     def get_detected_keypoints(self, pitch_detections: sv.Detections) -> np.ndarray:
         """
         Extracts and returns the detected keypoints from the pitch detections.
@@ -53,45 +92,65 @@ class PitchDetector:
             pitch_detections (sv.Detections): The detection results from which to extract keypoints.
 
         Returns:
-            np.ndarray: An array of detected keypoints. If fewer than 4 keypoints are detected, raises a ValueError.
+            np.ndarray: An array of detected keypoints. If fewer than 4 keypoints are detected, or if their
+                pitch vertices are collinear, returns None.
         """
         if len(pitch_detections) < 4:
-            print(f"Not enough keypoints detected: detected {len(pitch_detections)}, needed at least 4.")
+            logger.debug("Not enough keypoints detected: detected %d, needed at least 4.", len(pitch_detections))
             # raise ValueError(f"Not enough keypoints detected: detected {len(pitch_detections)}, needed at least 4.")
+        elif self.keypoint_selector.is_degenerate(self.get_pitch_vertices(pitch_detections),
+                                                  pitch_detections.confidence):
+            logger.debug("Not enough keypoints detected: the detected keypoints are collinear.")
         else:
-            pitch_keypoints = self.pitch[0].keypoints.xy.reshape(len(pitch_detections), 2)
-            return np.array(pitch_keypoints)
+            return pitch_detections.data['keypoint_xy']
 
-    def get_pitch_vertices(self) -> np.ndarray:
+    def get_pitch_vertices(self, pitch_detections: sv.Detections) -> np.ndarray:
         """
         Retrieves the vertices of the soccer pitch based on detected keypoints.
 
+        Args:
+            pitch_detections (sv.Detections): The detection results whose class ids identify the keypoints.
+
         Returns:
             np.ndarray: An array of the vertices' coordinates corresponding to the detected keypoints.
         """
-        # Update the keypoints with the class ids from the box detections
-        self.pitch[0].keypoints.cls = self.pitch[0].boxes.cls
-        keypoints_ids = self.pitch[0].keypoints.cls.tolist()
-
-        # Filter and retrieve the vertex coordinates using the detected keypoints' ids
-        keypoints_xy = [PITCH_CONFIG.vertices[id]['xy'] for id in keypoints_ids]
+        # Retrieve the vertex coordinates using the detected keypoints' ids
+        return PITCH_CONFIG.vertices_xy(pitch_detections.class_id)
 
-        return np.array(keypoints_xy)
-
-    def predict(self, image_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    def predict(self, image: Union[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
         """
         Runs the pitch detection steps, returning both the detected keypoints and the corresponding 2D vertices coordinates.
 
         Args:
-            image_path (str): Path to the image file on which to perform the detection.
+            image (Union[str, np.ndarray]): Path to the image file, or the already decoded BGR image, on which to perform the detection.
 
         Returns:
             Tuple[np.ndarray, np.ndarray]: A tuple containing:
                 - Detected keypoints (np.ndarray)
                 - Corresponding 2D pitch vertices (np.ndarray)
         """
-        self.pitch_detections = self.get_detections(image_path)
-        pitch_keypoints = self.get_detected_keypoints(self.pitch_detections)
-        pitch_vertices = self.get_pitch_vertices()
+        self.pitch_detections = self.get_detections(image)
+        selected_detections = self.keypoint_selector.select(self.pitch_detections)
+        pitch_keypoints = self.get_detected_keypoints(selected_detections)
+        pitch_vertices = self.get_pitch_vertices(selected_detections)
+
+        return pitch_keypoints, pitch_vertices
 
-        return pitch_keypoints, pitch_vertices
\ No newline at end of file
+    def predict_batch(self, images: Sequence[Union[str, np.ndarray]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Runs the pitch detection steps on a batch of images with a single model call.
+
+        Args:
+            images (Sequence[Union[str, np.ndarray]]): Image paths or BGR images forming one inference batch.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: For each image, the detected keypoints (None if fewer than 4)
+                and the corresponding 2D pitch vertices.
+        """
+        predictions = []
+        for pitch_detections in self.get_detections_batch(images):
+            selected_detections = self.keypoint_selector.select(pitch_detections)
+            pitch_keypoints = self.get_detected_keypoints(selected_detections)
+            pitch_vertices = self.get_pitch_vertices(selected_detections)
+            predictions.append((pitch_keypoints, pitch_vertices))
+        return predictions
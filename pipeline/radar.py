@@ -0,0 +1,272 @@
+from functools import lru_cache
+from threading import RLock
+import cv2
+import numpy as np
+import numpy.typing as npt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from mplsoccer.pitch import Pitch
+# Typing
+from typing import Iterator, Tuple
+# Pitch configuration
+from pitch_config import SoccerFieldConfiguration
+PITCH_CONFIG = SoccerFieldConfiguration()
+
+
+class RadarRenderer:
+    """
+    The RadarRenderer class draws ball positions on a radar view of the pitch. The pitch is drawn once, on a figure
+    kept for the lifetime of the renderer, and its raster is cached: each trajectory, heatmap or animation frame only
+    restores that raster and draws its own artists over it (blitting), instead of building a new figure.
+
+    Rendered images are RGB arrays, written to PNG or video with OpenCV. They are copies: a renderer can be shared
+    across threads, e.g. Streamlit sessions, as rendering holds its lock and callers never get its figure.
+
+    Attributes:
+        pitch_length (float): Length of the pitch [m].
+        pitch_width (float): Width of the pitch [m].
+        fig (Figure): The figure of the radar, not registered with pyplot so that it is never leaked.
+        ax (Axes): The axes of the radar, in pitch coordinates [m] with the y axis pointing down.
+    """
+
+    def __init__(self,
+                 pitch_length: float = PITCH_CONFIG.length / 100,
+                 pitch_width: float = PITCH_CONFIG.width / 100,
+                 line_color: str = 'white',
+                 pitch_color: str = 'green',
+                 corner_arcs: bool = True,
+                 figsize: Tuple[float, float] = (10.5, 6.8),
+                 dpi: int = 100) -> None:
+        """
+        Draws the pitch and caches its raster.
+
+        Args:
+            pitch_length (float): Length of the pitch [m].
+            pitch_width (float): Width of the pitch [m].
+            line_color (str): Colour of the pitch lines.
+            pitch_color (str): Colour of the grass.
+            corner_arcs (bool): Whether to draw the corner arcs.
+            figsize (Tuple[float, float]): Size of the figure [in].
+            dpi (int): Resolution of the rendered images.
+        """
+        self.pitch_length = pitch_length
+        self.pitch_width = pitch_width
+        self._lock = RLock()
+        self.pitch = Pitch(
+            pitch_type='custom',
+            pitch_length=pitch_length,
+            pitch_width=pitch_width,
+            line_color=line_color,
+            line_zorder=0,
+            pitch_color=pitch_color,
+            corner_arcs=corner_arcs
+        )
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.pitch.draw(ax=self.ax)
+        self.ax.invert_yaxis()
+
+        # Animated artists are left out of full draws, and drawn over the cached background when rendering
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        self.heatmap = self.ax.imshow(np.zeros((2, 2)), extent=(0, pitch_length, 0, pitch_width), origin='lower',
+                                      cmap='hot', alpha=0.6, zorder=1, animated=True, visible=False)
+        # imshow would otherwise fit the limits to the heatmap, dropping the margins and the inverted y axis
+        self.ax.set_xlim(xlim)
+        self.ax.set_ylim(ylim)
+        self.trajectory, = self.ax.plot([], [], '-', color='yellow', linewidth=1.5, zorder=2, animated=True)
+        self.ball, = self.ax.plot([], [], 'ro', zorder=3, animated=True)
+        self.point, = self.ax.plot([], [], 'ro', zorder=3, animated=True)
+        self.label = self.ax.annotate('', (0, 0), textcoords="offset points", xytext=(0, 10), ha='center',
+                                      fontweight='bold', animated=True)
+        self._cache_background()
+
+    def _cache_background(self) -> None:
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._background_size = self.canvas.get_width_height()
+
+    def _render(self, *artists) -> npt.NDArray[np.uint8]:
+        # A full draw at another size, e.g. by savefig, invalidates the cached raster
+        if self.canvas.get_width_height() != self._background_size:
+            self._cache_background()
+        self.canvas.restore_region(self.background)
+        for artist in artists:
+            self.ax.draw_artist(artist)
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].copy()
+
+    @property
+    def background_image(self) -> npt.NDArray[np.uint8]:
+        """
+        The RGB raster of the empty pitch.
+        """
+        with self._lock:
+            return self._render()
+
+    def render_trajectory(self, pitch_xy: npt.ArrayLike, show_last: bool = True) -> npt.NDArray[np.uint8]:
+        """
+        Renders a ball trajectory. NaN positions break the line.
+
+        Args:
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m].
+            show_last (bool): Whether to mark the last position with the ball marker.
+
+        Returns:
+            npt.NDArray[np.uint8]: The RGB image.
+        """
+        pitch_xy = np.asarray(pitch_xy, dtype=np.float32).reshape(-1, 2)
+        with self._lock:
+            self.trajectory.set_data(pitch_xy[:, 0], pitch_xy[:, 1])
+            self.ball.set_data(pitch_xy[-1:, 0] if show_last else [], pitch_xy[-1:, 1] if show_last else [])
+            return self._render(self.trajectory, self.ball)
+
+    def heatmap_counts(self, pitch_xy: npt.ArrayLike, bins_per_metre: float = 1.0) -> np.ndarray:
+        """
+        Counts the ball positions on a grid over the pitch, 105 x 68 cells of 1 m by default.
+
+        Args:
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m]. NaN and out-of-pitch positions are ignored.
+            bins_per_metre (float): Number of cells per metre.
+
+        Returns:
+            np.ndarray: The (width bins, length bins) counts, row 0 at y = 0.
+        """
+        pitch_xy = np.asarray(pitch_xy, dtype=np.float64).reshape(-1, 2)
+        pitch_xy = pitch_xy[np.isfinite(pitch_xy).all(axis=1)]
+        bins = (max(int(round(self.pitch_length * bins_per_metre)), 1), max(int(round(self.pitch_width * bins_per_metre)), 1))
+        counts, _, _ = np.histogram2d(pitch_xy[:, 0], pitch_xy[:, 1], bins=bins,
+                                      range=[[0, self.pitch_length], [0, self.pitch_width]])
+        return counts.T
+
+    def render_heatmap(self,
+                       pitch_xy: npt.ArrayLike,
+                       bins_per_metre: float = 1.0,
+                       cmap: str = 'hot',
+                       alpha: float = 0.6) -> npt.NDArray[np.uint8]:
+        """
+        Renders a heatmap of the ball positions over the pitch. Empty cells are left transparent.
+
+        Args:
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m].
+            bins_per_metre (float): Number of cells per metre.
+            cmap (str): Colour map of the counts.
+            alpha (float): Opacity of the heatmap.
+
+        Returns:
+            npt.NDArray[np.uint8]: The RGB image.
+        """
+        counts = self.heatmap_counts(pitch_xy, bins_per_metre)
+        with self._lock:
+            self.heatmap.set_data(np.ma.masked_equal(counts, 0))
+            self.heatmap.set_clim(0, max(counts.max(), 1))
+            self.heatmap.set_cmap(cmap)
+            self.heatmap.set_alpha(alpha)
+            self.heatmap.set_visible(True)
+            return self._render(self.heatmap)
+
+    def render_frames(self, pitch_xy: npt.ArrayLike, trail: int = 25) -> Iterator[npt.NDArray[np.uint8]]:
+        """
+        Renders one image per frame, with the ball and the trail of its last positions.
+
+        Args:
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m] of consecutive frames, NaN where unknown.
+            trail (int): Number of previous positions drawn behind the ball.
+
+        Yields:
+            npt.NDArray[np.uint8]: The RGB image of each frame.
+        """
+        pitch_xy = np.asarray(pitch_xy, dtype=np.float32).reshape(-1, 2)
+        for i in range(len(pitch_xy)):
+            yield self.render_trajectory(pitch_xy[max(i - trail, 0):i + 1])
+
+    def write_video(self, pitch_xy: npt.ArrayLike, output_path: str, fps: float = 25.0,
+                    trail: int = 25, fourcc: str = "mp4v") -> int:
+        """
+        Writes the animation of the ball positions to a video file.
+
+        Args:
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m] of consecutive frames, NaN where unknown.
+            output_path (str): Path of the video file.
+            fps (float): Frame rate of the video.
+            trail (int): Number of previous positions drawn behind the ball.
+            fourcc (str): Four-character code of the video codec.
+
+        Returns:
+            int: Number of frames written.
+
+        Raises:
+            ValueError: If the video file cannot be opened for writing.
+        """
+        width, height = self.canvas.get_width_height()
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not writer.isOpened():
+            raise ValueError(f"Could not open {output_path!r} for writing.")
+        frames_written = 0
+        try:
+            for image in self.render_frames(pitch_xy, trail):
+                writer.write(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+                frames_written += 1
+        finally:
+            writer.release()
+        return frames_written
+
+    @staticmethod
+    def save_png(image: npt.NDArray[np.uint8], output_path: str) -> None:
+        """
+        Writes a rendered RGB image to a PNG file.
+        """
+        if not cv2.imwrite(output_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR)):
+            raise ValueError(f"Could not write {output_path!r}.")
+
+    def render_point(self, ball_x: float, ball_y: float) -> npt.NDArray[np.uint8]:
+        """
+        Renders one ball position with a note of its coordinates.
+
+        Args:
+            ball_x (float): The x pitch coordinate of the ball [m].
+            ball_y (float): The y pitch coordinate of the ball [m].
+
+        Returns:
+            npt.NDArray[np.uint8]: The RGB image.
+        """
+        with self._lock:
+            self.point.set_data([ball_x], [ball_y])
+            self.label.set_text(f'({round(ball_x, 1)}, {round(ball_y, 1)})')
+            self.label.xy = (ball_x, ball_y)
+            return self._render(self.point, self.label)
+
+    def plot_point(self, ball_x: float, ball_y: float) -> Tuple[Figure, object]:
+        """
+        Shows one ball position with its coordinates on a new figure, e.g. for display with Streamlit.
+        The figure only holds the rendered image: callers may change it without affecting the renderer.
+
+        Args:
+            ball_x (float): The x pitch coordinate of the ball [m].
+            ball_y (float): The y pitch coordinate of the ball [m].
+
+        Returns:
+            Tuple[Figure, Axes]: The radar figure and axes.
+        """
+        image = self.render_point(ball_x, ball_y)
+        fig = Figure(figsize=self.fig.get_size_inches(), dpi=self.fig.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.imshow(image)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        return fig, ax
+
+
+@lru_cache(maxsize=8)
+def get_radar_renderer(pitch_length: float = PITCH_CONFIG.length / 100,
+                       pitch_width: float = PITCH_CONFIG.width / 100,
+                       line_color: str = 'white',
+                       pitch_color: str = 'green',
+                       corner_arcs: bool = True) -> RadarRenderer:
+    """
+    Returns the renderer of the given pitch style, drawing its pitch only the first time the style is used.
+    The renderer is shared by every thread of the process.
+    """
+    return RadarRenderer(pitch_length, pitch_width, line_color, pitch_color, corner_arcs)
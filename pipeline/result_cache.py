@@ -0,0 +1,183 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import supervision as sv
+# Typing
+from typing import Dict, NamedTuple, Optional, Sequence
+# Results
+from results import BallPositionResult
+
+
+class CacheEntry(NamedTuple):
+    """
+    Cached outcome of the pipeline on one frame.
+
+    Attributes:
+        result (BallPositionResult): The result of the frame.
+        ball_detections (Optional[sv.Detections]): The ball detections, None if not kept, e.g. by batched inference.
+        pitch_detections (Optional[sv.Detections]): The pitch detections, None if not kept.
+    """
+    result: BallPositionResult
+    ball_detections: Optional[sv.Detections] = None
+    pitch_detections: Optional[sv.Detections] = None
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Identifies the version of a model file by its name, size and modification time, without reading it.
+
+    Args:
+        model_path (str): Path to the model file.
+
+    Returns:
+        str: The fingerprint of the model file, or its path if the file does not exist.
+    """
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return str(model_path)
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def frame_key(image: np.ndarray, version: str) -> str:
+    """
+    Hashes the decoded frame with BLAKE2b, together with the version of the models and settings producing its results.
+
+    Args:
+        image (np.ndarray): The decoded BGR frame.
+        version (str): The version of the models and settings.
+
+    Returns:
+        str: The hexadecimal key of the frame.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(version.encode())
+    digest.update(str(image.shape).encode())
+    digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    The ResultCache class maps the content hash of a frame to its cached results, so that a frame seen again,
+    e.g. on a Streamlit rerun or in overlapping batch jobs, is not run through the models again.
+    Entries are kept in an in-memory LRU tier and, optionally, in an SQLite file shared across runs.
+
+    The on-disk tier stores pickles: only open SQLite files written by this class.
+
+    Attributes:
+        max_entries (int): Maximum number of entries of the in-memory tier.
+        sqlite_path (Optional[str]): Path of the SQLite file of the on-disk tier, None for memory only.
+        hits (int): Number of lookups answered by the cache.
+        misses (int): Number of lookups not answered by the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, sqlite_path: Optional[str] = None) -> None:
+        """
+        Initializes the ResultCache.
+
+        Args:
+            max_entries (int): Maximum number of entries of the in-memory tier.
+            sqlite_path (Optional[str]): Path of the SQLite file of the on-disk tier, None for memory only.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self.sqlite_path = sqlite_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = Lock()
+        self._connection = None
+        if sqlite_path is not None:
+            self._connection = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, entry BLOB NOT NULL)")
+            self._connection.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Looks up the entry of a frame, in memory first and then on disk.
+
+        Args:
+            key (str): The key of the frame, from frame_key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry, None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._connection is not None:
+                row = self._connection.execute("SELECT entry FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = pickle.loads(row[0])
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """
+        Stores the entry of a frame in every tier.
+
+        Args:
+            key (str): The key of the frame, from frame_key.
+            entry (CacheEntry): The results of the frame.
+        """
+        with self._lock:
+            self._remember(key, entry)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)",
+                                         (key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)))
+                self._connection.commit()
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Forgets every entry, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM results")
+                self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def pipeline_version(model_paths: Sequence[str], *settings: object) -> str:
+    """
+    Identifies the models and settings producing the results of a pipeline, for the cache keys.
+
+    Args:
+        model_paths (Sequence[str]): Paths to the model files.
+        *settings (object): Settings changing the results, e.g. the homography estimator.
+
+    Returns:
+        str: The version string.
+    """
+    return "|".join([model_fingerprint(model_path) for model_path in model_paths] + [repr(setting) for setting in settings])
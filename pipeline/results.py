@@ -0,0 +1,90 @@
+import time
+import numpy as np
+# Typing
+from typing import NamedTuple, Sequence, Tuple
+# Status codes
+from constants import PipelineStatus
+
+
+class StageTimings(NamedTuple):
+    """
+    Wall-clock duration of each stage of the pipeline on one frame [ms].
+    For frames processed in batches, the duration of each batched stage is shared equally among the frames.
+    """
+    decode: float = 0.0
+    ball: float = 0.0
+    pitch: float = 0.0
+    homography: float = 0.0
+
+
+class BallPositionResult(NamedTuple):
+    """
+    Outcome of locating the ball on one frame. Coordinates that could not be computed are NaN.
+
+    Attributes:
+        status (PipelineStatus): Whether the ball was located, or the stage that failed.
+        pixel_xy (Tuple[float, float]): The (x, y) pixel coordinates of the ball.
+        pitch_xy (Tuple[float, float]): The (x, y) pitch coordinates of the ball [m].
+        confidence (float): Confidence of the ball detection.
+        timings (StageTimings): Duration of each stage of the pipeline [ms].
+    """
+    status: PipelineStatus
+    pixel_xy: Tuple[float, float]
+    pitch_xy: Tuple[float, float]
+    confidence: float
+    timings: StageTimings = StageTimings()
+
+    @property
+    def ok(self) -> bool:
+        return self.status == PipelineStatus.OK
+
+
+# Structured array form of BallPositionResult, for batches of frames
+RESULT_DTYPE = np.dtype([
+    ("status", np.int8),
+    ("pixel_xy", np.float32, (2,)),
+    ("pitch_xy", np.float32, (2,)),
+    ("confidence", np.float32),
+    ("timings", np.float32, (len(StageTimings._fields),)),
+])
+
+
+def to_structured_array(results: Sequence[BallPositionResult]) -> np.ndarray:
+    """
+    Packs results into a structured array of RESULT_DTYPE.
+
+    Args:
+        results (Sequence[BallPositionResult]): The results of many frames.
+
+    Returns:
+        np.ndarray: An (N,) structured array with one record per result.
+    """
+    array = np.empty(len(results), dtype=RESULT_DTYPE)
+    for i, result in enumerate(results):
+        array[i] = (result.status, result.pixel_xy, result.pitch_xy, result.confidence, result.timings)
+    return array
+
+
+def from_structured_array(array: np.ndarray) -> Sequence[BallPositionResult]:
+    """
+    Unpacks a structured array of RESULT_DTYPE into results.
+
+    Args:
+        array (np.ndarray): An (N,) structured array of RESULT_DTYPE.
+
+    Returns:
+        Sequence[BallPositionResult]: One result per record.
+    """
+    return [BallPositionResult(PipelineStatus(int(record["status"])),
+                               tuple(record["pixel_xy"].tolist()),
+                               tuple(record["pitch_xy"].tolist()),
+                               float(record["confidence"]),
+                               StageTimings(*record["timings"].tolist()))
+            for record in array]
+
+
+def elapsed_ms(start: float) -> float:
+    """
+    Returns the milliseconds elapsed since a time.perf_counter() reading.
+    """
+    return (time.perf_counter() - start) * 1000
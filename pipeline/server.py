@@ -0,0 +1,368 @@
+"""
+Serves BallPositionPipeline over a local HTTP interface, on a TCP port or a UNIX socket.
+Frames sent concurrently by several clients, e.g. one per camera feed, are coalesced into micro-batches before
+running the detectors, which raises the throughput per core while the maximum wait bounds the added latency.
+
+    python pipeline/server.py --ball-model ball.pt --pitch-model pitch.pt --port 8000
+    curl --data-binary @frame.jpg http://127.0.0.1:8000/predict
+
+POST /predict takes an encoded image as body and returns the result as JSON. GET /health returns the batching
+statistics. When the queue of waiting frames is full the server answers 503 before reading the body, so that
+clients back off. Frames of clients that disconnect while waiting are dropped from their batch.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+# Typing
+from typing import Callable, Dict, List, Optional, Tuple
+# Pipeline
+try:
+    from pipeline import BallPositionPipeline
+except ImportError:
+    # Imported from the pipeline package rather than the module
+    from pipeline.pipeline import BallPositionPipeline
+# Results
+from results import BallPositionResult, from_structured_array
+# Image decoding
+from frames import decode_image
+
+logger = logging.getLogger(__name__)
+
+BUSY = {"error": "Too many frames waiting, retry later."}
+
+
+class MicroBatcher:
+    """
+    The MicroBatcher class coalesces the frames submitted by concurrent callers into batches for
+    BallPositionPipeline.predict_batch, and routes each result back to its caller.
+    A batch is run as soon as it holds `max_batch_size` frames, or `max_wait_ms` after its first frame arrived.
+    Batches run one at a time in a dedicated thread, as the pipeline is not thread-safe.
+
+    Attributes:
+        max_batch_size (int): Largest number of frames in a batch.
+        max_wait_ms (float): Longest time the first frame of a batch waits for more frames [ms].
+        max_queue_size (int): Largest number of frames waiting for a batch, beyond which submissions are rejected.
+        batches (int): Number of batches run.
+        frames (int): Number of frames processed.
+        rejected (int): Number of frames rejected because the queue was full.
+    """
+
+    def __init__(self,
+                 pipeline: BallPositionPipeline,
+                 max_batch_size: int = 8,
+                 max_wait_ms: float = 5.0,
+                 max_queue_size: int = 64) -> None:
+        """
+        Initializes the MicroBatcher.
+
+        Args:
+            pipeline (BallPositionPipeline): The pipeline the batches are run with.
+            max_batch_size (int): Largest number of frames in a batch.
+            max_wait_ms (float): Longest time the first frame of a batch waits for more frames [ms].
+            max_queue_size (int): Largest number of frames waiting for a batch.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self.batches = 0
+        self.frames = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batcher")
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown()
+
+    def full(self, pending: int = 0) -> bool:
+        """
+        Checks whether a new frame would be rejected, counting `pending` frames about to be submitted.
+        """
+        return self._queue is not None and self._queue.qsize() + pending >= self.max_queue_size
+
+    async def submit(self, image: np.ndarray) -> BallPositionResult:
+        """
+        Queues a frame for the next batch and waits for its result. Cancelling the caller cancels the frame,
+        which is then left out of its batch.
+
+        Args:
+            image (np.ndarray): The decoded BGR frame.
+
+        Returns:
+            BallPositionResult: The result of the frame.
+
+        Raises:
+            asyncio.QueueFull: If too many frames are waiting already.
+        """
+        result = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((image, result))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        return await result
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {"batches": self.batches,
+                "frames": self.frames,
+                "rejected": self.rejected,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "mean_batch_size": self.frames / self.batches if self.batches else 0.0}
+
+    async def _next_batch(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            # Take the frames already waiting without suspending, and only wait for new ones until the deadline
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            # Callers that gave up, e.g. closed connections, are not worth processing
+            batch = [(image, result) for image, result in batch if not result.done()]
+            if not batch:
+                continue
+            images = [image for image, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.pipeline.predict_batch,
+                                                     images, len(images), True)
+            except Exception as error:
+                logger.exception("Batch of %d frames failed", len(images))
+                for _, result in batch:
+                    if not result.done():
+                        result.set_exception(error)
+                continue
+            self.batches += 1
+            self.frames += len(images)
+            for (_, result), frame_result in zip(batch, from_structured_array(results)):
+                if not result.done():
+                    result.set_result(frame_result)
+
+
+def to_json(result: BallPositionResult) -> Dict:
+    """
+    Converts a result into a JSON-serializable dict, with null for coordinates that could not be computed.
+    """
+    def finite_or_none(values):
+        return [value if math.isfinite(value) else None for value in values]
+
+    return {"status": result.status.name,
+            "pixel_xy": finite_or_none(result.pixel_xy),
+            "pitch_xy": finite_or_none(result.pitch_xy),
+            "confidence": finite_or_none([result.confidence])[0],
+            "timings": result.timings._asdict()}
+
+
+class InferenceServer:
+    """
+    The InferenceServer class exposes a MicroBatcher over a minimal HTTP/1.1 interface, with keep-alive connections.
+
+    Attributes:
+        batcher (MicroBatcher): The batcher the frames are submitted to.
+        max_body_size (int): Largest accepted request body [bytes].
+    """
+
+    def __init__(self, batcher: MicroBatcher, max_body_size: int = 32 * 1024 * 1024) -> None:
+        self.batcher = batcher
+        self.max_body_size = max_body_size
+        # Frames read and being decoded, not queued yet
+        self.decoding = 0
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, unix_socket: Optional[str] = None) -> None:
+        """
+        Starts the batcher and serves requests until cancelled.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): TCP port to listen on.
+            unix_socket (Optional[str]): If given, path of the UNIX socket to listen on instead of the TCP port.
+        """
+        await self.batcher.start()
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            logger.info("Listening on %s", unix_socket)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            logger.info("Listening on http://%s:%d", host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                    content_length = int(headers.get("content-length", 0))
+                    if content_length < 0:
+                        raise ValueError(f"Invalid Content-Length {content_length}.")
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line or Content-Length."},
+                                       keep_alive=False)
+                    break
+
+                if content_length > self.max_body_size:
+                    await self.respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                if method == "POST" and path == "/predict" and self.batcher.full(self.decoding):
+                    # Answer before reading and decoding the body, which is left unread: close the connection
+                    self.batcher.rejected += 1
+                    await self.respond(writer, 503, BUSY, keep_alive=False, extra_headers={"Retry-After": "1"})
+                    break
+                body = await reader.readexactly(content_length) if content_length else b""
+                response = await self.route(method, path, body, lambda: reader.at_eof() or writer.is_closing())
+                if response is None:
+                    # The client disconnected while its frame was waiting
+                    break
+                status, payload, extra_headers = response
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self,
+                    method: str,
+                    path: str,
+                    body: bytes,
+                    disconnected: Optional[Callable[[], bool]] = None,
+                    poll_interval: float = 0.05) -> Optional[Tuple[int, Dict, Dict[str, str]]]:
+        """
+        Answers one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+            body (bytes): The request body.
+            disconnected (Optional[Callable[[], bool]]): Tells whether the client closed the connection, in which
+                case its frame is cancelled while it waits for a batch.
+            poll_interval (float): Interval between two checks of `disconnected` [s].
+
+        Returns:
+            Optional[Tuple[int, Dict, Dict[str, str]]]: The HTTP status, the JSON payload and extra response
+                headers, None if the client disconnected.
+        """
+        if method == "GET" and path == "/health":
+            return 200, self.batcher.stats, {}
+        if method != "POST" or path != "/predict":
+            return 404, {"error": f"No route for {method} {path}."}, {}
+        self.decoding += 1
+        try:
+            # Decode outside of the event loop, while other requests are being read
+            image = await asyncio.get_running_loop().run_in_executor(None, decode_image, body)
+        except ValueError as error:
+            return 400, {"error": str(error)}, {}
+        finally:
+            self.decoding -= 1
+        result = asyncio.ensure_future(self.batcher.submit(image))
+        while not result.done():
+            await asyncio.wait({result}, timeout=poll_interval)
+            if not result.done() and disconnected is not None and disconnected():
+                result.cancel()
+                return None
+        try:
+            return 200, to_json(result.result()), {}
+        except asyncio.QueueFull:
+            return 503, BUSY, {"Retry-After": "1"}
+        except Exception as error:
+            return 500, {"error": str(error)}, {}
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter,
+                      status: int,
+                      payload: Dict,
+                      keep_alive: bool = True,
+                      extra_headers: Optional[Dict[str, str]] = None) -> None:
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json",
+                   "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close",
+                   **(extra_headers or {})}
+        head = f"HTTP/1.1 {status} {reasons[status]}\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ball-model", default=os.environ.get("BALL_DETECTOR_MODEL_PATH"),
+                        help="Path to the ball detection model, .pt or .onnx (default: $BALL_DETECTOR_MODEL_PATH).")
+    parser.add_argument("--pitch-model", default=os.environ.get("PITCH_DETECTOR_MODEL_PATH"),
+                        help="Path to the pitch detection model, .pt or .onnx (default: $PITCH_DETECTOR_MODEL_PATH).")
+    parser.add_argument("--device", help="Device the models run on, e.g. cpu or cuda:0.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", help="Listen on this UNIX socket instead of the TCP port.")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Largest number of frames in a batch.")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Longest wait for a batch to fill up [ms].")
+    parser.add_argument("--max-queue-size", type=int, default=64, help="Frames waiting beyond which requests get 503.")
+    args = parser.parse_args()
+    if args.ball_model is None or args.pitch_model is None:
+        parser.error("--ball-model and --pitch-model are required unless set through the environment.")
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    pipeline = BallPositionPipeline(args.ball_model, args.pitch_model, device=args.device)
+    pipeline.warmup()
+    batcher = MicroBatcher(pipeline, args.max_batch_size, args.max_wait_ms, args.max_queue_size)
+    try:
+        asyncio.run(InferenceServer(batcher).serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
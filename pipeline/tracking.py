@@ -0,0 +1,214 @@
+import numpy as np
+# Typing
+from typing import List, NamedTuple, Optional, Tuple
+# Status codes
+from constants import PipelineStatus
+
+
+class TrackPoint(NamedTuple):
+    """
+    Position of the ball on one frame, as output by the tracker.
+
+    Attributes:
+        frame_idx (int): Index of the frame.
+        pitch_xy (Tuple[float, float]): The (x, y) pitch coordinates of the ball [m], NaN if unknown.
+        status (PipelineStatus): OK for a detection, INTERPOLATED for a gap filled by the tracker,
+            otherwise the reason why the ball could not be located.
+        confidence (float): Confidence of the selected detection, NaN for interpolated or missing positions.
+    """
+    frame_idx: int
+    pitch_xy: Tuple[float, float]
+    status: PipelineStatus
+    confidence: float
+
+
+class BallTracker:
+    """
+    The BallTracker class follows the match ball across the frames of a video in pitch coordinates.
+    It keeps a constant-velocity Kalman filter of the ball position, picks among the ball candidates of each
+    frame the one that best fits the predicted position, and linearly interpolates short gaps without detections.
+
+    Interpolated positions can only be computed once the ball is found again, so the points of a gap are
+    returned late, together with the detection that closes it. Points are always returned in frame order.
+
+    Attributes:
+        max_gap (int): Longest run of frames without detections that is interpolated.
+        max_lost_frames (int): Frames without detections after which the track is dropped.
+        min_hits (int): Detections needed before the track is locked, i.e. trusted for gating and gap filling.
+        gate (float): Largest squared Mahalanobis distance between a candidate and the predicted position.
+    """
+
+    # Constant-velocity model on the state [x, y, vx, vy], with one frame as time step
+    _F = np.array([[1, 0, 1, 0],
+                   [0, 1, 0, 1],
+                   [0, 0, 1, 0],
+                   [0, 0, 0, 1]], dtype=np.float64)
+    _H = np.array([[1, 0, 0, 0],
+                   [0, 1, 0, 0]], dtype=np.float64)
+
+    def __init__(self,
+                 max_gap: int = 10,
+                 max_lost_frames: int = 25,
+                 min_hits: int = 3,
+                 gate: float = 13.8,
+                 process_noise: float = 1.0,
+                 measurement_noise: float = 0.5,
+                 initial_speed: float = 2.0) -> None:
+        """
+        Initializes the BallTracker.
+
+        Args:
+            max_gap (int): Longest run of frames without detections that is interpolated.
+            max_lost_frames (int): Frames without detections after which the track is dropped.
+            min_hits (int): Detections needed before the track is locked.
+            gate (float): Largest squared Mahalanobis distance between a candidate and the predicted position.
+                The default is the 99.9% quantile of the chi-squared distribution with 2 degrees of freedom.
+            process_noise (float): Standard deviation of the ball acceleration [m/frame^2].
+            measurement_noise (float): Standard deviation of the measured ball position [m].
+            initial_speed (float): Standard deviation of the speed of a new track [m/frame].
+        """
+        if max_lost_frames < max_gap:
+            raise ValueError("max_lost_frames must be at least max_gap.")
+        self.max_gap = max_gap
+        self.max_lost_frames = max_lost_frames
+        self.min_hits = min_hits
+        self.gate = gate
+        self.initial_speed = initial_speed
+        self._Q = process_noise ** 2 * np.array([[1 / 4, 0, 1 / 2, 0],
+                                                 [0, 1 / 4, 0, 1 / 2],
+                                                 [1 / 2, 0, 1, 0],
+                                                 [0, 1 / 2, 0, 1]])
+        self._R = measurement_noise ** 2 * np.eye(2)
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drops the track and any pending gap, e.g. when a new video starts.
+        """
+        self._drop_track()
+        self.last_measurement: Optional[Tuple[int, np.ndarray]] = None
+        self.pending: List[Tuple[int, PipelineStatus]] = []
+
+    def _drop_track(self) -> None:
+        self.state: Optional[np.ndarray] = None
+        self.covariance: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def locked(self) -> bool:
+        return self.state is not None and self.hits >= self.min_hits
+
+    @property
+    def predicted_pitch_xy(self) -> Optional[np.ndarray]:
+        """
+        The (x, y) pitch coordinates [m] where the ball is expected on the next frame, None without a track.
+        """
+        if self.state is None:
+            return None
+        return (self._F @ self.state)[:2]
+
+    def update(self,
+               frame_idx: int,
+               candidates_pitch_xy: np.ndarray,
+               confidences: np.ndarray,
+               status: PipelineStatus = PipelineStatus.OK) -> List[TrackPoint]:
+        """
+        Advances the track by one frame.
+
+        Args:
+            frame_idx (int): Index of the frame, increasing from call to call.
+            candidates_pitch_xy (np.ndarray): The (M, 2) pitch coordinates [m] of the ball candidates of the frame.
+                Candidates with non-finite coordinates are ignored.
+            confidences (np.ndarray): The (M,) confidences of the candidates.
+            status (PipelineStatus): Status of the frame when no candidate could be located, e.g. NOT_ENOUGH_KEYPOINTS.
+
+        Returns:
+            List[TrackPoint]: The points finalized by this frame, in frame order. Empty while a gap may still
+                be interpolated.
+        """
+        if self.state is not None:
+            self.state = self._F @ self.state
+            self.covariance = self._F @ self.covariance @ self._F.T + self._Q
+
+        # Candidates projected beyond the horizon have no pitch coordinates
+        candidates_pitch_xy = np.asarray(candidates_pitch_xy, dtype=np.float64).reshape(-1, 2)
+        confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        finite = np.isfinite(candidates_pitch_xy).all(axis=1)
+        candidates_pitch_xy, confidences = candidates_pitch_xy[finite], confidences[finite]
+
+        selected = self._select(candidates_pitch_xy, confidences) if len(candidates_pitch_xy) > 0 else None
+        if selected is None:
+            return self._miss(frame_idx, PipelineStatus.NO_BALL if status == PipelineStatus.OK else status)
+
+        measurement = np.asarray(candidates_pitch_xy[selected], dtype=np.float64)
+        if self.state is None:
+            self.state = np.array([measurement[0], measurement[1], 0.0, 0.0])
+            self.covariance = np.diag([self._R[0, 0], self._R[1, 1], self.initial_speed ** 2, self.initial_speed ** 2])
+        else:
+            self._correct(measurement)
+        self.hits += 1
+        self.misses = 0
+
+        points = self._interpolate_gap(frame_idx, measurement)
+        points.append(TrackPoint(frame_idx, (float(measurement[0]), float(measurement[1])),
+                                 PipelineStatus.OK, float(confidences[selected])))
+        self.last_measurement = (frame_idx, measurement)
+        return points
+
+    def flush(self) -> List[TrackPoint]:
+        """
+        Returns the frames of a gap still pending at the end of the video, without position.
+
+        Returns:
+            List[TrackPoint]: The pending points, in frame order.
+        """
+        points = [TrackPoint(pending_idx, (np.nan, np.nan), pending_status, np.nan)
+                  for pending_idx, pending_status in self.pending]
+        self.pending = []
+        return points
+
+    def _select(self, candidates_pitch_xy: np.ndarray, confidences: np.ndarray) -> Optional[int]:
+        if self.state is None:
+            return int(np.argmax(confidences))
+
+        innovation_covariance = self._H @ self.covariance @ self._H.T + self._R
+        innovations = candidates_pitch_xy - self.state[:2]
+        distances = np.einsum('ni,ij,nj->n', innovations, np.linalg.inv(innovation_covariance), innovations)
+        best = int(np.argmin(distances))
+        if distances[best] <= self.gate:
+            return best
+        if not self.locked:
+            # A track that is not locked yet may have started on a wrong object: restart it
+            self._drop_track()
+            return int(np.argmax(confidences))
+        return None
+
+    def _correct(self, measurement: np.ndarray) -> None:
+        innovation_covariance = self._H @ self.covariance @ self._H.T + self._R
+        gain = self.covariance @ self._H.T @ np.linalg.inv(innovation_covariance)
+        self.state = self.state + gain @ (measurement - self._H @ self.state)
+        self.covariance = (np.eye(4) - gain @ self._H) @ self.covariance
+
+    def _miss(self, frame_idx: int, status: PipelineStatus) -> List[TrackPoint]:
+        self.misses += 1
+        if self.locked and self.last_measurement is not None and self.misses <= self.max_gap:
+            # Wait for the ball to be found again before deciding whether the gap can be interpolated
+            self.pending.append((frame_idx, status))
+            return []
+        if self.state is not None and self.misses > self.max_lost_frames:
+            self._drop_track()
+        points = self.flush()
+        points.append(TrackPoint(frame_idx, (np.nan, np.nan), status, np.nan))
+        return points
+
+    def _interpolate_gap(self, frame_idx: int, measurement: np.ndarray) -> List[TrackPoint]:
+        if not self.pending:
+            return []
+        last_idx, last_xy = self.last_measurement
+        points = []
+        for pending_idx, _ in self.pending:
+            xy = last_xy + (measurement - last_xy) * (pending_idx - last_idx) / (frame_idx - last_idx)
+            points.append(TrackPoint(pending_idx, (float(xy[0]), float(xy[1])), PipelineStatus.INTERPOLATED, np.nan))
+        self.pending = []
+        return points
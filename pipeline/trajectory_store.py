@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import numpy as np
+import numpy.typing as npt
+# Typing
+from typing import Dict, Iterable, Optional, Tuple
+# Status codes
+from constants import PipelineStatus
+
+# Columns of the store: dtype and shape of one row
+COLUMNS: Dict[str, Tuple[np.dtype, Tuple[int, ...]]] = {
+    "frame_idx": (np.dtype(np.int64), ()),
+    "pitch_xy": (np.dtype(np.float32), (2,)),
+    "pixel_xy": (np.dtype(np.float32), (2,)),
+    "confidence": (np.dtype(np.float32), ()),
+    "status": (np.dtype(np.int8), ()),
+    "homography_id": (np.dtype(np.int32), ()),
+}
+# Homography id of the frames without a Homography matrix
+NO_HOMOGRAPHY = -1
+
+
+class TrajectoryStore:
+    """
+    The TrajectoryStore class keeps the ball trajectory of a whole match on disk, one append-only raw file per
+    column, read back as read-only memory maps. Frames are appended in increasing frame order, so time-range
+    queries are a binary search on the frame indices and return views, without copying or parsing.
+
+    Homography matrices are deduplicated into a side table: with a static camera or a homography tracker,
+    consecutive frames share the same matrix and only store its id.
+
+    Attributes:
+        path (str): Directory of the store.
+        fps (float): Frame rate of the video, to convert times into frame indices.
+    """
+
+    def __init__(self, path: str, fps: float = 25.0) -> None:
+        """
+        Opens the store in the given directory, creating it if needed.
+
+        Args:
+            path (str): Directory of the store.
+            fps (float): Frame rate of the video, used when creating the store. An existing store keeps its own.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        metadata_path = os.path.join(path, "metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                self.fps = json.load(f)["fps"]
+        else:
+            self.fps = fps
+            with open(metadata_path, "w") as f:
+                json.dump({"fps": fps, "columns": {name: [dtype.str, list(shape)] for name, (dtype, shape) in COLUMNS.items()}}, f)
+
+        self._files = {name: open(self._column_path(name), "ab") for name in COLUMNS}
+        self._homography_file = open(os.path.join(path, "homographies.f64"), "ab")
+        # A crash may leave the last row incomplete: only rows present in every column count
+        self._num_rows = min(os.path.getsize(self._column_path(name)) // self._row_size(name) for name in COLUMNS)
+        for name in COLUMNS:
+            self._files[name].truncate(self._num_rows * self._row_size(name))
+        homographies_path = os.path.join(path, "homographies.f64")
+        self._homography_file.truncate(os.path.getsize(homographies_path) // (9 * 8) * (9 * 8))
+        homographies = self.homographies
+        self._homography_ids = {self._homography_hash(H): i for i, H in enumerate(homographies)}
+        frame_idx = self.column("frame_idx")
+        self._last_frame_idx = int(frame_idx[-1]) if len(frame_idx) else None
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    @staticmethod
+    def _row_size(name: str) -> int:
+        dtype, shape = COLUMNS[name]
+        return dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+    @staticmethod
+    def _homography_hash(H: np.ndarray) -> bytes:
+        return hashlib.blake2b(np.ascontiguousarray(H, dtype=np.float64).tobytes(), digest_size=16).digest()
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def add_homography(self, H: np.ndarray) -> int:
+        """
+        Adds a Homography matrix to the side table, unless the same matrix is stored already.
+
+        Args:
+            H (np.ndarray): The (3, 3) Homography matrix.
+
+        Returns:
+            int: The id of the matrix.
+        """
+        key = self._homography_hash(H)
+        if key not in self._homography_ids:
+            self._homography_file.write(np.ascontiguousarray(H, dtype=np.float64).tobytes())
+            self._homography_ids[key] = len(self._homography_ids)
+        return self._homography_ids[key]
+
+    def append(self,
+               frame_idx: npt.ArrayLike,
+               pitch_xy: npt.ArrayLike,
+               status: npt.ArrayLike,
+               pixel_xy: Optional[npt.ArrayLike] = None,
+               confidence: Optional[npt.ArrayLike] = None,
+               homography: Optional[npt.ArrayLike] = None) -> None:
+        """
+        Appends the rows of many frames. Every column is converted and checked before any is written, so that
+        invalid input leaves the store unchanged.
+
+        Args:
+            frame_idx (npt.ArrayLike): The (N,) frame indices, increasing and after those already stored.
+            pitch_xy (npt.ArrayLike): The (N, 2) ball pitch coordinates [m], NaN where unknown.
+            status (npt.ArrayLike): The (N,) PipelineStatus codes.
+            pixel_xy (Optional[npt.ArrayLike]): The (N, 2) ball pixel coordinates, NaN if not given.
+            confidence (Optional[npt.ArrayLike]): The (N,) detection confidences, NaN if not given.
+            homography (Optional[npt.ArrayLike]): A (3, 3) Homography matrix shared by the frames, or (N, 3, 3)
+                matrices with NaN for frames without one, or None.
+
+        Raises:
+            ValueError: If the frame indices are not increasing, or a column does not hold one row per frame.
+        """
+        frame_idx = np.atleast_1d(np.asarray(frame_idx, dtype=np.int64))
+        num_rows = len(frame_idx)
+        if num_rows == 0:
+            return
+        if np.any(np.diff(frame_idx) <= 0) or (self._last_frame_idx is not None and frame_idx[0] <= self._last_frame_idx):
+            raise ValueError("Frame indices must be increasing.")
+
+        columns = {
+            "frame_idx": frame_idx,
+            "pitch_xy": pitch_xy,
+            "pixel_xy": np.full((num_rows, 2), np.nan) if pixel_xy is None else pixel_xy,
+            "confidence": np.full(num_rows, np.nan) if confidence is None else confidence,
+            "status": status,
+        }
+        for name, values in columns.items():
+            columns[name] = self._to_column(name, values, num_rows)
+        if homography is not None:
+            homography = np.asarray(homography, dtype=np.float64)
+            if homography.shape not in ((3, 3), (num_rows, 3, 3)):
+                raise ValueError(f"homography has shape {homography.shape}, expected (3, 3) or ({num_rows}, 3, 3).")
+
+        # Only the side table is written before the columns: a matrix without rows is harmless
+        if homography is None:
+            homography_id = np.full(num_rows, NO_HOMOGRAPHY, dtype=np.int32)
+        elif homography.ndim == 2:
+            homography_id = np.full(num_rows, self.add_homography(homography), dtype=np.int32)
+        else:
+            homography_id = np.array([self.add_homography(H) if np.isfinite(H).all() else NO_HOMOGRAPHY
+                                      for H in homography], dtype=np.int32)
+        columns["homography_id"] = homography_id
+        for name, values in columns.items():
+            self._files[name].write(values.tobytes())
+        self._num_rows += num_rows
+        self._last_frame_idx = int(frame_idx[-1])
+
+    @staticmethod
+    def _to_column(name: str, values: npt.ArrayLike, num_rows: int) -> np.ndarray:
+        dtype, shape = COLUMNS[name]
+        values = np.ascontiguousarray(values, dtype=dtype)
+        if values.size != num_rows * int(np.prod(shape, dtype=np.int64)):
+            raise ValueError(f"{name} has {values.size} values, expected {num_rows} rows of shape {shape}.")
+        return values.reshape((num_rows,) + shape)
+
+    def append_results(self,
+                       frame_idx: npt.ArrayLike,
+                       results: np.ndarray,
+                       homography: Optional[npt.ArrayLike] = None) -> None:
+        """
+        Appends the results of BallPositionPipeline.predict_batch(structured=True), with their pixel coordinates
+        and confidences.
+
+        Args:
+            frame_idx (npt.ArrayLike): The (N,) frame indices of the results.
+            results (np.ndarray): The (N,) structured array of RESULT_DTYPE.
+            homography (Optional[npt.ArrayLike]): A (3, 3) Homography matrix shared by the frames, e.g. the one
+                of a homography tracker, or (N, 3, 3) matrices with NaN for frames without one, or None.
+        """
+        self.append(frame_idx, results["pitch_xy"], results["status"], results["pixel_xy"], results["confidence"],
+                    homography)
+
+    def extend(self, points: Iterable[Tuple[int, float, float, PipelineStatus]], chunk_size: int = 4096) -> None:
+        """
+        Appends the points yielded by BallPositionPipeline.stream, in chunks.
+
+        Args:
+            points (Iterable[Tuple[int, float, float, PipelineStatus]]): The frame index, the ball pitch
+                coordinates [m] and the status of each frame.
+            chunk_size (int): Number of frames written at once.
+        """
+        chunk = []
+        for point in points:
+            chunk.append(point)
+            if len(chunk) == chunk_size:
+                self._append_points(chunk)
+                chunk = []
+        if chunk:
+            self._append_points(chunk)
+        self.flush()
+
+    def _append_points(self, chunk: list) -> None:
+        frame_idx, ball_x, ball_y, status = zip(*chunk)
+        self.append(frame_idx, np.stack([ball_x, ball_y], axis=1), np.array(status, dtype=np.int8))
+
+    def flush(self) -> None:
+        """
+        Writes the appended rows to disk, making them visible to the readers.
+        """
+        for f in self._files.values():
+            f.flush()
+        self._homography_file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._homography_file.close()
+
+    def __enter__(self) -> "TrajectoryStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Maps a column into memory, read-only and without copying.
+
+        Args:
+            name (str): One of COLUMNS.
+
+        Returns:
+            np.ndarray: The (N,) or (N, 2) values of the column.
+        """
+        self._files[name].flush()
+        dtype, shape = COLUMNS[name]
+        if self._num_rows == 0:
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(self._num_rows,) + shape)
+
+    @property
+    def homographies(self) -> np.ndarray:
+        """
+        The (K, 3, 3) Homography matrices of the side table, indexed by homography id.
+        """
+        self._homography_file.flush()
+        homographies_path = os.path.join(self.path, "homographies.f64")
+        num_homographies = os.path.getsize(homographies_path) // (9 * 8)
+        if num_homographies == 0:
+            return np.empty((0, 3, 3), dtype=np.float64)
+        return np.memmap(homographies_path, dtype=np.float64, mode="r", shape=(num_homographies, 3, 3))
+
+    def frame_range(self, start_frame: int, stop_frame: int) -> Dict[str, np.ndarray]:
+        """
+        Returns the rows of the frames in [start_frame, stop_frame), as views on the memory-mapped columns.
+
+        Args:
+            start_frame (int): First frame index of the range.
+            stop_frame (int): Frame index after the range.
+
+        Returns:
+            Dict[str, np.ndarray]: The values of every column in the range.
+        """
+        frame_idx = self.column("frame_idx")
+        start, stop = np.searchsorted(frame_idx, [start_frame, stop_frame], side="left")
+        return {name: self.column(name)[start:stop] for name in COLUMNS}
+
+    def time_range(self, start_s: float, stop_s: float) -> Dict[str, np.ndarray]:
+        """
+        Returns the rows of the frames between two times of the video [s], as views on the memory-mapped columns.
+        """
+        return self.frame_range(int(np.ceil(start_s * self.fps)), int(np.ceil(stop_s * self.fps)))
+
+    def downsample(self, step: int, start_frame: Optional[int] = None, stop_frame: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns every `step`-th row, optionally within a frame range, as strided views without copying.
+
+        Args:
+            step (int): Keep one row every `step` rows.
+            start_frame (Optional[int]): First frame index of the range, None for the first stored frame.
+            stop_frame (Optional[int]): Frame index after the range, None for after the last stored frame.
+
+        Returns:
+            Dict[str, np.ndarray]: The values of every column.
+        """
+        if step < 1:
+            raise ValueError("step must be at least 1.")
+        frame_idx = self.column("frame_idx")
+        start = 0 if start_frame is None else np.searchsorted(frame_idx, start_frame, side="left")
+        stop = len(frame_idx) if stop_frame is None else np.searchsorted(frame_idx, stop_frame, side="left")
+        return {name: self.column(name)[start:stop:step] for name in COLUMNS}
+
+    def located_pitch_xy(self, step: int = 1, include_interpolated: bool = True) -> np.ndarray:
+        """
+        Returns the pitch coordinates of the frames on which the ball was located, e.g. for a heatmap.
+
+        Args:
+            step (int): Keep one row every `step` rows before filtering.
+            include_interpolated (bool): Whether to include the positions interpolated by the ball tracker.
+
+        Returns:
+            np.ndarray: The (M, 2) ball pitch coordinates [m].
+        """
+        rows = self.downsample(step)
+        located = rows["status"] == PipelineStatus.OK
+        if include_interpolated:
+            located |= rows["status"] == PipelineStatus.INTERPOLATED
+        return rows["pitch_xy"][located]
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import numpy.typing as npt
+# Typing
+from typing import Optional
+# Homography
+from homography import HomographyTransformer
+# Pitch configuration
+from pitch_config import SoccerFieldConfiguration
+PITCH_CONFIG = SoccerFieldConfiguration()
+
+
+class BirdsEyeVideoWriter:
+    """
+    The BirdsEyeVideoWriter class warps frames to a top-down view of the pitch and streams them into a video file.
+    While the Homography matrix does not change, every frame reuses the same remap tables.
+
+    Attributes:
+        resolution_wh (Tuple[int, int]): Width and height of the output video, covering the whole pitch.
+        frames_written (int): Number of frames written so far.
+    """
+
+    def __init__(self,
+                 output_path: str,
+                 fps: float = 25.0,
+                 pixels_per_metre: float = 10.0,
+                 fourcc: str = "mp4v",
+                 homography_transformer: Optional[HomographyTransformer] = None) -> None:
+        """
+        Opens the output video.
+
+        Args:
+            output_path (str): Path of the video file to write.
+            fps (float): Frame rate of the video.
+            pixels_per_metre (float): Resolution of the top-down view.
+            fourcc (str): Four-character code of the video codec.
+            homography_transformer (Optional[HomographyTransformer]): Transformer warping the frames.
+
+        Raises:
+            ValueError: If the video file cannot be opened for writing.
+        """
+        self.resolution_wh = (int(round(PITCH_CONFIG.length / 100 * pixels_per_metre)),
+                              int(round(PITCH_CONFIG.width / 100 * pixels_per_metre)))
+        # Maps pitch coordinates [cm] to pixels of the top-down view
+        self.scale = np.diag([pixels_per_metre / 100, pixels_per_metre / 100, 1.0])
+        self.homography_transformer = homography_transformer or HomographyTransformer()
+        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, self.resolution_wh)
+        if not self.writer.isOpened():
+            raise ValueError(f"Could not open {output_path!r} for writing.")
+        self.frames_written = 0
+
+    def write(self, image: npt.NDArray[np.uint8], H: Optional[np.ndarray]) -> None:
+        """
+        Warps a frame to the top-down view and appends it to the video. Frames without a Homography matrix
+        are written black, so that the video keeps the timing of the source.
+
+        Args:
+            image (npt.NDArray[np.uint8]): The BGR frame.
+            H (Optional[np.ndarray]): The Homography matrix of the frame, mapping pixels to the pitch [cm].
+        """
+        if H is None:
+            warped_image = np.zeros((self.resolution_wh[1], self.resolution_wh[0], 3), dtype=np.uint8)
+        else:
+            warped_image = self.homography_transformer.transform_image(image, self.resolution_wh, self.scale @ H)
+        self.writer.write(warped_image)
+        self.frames_written += 1
+
+    def close(self) -> None:
+        self.writer.release()
+
+    def __enter__(self) -> "BirdsEyeVideoWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,6 @@
+import os
+import sys
+# The pipeline modules import each other by module name, as when run from the pipeline directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'pipeline')))
+# The benchmark stubs stand in for the YOLO models
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
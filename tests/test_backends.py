@@ -0,0 +1,77 @@
+"""
+Checks the NumPy pre- and post-processing of the ONNX Runtime backend against hand-built model outputs,
+without an ONNX model file.
+"""
+import numpy as np
+import pytest
+from backends import OnnxBackend, letterbox, nms
+
+
+def make_backend(kpt_shape=None, names=None) -> OnnxBackend:
+    # Skips the session: postprocess only reads the thresholds and the export metadata
+    backend = OnnxBackend.__new__(OnnxBackend)
+    backend.conf_threshold = 0.25
+    backend.iou_threshold = 0.7
+    backend.max_det = 300
+    backend.names = names or {0: "ball", 1: "other"}
+    backend.kpt_shape = kpt_shape
+    return backend
+
+
+def test_letterbox_pads_the_short_side():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    padded, ratio, pad = letterbox(image, (64, 64))
+    assert padded.shape == (64, 64, 3)
+    assert ratio == pytest.approx(0.32)
+    assert pad == (0, 16)
+    # Image rows in the middle, grey padding above and below
+    assert (padded[:16] == 114).all() and (padded[-16:] == 114).all()
+    assert (padded[16:48] == 0).all()
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7], dtype=np.float32)
+    # The first two boxes overlap with an IoU of 81 / 119
+    np.testing.assert_array_equal(nms(xyxy, scores, 0.5), [1, 2])
+    np.testing.assert_array_equal(nms(xyxy, scores, 0.7), [1, 0, 2])
+
+
+def test_postprocess_pose_rescales_boxes_and_keypoints():
+    backend = make_backend(kpt_shape=(1, 3))
+    # Anchors as columns of (cx, cy, w, h, score class 0, score class 1, keypoint x, keypoint y, keypoint conf)
+    anchors = np.array([
+        [32, 32, 10, 10, 0.9, 0.1, 32, 34, 0.8],
+        # Overlaps the first anchor in the same class: suppressed
+        [32.5, 32.5, 10, 10, 0.8, 0.1, 33, 35, 0.8],
+        # Same box in another class: kept by the class-aware suppression
+        [32, 32, 10, 10, 0.1, 0.7, 30, 30, 0.5],
+        # Below the confidence threshold
+        [50, 50, 10, 10, 0.1, 0.1, 50, 50, 0.9],
+    ], dtype=np.float32)
+    # Letterbox of a 100 x 200 image into 64 x 64: ratio 0.32, 16 rows of padding on top
+    detections = backend.postprocess(anchors.T, (100, 200, 3), 0.32, (0, 16))
+
+    np.testing.assert_array_equal(detections.class_id, [0, 1])
+    np.testing.assert_allclose(detections.confidence, [0.9, 0.7], rtol=1e-6)
+    np.testing.assert_allclose(detections.xyxy, [[84.375, 34.375, 115.625, 65.625]] * 2, rtol=1e-5)
+    np.testing.assert_allclose(detections.data['keypoint_xy'], [[100.0, 56.25], [93.75, 43.75]], rtol=1e-5)
+    np.testing.assert_allclose(detections.data['keypoint_conf'], [0.8, 0.5], rtol=1e-6)
+    assert list(detections.data['class_name']) == ["ball", "other"]
+
+
+def test_postprocess_nms_free_export():
+    backend = make_backend()
+    # Rows of (x1, y1, x2, y2, score, class), padded with zeros up to 300 rows
+    output = np.zeros((300, 6), dtype=np.float32)
+    output[0] = [10, 20, 30, 40, 0.9, 0]
+    output[1] = [-4, 8, 300, 40, 0.5, 1]
+    output[2] = [0, 0, 10, 10, 0.1, 0]
+    # Letterbox of a 100 x 100 image: ratio 0.5, 8 rows of padding on top
+    detections = backend.postprocess(output, (100, 100, 3), 0.5, (0, 8))
+
+    np.testing.assert_array_equal(detections.class_id, [0, 1])
+    np.testing.assert_allclose(detections.confidence, [0.9, 0.5], rtol=1e-6)
+    # Rescaled to the original image, and clipped to its borders
+    np.testing.assert_allclose(detections.xyxy, [[20, 24, 60, 64], [0, 0, 100, 64]], rtol=1e-6)
+    assert 'keypoint_xy' not in detections.data
@@ -0,0 +1,77 @@
+"""
+Runs the command line on a synthetic video, with a fake pipeline in place of the YOLO models, and checks that
+a run interrupted and resumed from its checkpoint writes the same output as an uninterrupted run.
+"""
+import json
+import os
+import cv2
+import numpy as np
+import pytest
+import cli
+from results import RESULT_DTYPE
+
+NUM_FRAMES = 45
+
+
+class FakePipeline:
+    # Frames from this index on fail, to interrupt the run
+    fail_from = None
+
+    def predict_batch(self, images, batch_size, structured):
+        # Every frame is filled with 5 times its index
+        frame_indices = [round(float(image.mean()) / 5) for image in images]
+        if self.fail_from is not None and max(frame_indices) >= self.fail_from:
+            raise RuntimeError("Interrupted")
+        results = np.zeros(len(images), dtype=RESULT_DTYPE)
+        results["pixel_xy"] = [(frame_idx, 0) for frame_idx in frame_indices]
+        results["pitch_xy"] = [(frame_idx * 100, 50) for frame_idx in frame_indices]
+        results["confidence"] = 0.5
+        return results
+
+
+def load_fake_pipeline(*args):
+    cli._worker_pipeline = FakePipeline()
+
+
+@pytest.fixture
+def video_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "load_worker_pipeline", load_fake_pipeline)
+    monkeypatch.setattr(cli, "BATCHES_PER_VIDEO_RANGE", 2)
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    for frame_idx in range(NUM_FRAMES):
+        writer.write(np.full((48, 64, 3), 5 * frame_idx, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def run(video_path: str, output_path: str, workers: int) -> None:
+    cli.main([video_path, "--output", output_path, "--ball-model", "ball.pt", "--pitch-model", "pitch.pt",
+              "--batch-size", "4", "--workers", str(workers)])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_resumed_run_matches_an_uninterrupted_run(video_path, tmp_path, monkeypatch, workers):
+    expected_path = str(tmp_path / "expected.jsonl")
+    run(video_path, expected_path, workers)
+    with open(expected_path) as f:
+        expected = f.read()
+    assert [json.loads(line)["frame_idx"] for line in expected.splitlines()] == list(range(NUM_FRAMES))
+
+    output_path = str(tmp_path / "ball.jsonl")
+    monkeypatch.setattr(FakePipeline, "fail_from", 30)
+    with pytest.raises(RuntimeError):
+        run(video_path, output_path, workers)
+    with open(output_path + ".checkpoint.json") as f:
+        next_idx = json.load(f)["next_idx"]
+    assert 0 < next_idx <= 30
+    # Rows written after the last checkpoint, e.g. by a run killed mid-batch, are dropped on resume
+    with open(output_path + ".partial.jsonl", "a") as f:
+        f.write('{"frame_idx": %d, "source": "torn' % next_idx)
+
+    monkeypatch.setattr(FakePipeline, "fail_from", None)
+    run(video_path, output_path, workers)
+    with open(output_path) as f:
+        assert f.read() == expected
+    assert not os.path.exists(output_path + ".checkpoint.json")
+    assert not os.path.exists(output_path + ".partial.jsonl")
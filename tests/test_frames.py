@@ -0,0 +1,67 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+from frames import VideoFrameReader
+try:
+    from pipeline import BallPositionPipeline
+except ImportError:
+    # Run from the repository root, where "pipeline" is the package rather than the module
+    from pipeline.pipeline import BallPositionPipeline
+from stubs import StubBallDetector, StubPitchDetector, SyntheticCamera
+
+NUM_FRAMES = 20
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    for frame_idx in range(NUM_FRAMES):
+        # Every frame is filled with 10 times its index
+        writer.write(np.full((48, 64, 3), 10 * frame_idx, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def frame_number(frame: np.ndarray) -> int:
+    return round(float(frame.mean()) / 10)
+
+
+def test_reader_yields_every_frame_in_order(video_path):
+    frames = list(VideoFrameReader(video_path, queue_size=2))
+    assert [frame_idx for frame_idx, _ in frames] == list(range(NUM_FRAMES))
+    assert [frame_number(frame) for _, frame in frames] == list(range(NUM_FRAMES))
+
+    frames = list(VideoFrameReader(video_path, start_frame=15))
+    assert [(frame_idx, frame_number(frame)) for frame_idx, frame in frames] == [(i, i) for i in range(15, 20)]
+
+
+def test_reader_thread_stops_when_the_consumer_stops_early(video_path):
+    threads = threading.active_count()
+    frames = iter(VideoFrameReader(video_path, queue_size=2))
+    assert [next(frames)[0] for _ in range(3)] == [0, 1, 2]
+    # The decoder is blocked on the full queue until the consumer closes the iterator
+    assert threading.active_count() == threads + 1
+    frames.close()
+    assert threading.active_count() == threads
+
+
+def test_reader_rejects_a_missing_video(tmp_path):
+    with pytest.raises(ValueError):
+        next(iter(VideoFrameReader(str(tmp_path / "missing.avi"))))
+
+
+def test_stream_yields_every_frame_in_order(video_path):
+    camera = SyntheticCamera(resolution_wh=(64, 48))
+    pipeline = BallPositionPipeline("stub-ball-detector", "stub-pitch-detector",
+                                    ball_detector=StubBallDetector(camera),
+                                    pitch_detector=StubPitchDetector(camera))
+    points = list(pipeline.stream(video_path, batch_size=6, queue_size=2))
+    assert [frame_idx for frame_idx, *_ in points] == list(range(NUM_FRAMES))
+
+    threads = threading.active_count()
+    stream = pipeline.stream(video_path, batch_size=1, queue_size=2)
+    assert [next(stream)[0] for _ in range(2)] == [0, 1]
+    stream.close()
+    assert threading.active_count() == threads
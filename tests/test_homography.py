@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+import pytest
+from homography import HomographyTransformer, invert_homography, project_points
+
+RESOLUTION_WH = (160, 120)
+# Mild perspective with a rotation, mapping the image onto itself
+H = np.array([[0.9, 0.1, 8.0], [-0.05, 0.95, 5.0], [0.0004, 0.0002, 1.0]])
+OTHER_H = np.array([[1.1, 0.0, -6.0], [0.0, 1.05, -4.0], [0.0, 0.0003, 1.0]])
+
+# Maps the pitch (cm) to 1000 x 1000 pixels: pitch points with y >= 1000 are behind the camera
+H_PITCH_TO_IMAGE = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, -0.001, 1.0]])
+
+
+def textured_image() -> np.ndarray:
+    xs, ys = np.meshgrid(np.arange(RESOLUTION_WH[0]), np.arange(RESOLUTION_WH[1]))
+    image = np.stack([xs * 1.5, ys * 2.0, 128 + 60 * np.sin(xs / 12.0) * np.cos(ys / 9.0)], axis=-1)
+    return image.astype(np.uint8)
+
+
+def warp_perspective(image: np.ndarray, H: np.ndarray) -> np.ndarray:
+    return cv2.warpPerspective(image, H, RESOLUTION_WH, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+def assert_close_to(warped: np.ndarray, expected: np.ndarray) -> None:
+    # The remap tables are fixed-point, and the pixels along the borders of the warp may round either way
+    inside = cv2.erode((expected.max(axis=-1) > 0).astype(np.uint8), np.ones((5, 5), np.uint8)).astype(bool)
+    difference = np.abs(warped.astype(np.int16) - expected.astype(np.int16))[inside]
+    assert difference.max() <= 3
+    assert difference.mean() < 0.5
+
+
+def test_remapped_warp_matches_warp_perspective():
+    transformer = HomographyTransformer()
+    image = textured_image()
+    expected = warp_perspective(image, H)
+    # The first warp of a matrix uses cv2.warpPerspective, the next ones the remap tables
+    np.testing.assert_array_equal(transformer.transform_image(image, RESOLUTION_WH, H), expected)
+    assert_close_to(transformer.transform_image(image, RESOLUTION_WH, H), expected)
+    assert transformer._warp_maps_key == transformer._warp_key(H, RESOLUTION_WH)
+
+
+def test_new_matrix_does_not_reuse_the_remap_tables():
+    transformer = HomographyTransformer()
+    image = textured_image()
+    for _ in range(2):
+        transformer.transform_image(image, RESOLUTION_WH, H)
+    expected = warp_perspective(image, OTHER_H)
+    np.testing.assert_array_equal(transformer.transform_image(image, RESOLUTION_WH, OTHER_H), expected)
+    assert_close_to(transformer.transform_image(image, RESOLUTION_WH, OTHER_H), expected)
+    assert transformer._warp_maps_key == transformer._warp_key(OTHER_H, RESOLUTION_WH)
+    # A new resolution rebuilds the tables too
+    transformer.transform_image(image, (80, 60), OTHER_H)
+    assert transformer.transform_image(image, (80, 60), OTHER_H).shape == (60, 80, 3)
+
+
+def test_projection_round_trip():
+    points = np.random.default_rng(0).uniform(0, 150, size=(50, 2))
+    projected = project_points(points, H)
+    np.testing.assert_allclose(project_points(projected, invert_homography(H)), points, atol=1e-3)
+    # One matrix per frame
+    frames = project_points(np.stack([points, points]), np.stack([H, invert_homography(OTHER_H)]))
+    np.testing.assert_allclose(frames[0], projected)
+
+
+def test_projection_matches_perspective_transform():
+    points = np.random.default_rng(1).uniform(0, 150, size=(50, 2)).astype(np.float32)
+    expected = cv2.perspectiveTransform(points[None], H)[0]
+    np.testing.assert_allclose(project_points(points, H), expected, rtol=1e-5, atol=1e-3)
+
+
+def test_polygon_partly_behind_the_camera_is_clipped():
+    transformer = HomographyTransformer()
+    polygon = np.array([[0, 0], [500, 0], [500, 2000], [0, 2000]], dtype=np.float32)
+    # Dividing by w flips the far corners, which are behind the camera
+    assert (project_points(polygon, H_PITCH_TO_IMAGE)[2:, 1] < 0).all()
+
+    projected = transformer.project_polygon_to_image(polygon, invert_homography(H_PITCH_TO_IMAGE), (1000, 1000))
+    assert np.isfinite(projected).all()
+    assert (projected >= -1e-3).all() and (projected <= 1000 + 1e-3).all()
+    # The visible part, up to y = 500 on the pitch, fills the trapezoid (0, 0), (500, 0), (1000, 1000), (0, 1000)
+    assert cv2.contourArea(projected) == pytest.approx(750000, rel=1e-4)
+
+
+def test_polygon_behind_the_camera_is_empty():
+    transformer = HomographyTransformer()
+    polygon = np.array([[0, 1500], [500, 1500], [500, 2000], [0, 2000]], dtype=np.float32)
+    projected = transformer.project_polygon_to_image(polygon, invert_homography(H_PITCH_TO_IMAGE), (1000, 1000))
+    assert projected.shape == (0, 2)
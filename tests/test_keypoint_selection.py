@@ -0,0 +1,59 @@
+import numpy as np
+import supervision as sv
+from keypoint_selection import KeypointSelector
+
+
+def keypoint_detections(class_id, confidence, keypoint_conf=None) -> sv.Detections:
+    n = len(class_id)
+    data = {'keypoint_xy': np.arange(2 * n, dtype=np.float32).reshape(n, 2)}
+    if keypoint_conf is not None:
+        data['keypoint_conf'] = np.array(keypoint_conf, dtype=np.float32)
+    return sv.Detections(xyxy=np.zeros((n, 4), dtype=np.float32),
+                         confidence=np.array(confidence, dtype=np.float32),
+                         class_id=np.array(class_id),
+                         data=data)
+
+
+def test_select_filters_by_box_and_keypoint_confidence():
+    selector = KeypointSelector(min_confidence=0.5, min_keypoint_confidence=0.3)
+    detections = keypoint_detections([0, 1, 2, 3], [0.9, 0.4, 0.8, 0.7], keypoint_conf=[0.9, 0.9, 0.2, 0.5])
+    np.testing.assert_array_equal(selector.select(detections).class_id, [0, 3])
+
+
+def test_select_keeps_the_most_confident_detection_per_class_in_order():
+    selector = KeypointSelector()
+    detections = keypoint_detections([5, 2, 5, 2, 7], [0.6, 0.7, 0.9, 0.3, 0.8])
+    selected = selector.select(detections)
+    np.testing.assert_array_equal(selected.class_id, [2, 5, 7])
+    np.testing.assert_allclose(selected.confidence, [0.7, 0.9, 0.8])
+    # The keypoints follow their detections
+    np.testing.assert_allclose(selected.data['keypoint_xy'], [[2, 3], [4, 5], [8, 9]])
+
+
+def test_collinear_vertices_are_degenerate():
+    selector = KeypointSelector()
+    vertices = np.array([[0, 0], [0, 1384], [0, 2484], [0, 4316], [0, 6800]])
+    assert selector.is_degenerate(vertices)
+    assert selector.is_degenerate(vertices[:3])
+
+
+def test_three_collinear_vertices_and_a_fourth_are_degenerate():
+    selector = KeypointSelector()
+    # Three vertices on the penalty box line and the penalty spot: spread in 2D, but no 4 in general position
+    vertices = np.array([[1650, 2484], [1650, 4316], [1650, 5416], [1100, 3400]])
+    assert selector.is_degenerate(vertices)
+
+
+def test_spread_vertices_are_not_degenerate():
+    selector = KeypointSelector()
+    vertices = np.array([[0, 0], [1650, 2484], [1650, 4316], [0, 6800], [550, 2484]])
+    assert not selector.is_degenerate(vertices)
+
+
+def test_only_the_most_confident_vertices_are_checked():
+    selector = KeypointSelector(max_checked_keypoints=4)
+    # Four confident collinear vertices hide the spread ones
+    vertices = np.array([[0, 0], [1650, 2484], [0, 1384], [0, 2484], [1650, 4316], [0, 4316]])
+    confidence = np.array([0.9, 0.2, 0.9, 0.9, 0.2, 0.9])
+    assert selector.is_degenerate(vertices, confidence)
+    assert not selector.is_degenerate(vertices, 1.0 - confidence)
@@ -0,0 +1,120 @@
+"""
+Runs BallPositionPipeline with the stub detectors of the benchmarks, which need no model file.
+"""
+import numpy as np
+from constants import PipelineStatus
+from homography import HomographyTracker
+from keypoint_selection import KeypointSelector
+try:
+    from pipeline import BallPositionPipeline
+except ImportError:
+    # Run from the repository root, where "pipeline" is the package rather than the module
+    from pipeline.pipeline import BallPositionPipeline
+from result_cache import ResultCache
+from stubs import StubBallDetector, StubPitchDetector, SyntheticCamera
+
+
+def make_pipeline(camera: SyntheticCamera, **kwargs) -> BallPositionPipeline:
+    ball_detector = kwargs.pop("ball_detector", None) or StubBallDetector(camera)
+    return BallPositionPipeline("stub-ball-detector", "stub-pitch-detector", ball_detector=ball_detector,
+                                pitch_detector=StubPitchDetector(camera), **kwargs)
+
+
+def without_timings(result):
+    return result._replace(timings=None)
+
+
+def test_result_cache_hits_misses_and_survives_reopening(tmp_path):
+    camera = SyntheticCamera()
+    frame = camera.frame()
+    sqlite_path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(sqlite_path=sqlite_path)
+    pipeline = make_pipeline(camera, result_cache=cache)
+    result = pipeline.predict(frame)
+    # The stub detectors draw new noise on every call: only a cache hit gives the same result again
+    assert without_timings(pipeline.predict(frame)) == without_timings(result)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A setting changing the detections changes the version of the results
+    ball_detector = StubBallDetector(camera)
+    ball_detector.nms_threshold = 0.3
+    other_pipeline = make_pipeline(camera, ball_detector=ball_detector, result_cache=cache)
+    assert other_pipeline.cache_version != pipeline.cache_version
+    other_pipeline.predict(frame)
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+
+    cache = ResultCache(sqlite_path=sqlite_path)
+    assert len(cache) == 0
+    pipeline = make_pipeline(camera, result_cache=cache)
+    assert without_timings(pipeline.predict(frame)) == without_timings(result)
+    assert (cache.hits, cache.misses) == (1, 0)
+    # Batched inference answers the frame from the cache as well
+    results = pipeline.predict_batch([frame], structured=True)
+    np.testing.assert_array_equal(results["pitch_xy"][0], np.float32(result.pitch_xy))
+    assert cache.hits == 2
+    cache.close()
+
+
+def gradient_frame(camera: SyntheticCamera, mirrored: bool = False) -> np.ndarray:
+    width, height = camera.resolution_wh
+    row = np.linspace(0, 255, width, dtype=np.float32)
+    frame = np.broadcast_to((row[::-1] if mirrored else row)[None, :, None], (height, width, 3))
+    return np.ascontiguousarray(frame, dtype=np.uint8)
+
+
+def test_homography_tracker_counters_over_a_static_shot_and_a_cut():
+    camera = SyntheticCamera(resolution_wh=(640, 360))
+    pipeline = make_pipeline(camera, homography_tracker=HomographyTracker(refresh_interval=5))
+    tracker = pipeline.homography_tracker
+    frame = gradient_frame(camera)
+
+    H, _ = pipeline.get_homography(frame)
+    assert tracker.stats == {"cache_hits": 0, "validations": 0, "refreshes": 1}
+    for _ in range(4):
+        assert pipeline.get_homography(frame)[0] is H
+    assert tracker.stats == {"cache_hits": 4, "validations": 0, "refreshes": 1}
+    # The scheduled refresh confirms the cached matrix with the new, noisy keypoints
+    assert pipeline.get_homography(frame)[0] is H
+    assert tracker.stats == {"cache_hits": 4, "validations": 1, "refreshes": 1}
+
+    # Camera cut to a mirrored view: the frame changes, and the cached matrix does not fit the new keypoints
+    width, _ = camera.resolution_wh
+    camera.H_pitch_to_image = np.array([[-1.0, 0.0, width], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]) @ camera.H_pitch_to_image
+    cut_frame = gradient_frame(camera, mirrored=True)
+    cut_H, status = pipeline.get_homography(cut_frame)
+    assert status == PipelineStatus.OK and not np.allclose(cut_H, H)
+    assert tracker.stats == {"cache_hits": 4, "validations": 1, "refreshes": 2}
+    for _ in range(3):
+        assert pipeline.get_homography(cut_frame)[0] is cut_H
+    assert tracker.stats == {"cache_hits": 7, "validations": 1, "refreshes": 2}
+
+
+def seeded_pipeline() -> BallPositionPipeline:
+    # One camera per detector, so that each detector draws the same noise whatever the order of the calls
+    ball_camera = SyntheticCamera(resolution_wh=(640, 360), seed=1)
+    pitch_camera = SyntheticCamera(resolution_wh=(640, 360), seed=2)
+    # Few keypoints are confident enough on some frames
+    keypoint_selector = KeypointSelector(min_confidence=0.9)
+    return BallPositionPipeline("stub-ball-detector", "stub-pitch-detector",
+                                ball_detector=StubBallDetector(ball_camera, miss_rate=0.3),
+                                pitch_detector=StubPitchDetector(pitch_camera, keypoint_selector))
+
+
+def test_predict_batch_matches_predict():
+    frames = [np.zeros((360, 640, 3), dtype=np.uint8)] * 12
+    pipeline = seeded_pipeline()
+    expected = [pipeline.predict(frame) for frame in frames]
+    results = seeded_pipeline().predict_batch(frames, batch_size=5, structured=True)
+
+    assert list(results["status"]) == [result.status for result in expected]
+    assert {PipelineStatus.OK, PipelineStatus.NO_BALL, PipelineStatus.NOT_ENOUGH_KEYPOINTS} <= set(results["status"])
+    np.testing.assert_allclose(results["pixel_xy"], [result.pixel_xy for result in expected], rtol=1e-6)
+    np.testing.assert_allclose(results["pitch_xy"], [result.pitch_xy for result in expected], rtol=1e-5)
+    np.testing.assert_allclose(results["confidence"], [result.confidence for result in expected], rtol=1e-6)
+    no_ball = results["status"] == PipelineStatus.NO_BALL
+    assert np.isnan(results["pixel_xy"][no_ball]).all() and np.isnan(results["pitch_xy"][no_ball]).all()
+
+    pitch_xy, status = seeded_pipeline().predict_batch(frames, batch_size=5)
+    np.testing.assert_array_equal(status, results["status"])
+    np.testing.assert_array_equal(pitch_xy, results["pitch_xy"])
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from radar import RadarRenderer
+
+TRAJECTORY = np.array([[10.0, 10.0], [30.0, 20.0], [np.nan, np.nan], [60.0, 40.0], [90.0, 50.0]])
+
+
+@pytest.fixture(scope="module")
+def renderer() -> RadarRenderer:
+    return RadarRenderer(figsize=(3.15, 2.04), dpi=100)
+
+
+def expected_shape(renderer: RadarRenderer):
+    width, height = renderer.canvas.get_width_height()
+    return height, width, 3
+
+
+def test_renders_are_rgb_images_over_the_pitch(renderer):
+    background = renderer.background_image
+    for image in (renderer.render_trajectory(TRAJECTORY), renderer.render_point(52.5, 34.0)):
+        assert image.shape == expected_shape(renderer)
+        assert image.dtype == np.uint8
+        assert image.flags.owndata
+        assert (image != background).any()
+    assert background.shape == expected_shape(renderer)
+
+
+def test_returned_image_is_not_changed_by_later_renders(renderer):
+    point_image = renderer.render_point(52.5, 34.0)
+    kept = point_image.copy()
+    # Another caller of the shared renderer
+    renderer.render_trajectory(TRAJECTORY)
+    renderer.render_heatmap(TRAJECTORY)
+    fig, ax = renderer.plot_point(20.0, 20.0)
+    ax.plot([0, 100], [0, 60])
+    np.testing.assert_array_equal(point_image, kept)
+    np.testing.assert_array_equal(renderer.render_point(52.5, 34.0), kept)
+
+
+def test_concurrent_renders_match_sequential_ones(renderer):
+    positions = [(10.0 * i, 5.0 * i) for i in range(1, 9)]
+    expected = [renderer.render_point(x, y) for x, y in positions]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        images = list(executor.map(lambda xy: renderer.render_point(*xy), positions))
+    for image, expected_image in zip(images, expected):
+        np.testing.assert_array_equal(image, expected_image)
@@ -0,0 +1,51 @@
+"""
+Sends raw HTTP requests to the InferenceServer over a local TCP connection, with a fake pipeline in place of
+the YOLO models.
+"""
+import asyncio
+import json
+import cv2
+import numpy as np
+import pytest
+from results import RESULT_DTYPE
+from server import InferenceServer, MicroBatcher
+
+
+class FakePipeline:
+
+    def predict_batch(self, images, batch_size, structured):
+        return np.zeros(len(images), dtype=RESULT_DTYPE)
+
+
+async def post(body: bytes):
+    batcher = MicroBatcher(FakePipeline(), max_batch_size=2, max_wait_ms=1)
+    server = InferenceServer(batcher)
+    await batcher.start()
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    try:
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /predict HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        await batcher.stop()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(payload)
+
+
+@pytest.mark.parametrize("body", [b"", b"not an image"])
+def test_undecodable_body_is_a_bad_request(body):
+    status, payload = asyncio.run(post(body))
+    assert status == 400
+    assert "error" in payload
+
+
+def test_encoded_frame_is_predicted():
+    body = cv2.imencode(".jpg", np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+    status, payload = asyncio.run(post(body))
+    assert status == 200
+    assert payload["status"] == "OK"
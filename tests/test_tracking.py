@@ -0,0 +1,87 @@
+import numpy as np
+from constants import PipelineStatus
+from tracking import BallTracker
+
+NO_CANDIDATES = (np.empty((0, 2)), np.empty(0))
+
+
+def detect(x: float, y: float = 30.0, confidence: float = 0.9):
+    return np.array([[x, y]]), np.array([confidence])
+
+
+def locked_tracker(**kwargs) -> BallTracker:
+    # Ball rolling along x at 1 m/frame on frames 0 to 2
+    tracker = BallTracker(**kwargs)
+    for frame_idx in range(3):
+        tracker.update(frame_idx, *detect(float(frame_idx)))
+    assert tracker.locked
+    return tracker
+
+
+def test_gap_is_interpolated_in_frame_order():
+    tracker = locked_tracker()
+    assert tracker.update(3, *NO_CANDIDATES) == []
+    assert tracker.update(4, *NO_CANDIDATES) == []
+    points = tracker.update(5, *detect(5.0))
+
+    assert [point.frame_idx for point in points] == [3, 4, 5]
+    assert [point.status for point in points] == [PipelineStatus.INTERPOLATED, PipelineStatus.INTERPOLATED,
+                                                  PipelineStatus.OK]
+    np.testing.assert_allclose([point.pitch_xy for point in points], [[3.0, 30.0], [4.0, 30.0], [5.0, 30.0]])
+    assert np.isnan(points[0].confidence) and points[2].confidence == 0.9
+
+
+def test_gap_longer_than_max_gap_is_flushed_without_positions():
+    tracker = locked_tracker(max_gap=2)
+    assert tracker.update(3, *NO_CANDIDATES) == []
+    assert tracker.update(4, *NO_CANDIDATES) == []
+    points = tracker.update(5, *NO_CANDIDATES)
+
+    assert [point.frame_idx for point in points] == [3, 4, 5]
+    assert all(point.status == PipelineStatus.NO_BALL for point in points)
+    assert np.isnan([point.pitch_xy for point in points]).all()
+    # The ball found again later is not interpolated back over the flushed frames
+    points = tracker.update(6, *detect(6.0))
+    assert [(point.frame_idx, point.status) for point in points] == [(6, PipelineStatus.OK)]
+
+
+def test_flush_returns_the_pending_gap():
+    tracker = locked_tracker()
+    tracker.update(3, *NO_CANDIDATES, status=PipelineStatus.NOT_ENOUGH_KEYPOINTS)
+    points = tracker.flush()
+    assert [(point.frame_idx, point.status) for point in points] == [(3, PipelineStatus.NOT_ENOUGH_KEYPOINTS)]
+    assert tracker.flush() == []
+
+
+def test_track_not_locked_yet_restarts_on_a_far_candidate():
+    tracker = BallTracker(min_hits=3)
+    tracker.update(0, *detect(10.0, 10.0))
+    points = tracker.update(1, *detect(80.0, 50.0))
+
+    assert [(point.frame_idx, point.status) for point in points] == [(1, PipelineStatus.OK)]
+    np.testing.assert_allclose(points[0].pitch_xy, (80.0, 50.0))
+    np.testing.assert_allclose(tracker.state, [80.0, 50.0, 0.0, 0.0])
+    assert tracker.hits == 1 and not tracker.locked
+
+
+def test_locked_track_ignores_a_far_candidate():
+    tracker = locked_tracker()
+    assert tracker.update(3, *detect(80.0, 50.0)) == []
+    assert tracker.locked
+
+
+def test_non_finite_candidates_are_ignored():
+    tracker = BallTracker(min_hits=3)
+    candidates = np.array([[np.nan, np.nan], [10.0, 10.0]])
+    points = tracker.update(0, candidates, np.array([0.9, 0.5]))
+    np.testing.assert_allclose(points[0].pitch_xy, (10.0, 10.0))
+
+    # Before the track is locked, a NaN candidate must not restart the track on NaN
+    candidates = np.array([[np.inf, np.nan], [10.5, 10.0]])
+    points = tracker.update(1, candidates, np.array([0.9, 0.5]))
+    np.testing.assert_allclose(points[0].pitch_xy, (10.5, 10.0))
+    assert np.isfinite(tracker.state).all()
+
+    points = tracker.update(2, np.array([[np.nan, np.nan]]), np.array([0.9]))
+    assert [point.status for point in points] == [PipelineStatus.NO_BALL]
+    assert np.isfinite(tracker.state).all()
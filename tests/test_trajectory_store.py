@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from constants import PipelineStatus
+from results import RESULT_DTYPE
+from trajectory_store import COLUMNS, NO_HOMOGRAPHY, TrajectoryStore
+
+H = np.array([[0.5, 0.0, 10.0], [0.0, 0.5, 20.0], [0.0, 0.001, 1.0]])
+
+
+def append_frames(store: TrajectoryStore, frame_idx, homography=None) -> None:
+    frame_idx = np.asarray(frame_idx)
+    pitch_xy = np.stack([frame_idx * 0.5, frame_idx * 0.25], axis=1)
+    status = np.where(frame_idx % 3 == 0, PipelineStatus.NO_BALL, PipelineStatus.OK)
+    store.append(frame_idx, pitch_xy, status, confidence=np.full(len(frame_idx), 0.75), homography=homography)
+
+
+def test_reopened_store_reads_the_same_rows(tmp_path):
+    with TrajectoryStore(str(tmp_path), fps=50.0) as store:
+        append_frames(store, range(0, 10))
+        append_frames(store, range(12, 20), homography=H)
+        written = {name: np.array(store.column(name)) for name in COLUMNS}
+
+    with TrajectoryStore(str(tmp_path), fps=25.0) as store:
+        assert len(store) == 18 and store.fps == 50.0
+        for name in COLUMNS:
+            np.testing.assert_array_equal(store.column(name), written[name])
+        np.testing.assert_array_equal(store.time_range(0.22, 0.3)["frame_idx"], [12, 13, 14])
+        # Appending resumes after the stored frames
+        with pytest.raises(ValueError):
+            append_frames(store, [19])
+        append_frames(store, [20])
+        assert len(store) == 19
+
+
+def test_torn_record_is_dropped_on_reopen(tmp_path):
+    with TrajectoryStore(str(tmp_path)) as store:
+        append_frames(store, range(10))
+    # A crash in the middle of the pitch_xy record of the last frame
+    pitch_xy_path = os.path.join(str(tmp_path), "pitch_xy.bin")
+    with open(pitch_xy_path, "r+b") as f:
+        f.truncate(os.path.getsize(pitch_xy_path) - 3)
+
+    with TrajectoryStore(str(tmp_path)) as store:
+        assert len(store) == 9
+        for name in COLUMNS:
+            assert len(store.column(name)) == 9
+            assert os.path.getsize(os.path.join(str(tmp_path), f"{name}.bin")) == 9 * store._row_size(name)
+        append_frames(store, [9])
+        np.testing.assert_array_equal(store.column("frame_idx"), np.arange(10))
+        np.testing.assert_allclose(store.column("pitch_xy")[-1], [4.5, 2.25])
+
+
+def test_batch_with_a_bad_column_writes_nothing(tmp_path):
+    with TrajectoryStore(str(tmp_path)) as store:
+        append_frames(store, range(5))
+        with pytest.raises(ValueError):
+            # One status short: checked after the other columns are converted
+            store.append([5, 6, 7], np.zeros((3, 2)), [0, 0], homography=H)
+        with pytest.raises(ValueError):
+            store.append([5, 6, 7], np.zeros((3, 2)), [0, 0, 0], homography=np.eye(2))
+        store.flush()
+        assert len(store) == 5
+        for name in COLUMNS:
+            assert os.path.getsize(os.path.join(str(tmp_path), f"{name}.bin")) == 5 * store._row_size(name)
+        assert len(store.homographies) == 0
+
+
+def test_homographies_are_deduplicated(tmp_path):
+    with TrajectoryStore(str(tmp_path)) as store:
+        append_frames(store, range(3), homography=H)
+        per_frame = np.stack([H, np.full((3, 3), np.nan), 2 * H])
+        append_frames(store, range(3, 6), homography=per_frame)
+        np.testing.assert_array_equal(store.column("homography_id"), [0, 0, 0, 0, NO_HOMOGRAPHY, 1])
+        np.testing.assert_array_equal(store.homographies, [H, 2 * H])
+
+    # The side table is shared with the rows appended after reopening
+    with TrajectoryStore(str(tmp_path)) as store:
+        append_frames(store, [6], homography=2 * H)
+        assert store.column("homography_id")[-1] == 1
+        assert len(store.homographies) == 2
+
+
+def test_append_results(tmp_path):
+    results = np.zeros(2, dtype=RESULT_DTYPE)
+    results["status"] = [PipelineStatus.OK, PipelineStatus.NO_BALL]
+    results["pixel_xy"] = [[640, 360], [np.nan, np.nan]]
+    results["pitch_xy"] = [[52.5, 34.0], [np.nan, np.nan]]
+    results["confidence"] = [0.9, np.nan]
+    with TrajectoryStore(str(tmp_path)) as store:
+        store.append_results([7, 8], results, homography=H)
+        np.testing.assert_array_equal(store.column("pixel_xy"), results["pixel_xy"])
+        np.testing.assert_array_equal(store.column("status"), results["status"])
+        np.testing.assert_allclose(store.located_pitch_xy(), [[52.5, 34.0]])